@@ -9,6 +9,14 @@ from stats_core import (
     correlation,
     linear_regression_simple
 )
+from stats_grouping import GroupedData
+from stats_bootstrap import attach_bootstrap_ci
+from stats_posthoc import POSTHOC_METHODS, posthoc, posthoc_page
+from stats_power import EFFECT_LABELS, POWER_TESTS, power_curve, sample_size
+from stats_incremental import TASKS
+from stats_stratified import stratified_analysis
+from stats_cache import configure_result_cache, get_result_cache
+from phi3_stat_studio.data_ingest import get_dataset_cache, ingest_file
 from ollama_client import ask_model
 from io import BytesIO
 from datetime import datetime
@@ -514,6 +522,50 @@ def setup_chinese_font():
 # 执行字体设置
 CHINESE_FONT_NAME_PLOT = setup_chinese_font()
 
+# 统计任务名称 → stats_incremental.TASKS 中的任务键
+TASK_KEYS = {
+    "两组比较（t 检验 / Mann–Whitney）": 'two_group',
+    "多组比较（单因素 ANOVA）": 'anova',
+    "相关性分析（Pearson / Spearman）": 'correlation',
+    "简单线性回归": 'regression',
+}
+
+# 统计结果缓存：启用持久化层（每个进程只配置一次，避免每次重新运行清空内存缓存）
+if get_result_cache().disk is None:
+    try:
+        configure_result_cache(disk=True)
+    except Exception:
+        # 存储目录不可写时只使用内存缓存
+        pass
+
+# 数据集缓存：同一文件再次上传时直接按列读取缓存的 Parquet
+try:
+    dataset_cache = get_dataset_cache()
+except OSError:
+    # 存储目录不可写时不缓存
+    dataset_cache = None
+
+
+def load_dataset(uploaded_file):
+    """读取上传的文件（数据集缓存命中时打开缓存的 Parquet），保存到 session state 并返回"""
+    hits = dataset_cache.hits if dataset_cache is not None else 0
+    st.session_state.current_dataset = ingest_file(uploaded_file, uploaded_file.name, cache=dataset_cache)
+    st.session_state.dataset_from_cache = dataset_cache is not None and dataset_cache.hits > hits
+    return st.session_state.current_dataset
+
+
+def read_dataset(uploaded_file, read):
+    """
+    对当前数据集执行 read(dataset)
+
+    缓存命中的数据集按需读取缓存文件，该文件可能已在之后的上传写入缓存时被淘汰删除；
+    此时（OSError）重新读取上传的文件，再执行一次 read。
+    """
+    try:
+        return read(st.session_state.current_dataset)
+    except OSError:
+        return read(load_dataset(uploaded_file))
+
 # 初始化 session state
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
@@ -523,6 +575,9 @@ if 'current_results' not in st.session_state:
     st.session_state.current_results = None
 if 'current_df' not in st.session_state:
     st.session_state.current_df = None
+if 'current_dataset' not in st.session_state:
+    st.session_state.current_dataset = None
+    st.session_state.dataset_file_id = None
 if 'current_params' not in st.session_state:
     st.session_state.current_params = {}
 # 图形美化参数
@@ -1502,7 +1557,7 @@ with top_bar:
 单因素方差分析适用于比较三个或更多组间的均值差异，能够同时检验所有组间是否存在显著差异，避免多次两两比较带来的多重比较问题。
 
 【统计结果】
-F统计量 = {result['stat']:.4f}，p值 = {p_display}（显著性水平 α = {alpha_val}）。
+{'H统计量' if result['method_name'].startswith('Kruskal') else 'F统计量'} = {result['stat']:.4f}，p值 = {p_display}（显著性水平 α = {alpha_val}）。
 在 α = {alpha_val} 水平下，各组间差异{'具有' if p_val < alpha_val else '不具有'}统计学意义（p {'<' if p_val < alpha_val else '≥'} {alpha_val}）。
 
 【结论】
@@ -1683,23 +1738,52 @@ with st.sidebar:
     # 数据上传（expander）
     with st.expander("📁 数据上传", expanded=False):
         uploaded_file = st.file_uploader(
-            "上传 CSV 文件",
-            type=['csv'],
-            help="请上传包含数值变量和分组变量的 CSV 文件",
+            "上传数据文件",
+            type=['csv', 'parquet', 'pq', 'feather', 'arrow', 'ipc'],
+            help="请上传包含数值变量和分组变量的 CSV、Parquet、Feather 或 Arrow IPC 文件",
             key="file_uploader"
         )
         
         df = None
         if uploaded_file is not None:
             try:
-                df = pd.read_csv(uploaded_file)
-                st.success(f"✅ {df.shape[0]} 行 × {df.shape[1]} 列")
+                # 每个上传文件只分块读取一次（Streamlit 每次交互都会重新运行脚本）
+                if st.session_state.dataset_file_id != uploaded_file.file_id:
+                    load_dataset(uploaded_file)
+                    st.session_state.dataset_file_id = uploaded_file.file_id
+                    # 上一个文件的变量选择不再有效
+                    for column_list in TASKS.values():
+                        for name in column_list:
+                            st.session_state.current_params.pop(name, None)
+                    st.session_state.current_params.pop('strata_col', None)
+                df = read_dataset(uploaded_file, lambda dataset: dataset.frame if dataset.complete else dataset.preview)
+                dataset = st.session_state.current_dataset
+                encoding_note = "" if dataset.encoding in (None, "utf-8", "utf-8-sig") else f"（文件编码：{dataset.encoding.upper()}）"
+                cache_note = "（已从缓存读取）" if st.session_state.get('dataset_from_cache') else ""
+                st.success(f"✅ {dataset.n_rows} 行 × {len(dataset.columns)} 列{encoding_note}{cache_note}")
+                dtype_map = dataset.dtype_map
+                if len(dtype_map):
+                    before = dtype_map['nbytes_before'].sum() / 1024**2
+                    after = dtype_map['nbytes_after'].sum() / 1024**2
+                    st.caption(f"🗜️ 已压缩 {len(dtype_map)} 列的数据类型：{before:.1f} MB → {after:.1f} MB")
+                    if st.checkbox("显示类型转换", key="show_dtype_map"):
+                        st.dataframe(dtype_map.rename(columns={
+                            'from_dtype': "原类型", 'to_dtype': "压缩后类型",
+                            'nbytes_before': "原大小（字节）", 'nbytes_after': "压缩后（字节）"
+                        }), use_container_width=True)
+                if not dataset.complete:
+                    st.info(f"ℹ️ 数据约 {dataset.nbytes / 1024**2:.0f} MB，超过内存预算：变量选择基于 {len(df)} 行预览样本，"
+                            f"执行分析时只读取所选的列")
                 st.session_state.current_df = df
             except Exception as e:
                 st.error(f"❌ 读取失败：{str(e)}")
+                st.session_state.current_dataset = None
+                st.session_state.dataset_file_id = None
                 df = None
         else:
             st.session_state.current_df = None
+            st.session_state.current_dataset = None
+            st.session_state.dataset_file_id = None
     
     # 分析设置（expander）- 放在变量选择之前，确保任务改变时变量选择能响应
     with st.expander("⚙️ 分析设置", expanded=False):
@@ -1801,7 +1885,7 @@ with st.sidebar:
 • 分组变量：至少 2 个组别（推荐 3 个或更多）
 • 数值变量：连续型数值
 • 样本量：每组至少 2 个观测值
-• 如果 ANOVA 结果显示显著差异，系统会自动进行事后检验（Tukey HSD）以确定具体哪些组间存在差异
+• 如果 ANOVA 结果显示显著差异，系统会自动进行事后检验（Tukey HSD，可切换为 Games-Howell、Dunn 或 Bonferroni / Holm 校正的成对 t 检验）以确定具体哪些组间存在差异
                     """)
                 elif task == "相关性分析（Pearson / Spearman）":
                     st.markdown("""
@@ -1848,6 +1932,11 @@ with st.sidebar:
                 method = st.radio("相关性方法", ["auto", "pearson", "spearman"], index=0, key="corr_method")
                 st.session_state.current_params['method'] = method
             
+            if task in ["两组比较（t 检验 / Mann–Whitney）", "多组比较（单因素 ANOVA）", "相关性分析（Pearson / Spearman）"]:
+                bootstrap_ci = st.checkbox("计算效应量的 Bootstrap 置信区间（BCa）", value=False, key="bootstrap_ci",
+                                           help="对 Cohen's d、r、η² 或 Pearson r 进行 10000 次重抽样，给出 95% 置信区间")
+                st.session_state.current_params['bootstrap_ci'] = bootstrap_ci
+            
             st.session_state.current_params['alpha'] = alpha
             st.session_state.current_params['task'] = task
         else:
@@ -1862,7 +1951,8 @@ with st.sidebar:
             # 智能检测：如果数值列的唯一值较少（<=10），也可以作为潜在的分组变量
             potential_group_cols = cat_cols.copy()
             for col in numeric_cols:
-                unique_count = df[col].nunique()
+                # 不同取值个数来自读取时对全部数据的统计
+                unique_count = read_dataset(uploaded_file, lambda dataset: dataset.nunique(col))
                 if unique_count <= 10 and unique_count >= 2:
                     potential_group_cols.append(col)
             
@@ -2000,11 +2090,54 @@ with st.sidebar:
                 st.session_state.current_params['x_col'] = x_col
                 st.session_state.current_params['y_col'] = y_col
             
+            # 分层分析（可选）：在分层变量的每一层分别执行当前任务，并给出合并估计
+            used_cols = {st.session_state.current_params.get(name)
+                         for name in ('value_col', 'group_col', 'col_x', 'col_y', 'x_col', 'y_col')}
+            strata_options = ["（不分层）"] + [c for c in potential_group_cols if c not in used_cols]
+            strata_choice = st.selectbox(
+                "分层变量（可选）",
+                strata_options,
+                key="strata_col",
+                help="按中心、性别、批次等变量分层，在每一层分别执行分析，并给出逆方差加权的合并估计"
+            )
+            st.session_state.current_params['strata_col'] = None if strata_choice == "（不分层）" else strata_choice
+            
             # 执行分析按钮
             if st.button("🚀 执行分析", type="primary", use_container_width=True, key="run_analysis"):
                 st.rerun()
         else:
             st.info("👆 请先上传数据")
+    
+    # 功效分析与样本量规划（不依赖数据，功效曲线由缓存的查找表插值得到）
+    with st.expander("📐 功效与样本量", expanded=False):
+        power_tasks = {
+            "两组比较（t 检验 / Mann–Whitney）": 'ttest',
+            "多组比较（单因素 ANOVA）": 'anova',
+            "相关性分析（Pearson / Spearman）": 'correlation',
+            "简单线性回归": 'regression',
+        }
+        power_keys = list(POWER_TESTS)
+        default_test = power_tasks.get(st.session_state.current_task, 'ttest')
+        power_test = st.selectbox("检验类型", power_keys, index=power_keys.index(default_test),
+                                  format_func=lambda key: POWER_TESTS[key], key="power_test")
+        effect_ranges = {'ttest': (0.05, 2.0, 0.5), 'anova': (0.05, 1.0, 0.25),
+                         'correlation': (0.05, 0.95, 0.3), 'regression': (0.01, 1.0, 0.15)}
+        low, high, default = effect_ranges[power_test]
+        power_effect = st.slider(f"效应量（{EFFECT_LABELS[power_test]}）", low, high, default, 0.01,
+                                 key=f"power_effect_{power_test}")
+        power_k = st.number_input("组数", min_value=2, max_value=20, value=3, step=1,
+                                  key="power_k") if power_test == 'anova' else 3
+        power_alpha = st.session_state.current_params.get('alpha', 0.05)
+        power_target = st.slider("目标功效", 0.5, 0.99, 0.8, 0.01, key="power_target")
+        
+        ns, powers = power_curve(power_test, power_effect, alpha=power_alpha, k=power_k)
+        unit = "每组" if power_test in ('ttest', 'anova') else "总"
+        st.line_chart(pd.DataFrame({'功效': powers}, index=pd.Index(ns, name=f"{unit}样本量")), height=180)
+        required = sample_size(power_test, power_effect, target=power_target, alpha=power_alpha, k=power_k)
+        if np.isnan(required):
+            st.caption("在样本量上限内无法达到目标功效")
+        else:
+            st.caption(f"α = {power_alpha}，达到功效 {power_target:.2f} 所需{unit}样本量：{int(required)}")
 
 # ==================== 主内容区（2:1 布局） ====================
 if st.session_state.current_df is not None and st.session_state.current_task:
@@ -2012,6 +2145,19 @@ if st.session_state.current_df is not None and st.session_state.current_task:
     task = st.session_state.current_task
     params = st.session_state.current_params
     
+    # 超出内存预算的数据：只读取当前分析用到的列
+    dataset = st.session_state.current_dataset
+    if dataset is not None and not dataset.complete:
+        # 只取当前任务的变量，其他任务遗留的选择不在读取范围内
+        analysis_cols = [params[name] for name in TASKS.get(TASK_KEYS.get(task), ()) + ('strata_col',)
+                         if params.get(name)]
+        try:
+            with st.spinner("正在读取分析所需的列..."):
+                df = read_dataset(uploaded_file, lambda dataset: dataset.materialize(analysis_cols))
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            st.stop()
+    
     col_main, col_right = st.columns([2, 1])
     
     # ==================== 中间主区（图 + 结果） ====================
@@ -3189,6 +3335,52 @@ if st.session_state.current_df is not None and st.session_state.current_task:
                 
                 st.info(f"💡 {result['explanation_zh']}")
                 
+                # 效应量的 Bootstrap 置信区间（按数据指纹与参数缓存，界面重新运行时直接取缓存，不再重抽样）
+                if params.get('bootstrap_ci') and 'bootstrap_ci' not in result['extra_info']:
+                    boot_progress = st.progress(0.0, text="Bootstrap 重抽样中...")
+                    try:
+                        attach_bootstrap_ci(
+                            result, df,
+                            value_col=params.get('value_col'), group_col=params.get('group_col'),
+                            col_x=params.get('col_x'), col_y=params.get('col_y'),
+                            n_jobs=1 if len(df) < 10000 else (os.cpu_count() or 1), executor="process",
+                            progress=lambda done, total: boot_progress.progress(
+                                done / total, text=f"Bootstrap 重抽样中... {done}/{total}"),
+                        )
+                    except ValueError as e:
+                        st.warning(f"⚠️ Bootstrap 置信区间计算失败：{e}")
+                    boot_progress.empty()
+                boot = result['extra_info'].get('bootstrap_ci')
+                if boot:
+                    effect_names = {'cohens_d': "Cohen's d", 'r_effect': "效应量 r", 'eta_squared': "η²", 'pearson_r': "Pearson r"}
+                    st.markdown(
+                        f"**{effect_names.get(boot['statistic'], boot['statistic'])}：** {boot['estimate']:.4f}，"
+                        f"{boot['confidence']:.0%} Bootstrap 置信区间（{boot['method'].upper()}，{boot['n_resamples']} 次重抽样）："
+                        f"[{boot['ci_lower']:.4f}, {boot['ci_upper']:.4f}]"
+                    )
+                
+                # 分层分析：每一层的结果与合并估计
+                strata_col = params.get('strata_col')
+                if strata_col and strata_col in df.columns:
+                    strat_task = TASK_KEYS.get(task)
+                    if strat_task:
+                        st.markdown("---")
+                        st.markdown(f"**🧩 分层分析（按 {strata_col} 分层）**")
+                        try:
+                            strat = stratified_analysis(
+                                df, strat_task, strata_col, alpha=params.get('alpha', 0.05),
+                                n_jobs=min(4, os.cpu_count() or 1),
+                                **{name: params.get(name) for name in TASKS[strat_task]}
+                            )
+                            strat_df = strat['summary'].rename(columns={
+                                'stratum': "层", 'n': "样本量", 'method_name': "方法", 'stat': "统计量",
+                                'p_value': "p 值", 'significant': "显著", 'error': "错误信息"
+                            })
+                            st.dataframe(strat_df, use_container_width=True, hide_index=True)
+                            st.info(f"💡 {strat['explanation_zh']}")
+                        except ValueError as e:
+                            st.warning(f"⚠️ 分层分析失败：{e}")
+                
                 # 多组比较的事后检验（Post-hoc test）
                 if task == "多组比较（单因素 ANOVA）":
                     p_val = result['p_value']
@@ -3201,45 +3393,55 @@ if st.session_state.current_df is not None and st.session_state.current_task:
                         value_col = params.get('value_col')
                         group_col = params.get('group_col')
                         if value_col and group_col:
+                            posthoc_method = st.selectbox(
+                                "事后检验方法",
+                                list(POSTHOC_METHODS),
+                                format_func=POSTHOC_METHODS.get,
+                                # 默认与自动选择的检验方法对应：Welch 方差分析 → Games-Howell，Kruskal-Wallis → Dunn
+                                index=list(POSTHOC_METHODS).index(
+                                    "games_howell" if result['method_name'].startswith("Welch")
+                                    else "dunn" if result['method_name'].startswith("Kruskal") else "tukey"
+                                ),
+                                key="posthoc_method",
+                                help="Tukey HSD：方差齐性时的经典方法；Games-Howell：方差不齐时使用；Dunn：基于秩的非参数方法；成对 t 检验：Bonferroni / Holm 校正"
+                            )
                             try:
-                                from scipy.stats import tukey_hsd
+                                # 全部组对一次向量化计算（组名按排序显示）
+                                posthoc_df = posthoc(df, value_col, group_col, method=posthoc_method, alpha=alpha_val)
                                 
-                                groups = sorted(df[group_col].unique())
-                                group_data = [df[df[group_col] == g][value_col].dropna() for g in groups]
-                                
-                                # 使用Tukey HSD检验
-                                tukey_result = tukey_hsd(*group_data)
+                                page_col1, page_col2 = st.columns(2)
+                                with page_col1:
+                                    significant_only = st.checkbox("只显示显著的组对", value=False, key="posthoc_significant_only")
+                                _, n_pages = posthoc_page(posthoc_df, 1, 50, significant_only)
+                                with page_col2:
+                                    page = st.number_input(f"页码（共 {n_pages} 页）", min_value=1, max_value=n_pages, value=1, step=1, key="posthoc_page") if n_pages > 1 else 1
+                                page_df, _ = posthoc_page(posthoc_df, page, 50, significant_only, sort_by_p=True)
                                 
-                                # 创建成对比较结果表格
-                                posthoc_data = []
-                                for i in range(len(groups)):
-                                    for j in range(i+1, len(groups)):
-                                        p_adj = tukey_result.pvalue[i, j]
-                                        p_display = f"{p_adj:.4e}" if p_adj < 0.001 else f"{p_adj:.4f}"
-                                        significant = "是" if p_adj < alpha_val else "否"
-                                        posthoc_data.append({
-                                            "组1": str(groups[i]),
-                                            "组2": str(groups[j]),
-                                            "p值（调整后）": p_display,
-                                            f"显著（α={alpha_val}）": significant
-                                        })
+                                diff_label = "平均秩差" if posthoc_method == "dunn" else "均值差"
+                                p_adj = page_df['p_value'].to_numpy()
+                                table = pd.DataFrame({
+                                    "组1": page_df['group1'].astype(str).to_numpy(),
+                                    "组2": page_df['group2'].astype(str).to_numpy(),
+                                    diff_label: page_df['mean_diff'].round(4).to_numpy(),
+                                    "p值（调整后）": [f"{p:.4e}" if p < 0.001 else f"{p:.4f}" for p in p_adj],
+                                    f"显著（α={alpha_val}）": np.where(page_df['significant'], "是", "否"),
+                                })
+                                st.dataframe(table, use_container_width=True, hide_index=True)
                                 
-                                if posthoc_data:
-                                    import pandas as pd
-                                    posthoc_df = pd.DataFrame(posthoc_data)
-                                    st.dataframe(posthoc_df, use_container_width=True, hide_index=True)
-                                    
-                                    # 显示显著差异的组对
-                                    significant_pairs = [row for row in posthoc_data if row[f"显著（α={alpha_val}）"] == "是"]
-                                    if significant_pairs:
-                                        st.success(f"✅ 发现 {len(significant_pairs)} 对组间存在显著差异：")
-                                        for pair in significant_pairs:
-                                            st.write(f"  - {pair['组1']} vs {pair['组2']}: p = {pair['p值（调整后）']}")
-                                    else:
-                                        st.info("ℹ️ 虽然ANOVA显示各组间存在显著差异，但Tukey HSD检验未发现任何组对间存在显著差异（可能由于多重比较校正）。")
+                                # 显示显著差异的组对（最多列出 20 对）
+                                significant_pairs = posthoc_df[posthoc_df['significant']].sort_values('p_value', kind='stable')
+                                if len(significant_pairs):
+                                    st.success(f"✅ 发现 {len(significant_pairs)} 对组间存在显著差异（{POSTHOC_METHODS[posthoc_method]}）：")
+                                    for row in significant_pairs.head(20).itertuples():
+                                        p_display = f"{row.p_value:.4e}" if row.p_value < 0.001 else f"{row.p_value:.4f}"
+                                        st.write(f"  - {row.group1} vs {row.group2}: p = {p_display}")
+                                    if len(significant_pairs) > 20:
+                                        st.caption(f"其余 {len(significant_pairs) - 20} 对请在上表中翻页查看。")
+                                else:
+                                    st.info(f"ℹ️ 虽然ANOVA显示各组间存在显著差异，但{POSTHOC_METHODS[posthoc_method]}未发现任何组对间存在显著差异（可能由于多重比较校正）。")
                                         
                             except Exception as e:
-                                st.warning(f"⚠️ 无法执行Tukey HSD检验：{str(e)}。可能原因：样本量不足或数据不符合要求。")
+                                st.warning(f"⚠️ 无法执行{POSTHOC_METHODS[posthoc_method]}：{str(e)}。可能原因：样本量不足或数据不符合要求。")
                 
                 # 统计量显示选项和表格（仅在统计结果区域显示）
                 st.markdown("---")
@@ -3259,8 +3461,9 @@ if st.session_state.current_df is not None and st.session_state.current_task:
                     value_col = params.get('value_col')
                     group_col = params.get('group_col')
                     if value_col and group_col and st.session_state.show_stats:
-                        groups = sorted(df[group_col].unique()) if task == "多组比较（单因素 ANOVA）" else df[group_col].unique()
-                        data_list = [df[df[group_col] == g][value_col].dropna() for g in groups]
+                        grouped = GroupedData.from_frame(df, value_col, group_col, sort=(task == "多组比较（单因素 ANOVA）"))
+                        groups = grouped.labels
+                        data_list = [pd.Series(segment) for segment in grouped.segments()]
                         
                         # 计算统计量
                         from scipy import stats
@@ -3403,7 +3606,7 @@ if st.session_state.current_df is not None and st.session_state.current_task:
 单因素方差分析适用于比较三个或更多组间的均值差异，能够同时检验所有组间是否存在显著差异，避免多次两两比较带来的多重比较问题。
 
 【统计结果】
-F统计量 = {result['stat']:.4f}，p值 = {p_display}（显著性水平 α = {alpha_val}）。
+{'H统计量' if result['method_name'].startswith('Kruskal') else 'F统计量'} = {result['stat']:.4f}，p值 = {p_display}（显著性水平 α = {alpha_val}）。
 在 α = {alpha_val} 水平下，各组间差异{'具有' if p_val < alpha_val else '不具有'}统计学意义（p {'<' if p_val < alpha_val else '≥'} {alpha_val}）。"""
                     
                     if p_val < alpha_val and 'posthoc' in result.get('extra_info', {}):
@@ -4,15 +4,13 @@
 检查文件编码的脚本
 """
 import os
-import chardet
+
+from phi3_stat_studio.data_ingest import detect_encoding as detect_sample_encoding
 
 def detect_encoding(file_path):
-    """检测文件编码"""
+    """检测文件编码（只读取文件开头的有限字节样本）"""
     try:
-        with open(file_path, 'rb') as f:
-            raw_data = f.read()
-            result = chardet.detect(raw_data)
-            return result['encoding'], result['confidence']
+        return detect_sample_encoding(file_path)
     except Exception as e:
         return None, str(e)
 
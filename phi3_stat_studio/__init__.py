@@ -4,6 +4,7 @@ __all__ = [
     "config",
     "localization",
     "data_loader",
+    "data_ingest",
     "analysis",
     "reporting",
     "planner",
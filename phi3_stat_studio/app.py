@@ -30,6 +30,7 @@ from PySide6.QtWidgets import (
 from .config import CONFIG
 from .localization import translate
 from .data_loader import DataLoader, DataFrameBundle
+from .data_ingest import DatasetCache
 from .analysis import (
     compute_descriptive_statistics,
     one_sample_t_test,
@@ -57,6 +58,11 @@ class MainWindow(QMainWindow):
 
         self.context = AnalysisContext()
         self.report_builder = ReportBuilder(language=self.context.language)
+        try:
+            self.dataset_cache: Optional[DatasetCache] = DatasetCache(CONFIG.paths.storage_dir / "datasets")
+        except OSError:
+            # Storage directory not writable: load files without caching
+            self.dataset_cache = None
 
         self._create_menu()
         self._create_widgets()
@@ -243,7 +249,7 @@ class MainWindow(QMainWindow):
             self,
             translate("action.open_file", self.context.language),
             str(Path.home()),
-            "CSV/Excel (*.csv *.xlsx *.xls)",
+            "Data (*.csv *.xlsx *.xls *.parquet *.pq *.feather *.arrow *.ipc)",
         )
         if file_path:
             self._load_data(Path(file_path))
@@ -258,7 +264,7 @@ class MainWindow(QMainWindow):
 
     def _load_data(self, path: Path) -> None:
         try:
-            bundle = DataLoader.load(path)
+            bundle = DataLoader.load(path, cache=self.dataset_cache)
             self._set_data_bundle(bundle)
             self.label_selected_file.setText(f"{translate('label.selected_file', self.context.language)}: {path.name}")
         except Exception:
@@ -397,25 +403,25 @@ class MainWindow(QMainWindow):
         point_size = int(self.point_size_spin.value())
 
         if analysis_tag == "descriptive":
-            stats = compute_descriptive_statistics(bundle.dataframe, column)
+            stats = compute_descriptive_statistics(bundle.frame([column]), column)
             result_data["statistics"] = stats
             explanation = self._build_explanation("descriptive", stats)
-            chart_bytes = create_histogram(bundle.dataframe, column, title=title, bins=bins, palette=palette, font_size=font_size)
+            chart_bytes = create_histogram(bundle.frame([column]), column, title=title, bins=bins, palette=palette, font_size=font_size)
             code_lines = [
                 "import pandas as pd",
                 "import seaborn as sns",
                 "import matplotlib.pyplot as plt",
-                f"df = pd.read_csv('{bundle.path}')" if bundle.path else "# Data loaded from sample",
+                f"df = pd.{DataLoader.PANDAS_READERS[bundle.path.suffix.lower()]}('{bundle.path}')" if bundle.path else "# Data loaded from sample",
                 f"stats = df['{column}'].describe()",
                 "sns.histplot(df['{col}'], kde=True, bins={bins})".format(col=column, bins=bins),
                 "plt.show()",
             ]
         elif analysis_tag == "t_test_one_sample":
             reference = float(self.reference_input.text() or 0.0)
-            outcome = one_sample_t_test(bundle.dataframe, column, reference)
+            outcome = one_sample_t_test(bundle.frame([column]), column, reference)
             result_data["statistics"] = outcome.to_dict()
             explanation = self._build_explanation("t_test_one_sample", outcome.to_dict())
-            chart_bytes = create_histogram(bundle.dataframe, column, title=title, bins=bins, palette=palette, font_size=font_size)
+            chart_bytes = create_histogram(bundle.frame([column]), column, title=title, bins=bins, palette=palette, font_size=font_size)
             code_lines = [
                 "from scipy import stats",
                 f"t_stat, p_value = stats.ttest_1samp(df['{column}'], {reference})",
@@ -425,10 +431,10 @@ class MainWindow(QMainWindow):
             if not group_item:
                 raise ValueError("Please select a group column")
             group_column = group_item.text()
-            outcome = independent_t_test(bundle.dataframe, column, group_column)
+            outcome = independent_t_test(bundle.frame([column, group_column]), column, group_column)
             result_data["statistics"] = outcome.to_dict()
             explanation = self._build_explanation("t_test_two_sample", outcome.to_dict())
-            chart_bytes = create_histogram(bundle.dataframe, column, title=title, bins=bins, palette=palette, font_size=font_size)
+            chart_bytes = create_histogram(bundle.frame([column]), column, title=title, bins=bins, palette=palette, font_size=font_size)
             code_lines = [
                 "from scipy import stats",
                 f"grouped = df.groupby('{group_column}')['{column}']",
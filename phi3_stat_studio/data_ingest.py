@@ -0,0 +1,1217 @@
+"""
+分块数据读取引擎：在固定内存预算内流式读取 CSV，按列投影读取 Parquet / Feather / Arrow IPC
+
+文件按块读取（安装了 pyarrow 时用 pyarrow 的流式 CSV 读取器，否则用 pandas 的分块读取），
+未指定编码时先用文件开头有限的字节样本识别编码（GBK / GB18030 等），读取时由解析器边读边转码，
+不需要把整个文件转码后再解析。每块依次送入：
+- 各列的概况统计（非缺失数、均值、标准差、最小值、最大值、不同取值个数，可合并的充分统计量）；
+- 固定行数的随机预览样本（蓄水池抽样，与分块方式无关）；
+- 调用方传入的累加器（如 stats_accumulators.GroupMoments / PairMoments）。
+
+数据在内存预算的一半以内时保留各块，读完后拼接为完整 DataFrame，不需要再读一遍；
+超出时丢弃已读的块，只保留概况与样本，分析需要逐行数据时再按所需列（列投影）重新读取。
+
+Parquet 与 Arrow IPC（Feather V2）文件打开时只读取元数据，分析时只读取用到的列；
+本地文件通过内存映射读取，未压缩的 IPC 文件直接使用映射的缓冲区，不复制数据。
+
+读出的 DataFrame 经过类型压缩（compact_frame）：低基数的文本列转换为 category，
+数值列在取值可以精确表示时降为更窄的类型，转换记录在数据集的 dtype_map 中。
+数值列仍为数值类型、文本列仍为非数值类型，select_dtypes 的结果不变。
+
+DatasetCache 按文件内容的哈希把解析结果保存为 Parquet，同一文件再次读取时直接按列读取缓存。
+"""
+import codecs
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    from chardet.universaldetector import UniversalDetector
+    CHARDET_AVAILABLE = True
+except ImportError:
+    CHARDET_AVAILABLE = False
+
+
+# 默认内存预算（字节）：保留的数据块与最终拼接的 DataFrame 合计不超过该值
+DEFAULT_MEMORY_BUDGET = 1024 * 1024 * 1024
+
+# 每块读取的原始字节数上下限
+MIN_BLOCK_SIZE = 1024 * 1024
+MAX_BLOCK_SIZE = 64 * 1024 * 1024
+
+# 预览样本行数
+PREVIEW_ROWS = 1000
+
+# 每列记录不同取值计数的上限（超过后只记为"多于该值"）
+DISTINCT_LIMIT = 1000
+
+# 文本列转换为 category 的条件：不同取值不超过该值，且不超过行数的一半
+CATEGORY_LIMIT = 1000
+
+_SIGNED_TYPES = (np.int8, np.int16, np.int32)
+_UNSIGNED_TYPES = (np.uint8, np.uint16, np.uint32)
+
+# 按列读取的二进制格式（扩展名 → 格式）
+ARROW_FORMATS = {
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'ipc',
+    '.arrow': 'ipc',
+    '.ipc': 'ipc',
+}
+
+# 数据集缓存的格式版本：解析或压缩规则变化时递增，使旧的缓存条目失效
+DATASET_CACHE_VERSION = 1
+# 缓存预览样本文件中记录抽样参数（preview_rows、seed）的模式元数据键
+_PREVIEW_KEY = b'phi3.preview_sample'
+
+# 不影响解析结果、不计入缓存键的读取参数
+_UNKEYED_OPTIONS = ('block_size', 'engine', 'preview_rows', 'seed')
+
+# 识别编码时最多读取的字节数
+ENCODING_SAMPLE_SIZE = 1024 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# chardet 报告的编码 → 读取时使用的编码：纯 ASCII 样本按 UTF-8 读取；
+# 报告为 GB2312 / GBK 的文件常含其范围以外的字符，统一按兼容二者的 GB18030 读取
+_ENCODING_ALIASES = {
+    'ascii': 'utf-8',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+}
+
+
+def _is_path(source):
+    return isinstance(source, (str, Path))
+
+
+def _rewind(source):
+    """文件对象回到开头（路径无需处理）"""
+    if not _is_path(source):
+        if not hasattr(source, 'seek'):
+            raise ValueError("数据源必须是文件路径或可随机访问的文件对象")
+        source.seek(0)
+    return source
+
+
+def _iter_sample(source, sample_size=None, piece_size=64 * 1024):
+    """逐段读取文件开头至多 sample_size 个字节（None 为整个文件；文件对象读完后回到开头）"""
+    f = open(source, 'rb') if _is_path(source) else _rewind(source)
+    try:
+        remaining = float('inf') if sample_size is None else sample_size
+        while remaining > 0:
+            piece = f.read(int(min(piece_size, remaining)))
+            if not piece:
+                break
+            if isinstance(piece, str):
+                piece = piece.encode('utf-8')
+            remaining -= len(piece)
+            yield piece
+    finally:
+        if _is_path(source):
+            f.close()
+        else:
+            _rewind(source)
+
+
+def _bytes_per_line(source, sample_size=64 * 1024):
+    """由文件开头的字节样本估计每行的平均字节数"""
+    sample = b''.join(_iter_sample(source, sample_size))
+    return max(1, len(sample) // max(1, sample.count(b'\n')))
+
+
+def detect_encoding(source, sample_size=ENCODING_SAMPLE_SIZE):
+    """
+    识别文本文件的编码（只读取文件开头至多 sample_size 个字节）
+
+    依次判断：BOM；样本是否为合法 UTF-8（逐段增量解码）；否则逐段送入 chardet 的
+    UniversalDetector，识别结果足够确定时提前结束。
+
+    参数:
+        source: 文件路径或可随机访问的文件对象
+        sample_size: 最多读取的字节数
+
+    返回:
+        tuple: (编码名, 置信度)
+    """
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    is_utf8 = True
+    detector = UniversalDetector() if CHARDET_AVAILABLE else None
+    size = 0
+    for piece in _iter_sample(source, sample_size):
+        if size == 0:
+            for bom, encoding in _BOMS:
+                if piece.startswith(bom):
+                    return encoding, 1.0
+        size += len(piece)
+        if is_utf8:
+            try:
+                utf8.decode(piece)
+            except UnicodeDecodeError:
+                is_utf8 = False
+        if not is_utf8:
+            if detector is None:
+                break
+            detector.feed(piece)
+            if detector.done:
+                break
+    if is_utf8:
+        # 样本截断处可能是不完整的多字节字符，只有读完整个文件时才要求结尾完整
+        try:
+            utf8.decode(b'', final=size < sample_size)
+            return 'utf-8', 1.0
+        except UnicodeDecodeError:
+            is_utf8 = False
+    if detector is None:
+        return 'gb18030', 0.0
+    detector.close()
+    encoding = (detector.result['encoding'] or 'gb18030').lower()
+    return _ENCODING_ALIASES.get(encoding, encoding), detector.result['confidence']
+
+
+def _is_numeric(series):
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+
+def _compact_series(series, n_unique=None, n_rows=None):
+    """单列的压缩类型（不需要转换时返回原列）"""
+    dtype = series.dtype
+    if dtype == object or isinstance(dtype, pd.StringDtype):
+        if n_unique is None:
+            n_unique = series.nunique()
+        if n_rows is None:
+            n_rows = len(series)
+        if 0 < n_unique <= CATEGORY_LIMIT and 2 * n_unique <= n_rows:
+            return series.astype('category')
+        return series
+    if not isinstance(dtype, np.dtype) or series.count() == 0:
+        return series
+    if dtype.kind in 'iu' and dtype.itemsize > 1:
+        low, high = series.min(), series.max()
+        for candidate in (_SIGNED_TYPES if dtype.kind == 'i' else _UNSIGNED_TYPES):
+            info = np.iinfo(candidate)
+            if np.dtype(candidate).itemsize >= dtype.itemsize:
+                break
+            if info.min <= low and high <= info.max:
+                return series.astype(candidate)
+    elif dtype == np.float64:
+        values = series.to_numpy()
+        with np.errstate(over='ignore'):
+            narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+            return pd.Series(narrow, index=series.index, name=series.name)
+    return series
+
+
+def _compact(frame, n_unique=None, n_rows=None):
+    """压缩后的 DataFrame 与 {列名: 转换记录}"""
+    n_unique = n_unique or {}
+    records = {}
+    columns = {}
+    for column in frame.columns:
+        series = frame[column]
+        compacted = _compact_series(series, n_unique.get(column), n_rows)
+        if compacted is not series:
+            records[column] = {
+                'from_dtype': str(series.dtype),
+                'to_dtype': str(compacted.dtype),
+                'nbytes_before': int(series.memory_usage(deep=True, index=False)),
+                'nbytes_after': int(compacted.memory_usage(deep=True, index=False)),
+            }
+            columns[column] = compacted
+    if columns:
+        frame = frame.copy(deep=False)
+        for column, values in columns.items():
+            frame[column] = values
+    return frame, records
+
+
+def _dtype_map_frame(records):
+    frame = pd.DataFrame.from_dict(records, orient='index',
+                                   columns=['from_dtype', 'to_dtype', 'nbytes_before', 'nbytes_after'])
+    frame.index.name = 'column'
+    return frame
+
+
+def compact_frame(frame, n_unique=None, n_rows=None):
+    """
+    压缩 DataFrame 的列类型
+
+    - 文本列：不同取值不超过 CATEGORY_LIMIT 且不超过行数一半时转换为 category；
+    - 整数列：降为能容纳最小值与最大值的最窄整数类型；
+    - float64 列：所有取值都能用 float32 精确表示时降为 float32。
+
+    参数:
+        frame: DataFrame
+        n_unique: 已知的各列不同取值个数（如分块读取时对全部数据的统计），默认由 frame 计算
+        n_rows: 判断低基数时使用的总行数（默认 len(frame)）
+
+    返回:
+        tuple: (压缩后的 DataFrame, 转换记录 DataFrame：每个被转换的列一行，
+               from_dtype、to_dtype、nbytes_before、nbytes_after)
+    """
+    frame, records = _compact(frame, n_unique, n_rows)
+    return frame, _dtype_map_frame(records)
+
+
+class ColumnProfile:
+    """
+    各列的概况统计累加器
+
+    数值列的样本量、均值与离差平方和按 Chan 公式逐块合并（与 stats_accumulators 相同），
+    不同取值的计数在超过 DISTINCT_LIMIT 后停止记录。某块中不是数值类型的列此后不再视为数值列。
+    """
+
+    def __init__(self, distinct_limit=DISTINCT_LIMIT):
+        self.distinct_limit = distinct_limit
+        self.columns = []
+        self.n_rows = 0
+        self.count = {}
+        self.nbytes = {}
+        self.numeric = {}
+        self.n = {}
+        self.mean = {}
+        self.m2 = {}
+        self.min = {}
+        self.max = {}
+        self.distinct = {}
+
+    def _register(self, column):
+        self.columns.append(column)
+        self.count[column] = 0
+        self.nbytes[column] = 0
+        self.numeric[column] = self.n_rows == 0
+        self.n[column] = 0
+        self.mean[column] = 0.0
+        self.m2[column] = 0.0
+        self.min[column] = np.inf
+        self.max[column] = -np.inf
+        self.distinct[column] = {}
+
+    def update(self, chunk):
+        """
+        用一个数据块更新各列的概况
+
+        参数:
+            chunk: DataFrame 数据块
+
+        返回:
+            self
+        """
+        usage = chunk.memory_usage(deep=True, index=False)
+        for column in chunk.columns:
+            if column not in self.count:
+                self._register(column)
+            series = chunk[column]
+            self.count[column] += int(series.count())
+            self.nbytes[column] += int(usage[column])
+            self._update_distinct(column, series)
+            if not self.numeric[column]:
+                continue
+            if not _is_numeric(series):
+                self.numeric[column] = False
+                continue
+            values = series.to_numpy(dtype=float, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            if len(values) == 0:
+                continue
+            n_a, n_b = self.n[column], len(values)
+            n = n_a + n_b
+            mean_b = values.mean()
+            deviations = values - mean_b
+            delta = mean_b - self.mean[column]
+            self.mean[column] += delta * n_b / n
+            self.m2[column] += deviations @ deviations + delta * delta * n_a * n_b / n
+            self.n[column] = n
+            self.min[column] = min(self.min[column], values.min())
+            self.max[column] = max(self.max[column], values.max())
+        self.n_rows += len(chunk)
+        return self
+
+    def _update_distinct(self, column, series):
+        counts = self.distinct[column]
+        if counts is None:
+            return
+        chunk_counts = series.value_counts(dropna=True, sort=False)
+        if len(chunk_counts) > self.distinct_limit:
+            self.distinct[column] = None
+            return
+        for value, count in chunk_counts.items():
+            counts[value] = counts.get(value, 0) + int(count)
+        if len(counts) > self.distinct_limit:
+            self.distinct[column] = None
+
+    def nunique(self, column):
+        """不同取值个数（超过 distinct_limit 时返回 distinct_limit + 1）"""
+        counts = self.distinct[column]
+        return self.distinct_limit + 1 if counts is None else len(counts)
+
+    def value_counts(self, column):
+        """
+        各取值的出现次数（降序）
+
+        返回:
+            Series 或 None（不同取值超过 distinct_limit 时）
+        """
+        counts = self.distinct[column]
+        if counts is None:
+            return None
+        return pd.Series(counts, dtype='int64', name=column).sort_values(ascending=False, kind='stable')
+
+    def to_frame(self):
+        """
+        概况表（每列一行）
+
+        返回:
+            DataFrame: count、missing、mean、std、min、max、n_unique（超过上限为 NaN）、nbytes
+        """
+        rows = []
+        for column in self.columns:
+            numeric = self.numeric[column] and self.n[column] > 0
+            n = self.n[column]
+            rows.append({
+                'column': column,
+                'count': self.count[column],
+                'missing': self.n_rows - self.count[column],
+                'mean': self.mean[column] if numeric else np.nan,
+                'std': np.sqrt(self.m2[column] / (n - 1)) if numeric and n > 1 else np.nan,
+                'min': self.min[column] if numeric else np.nan,
+                'max': self.max[column] if numeric else np.nan,
+                'n_unique': np.nan if self.distinct[column] is None else len(self.distinct[column]),
+                'nbytes': self.nbytes[column],
+            })
+        return pd.DataFrame(rows).set_index('column')
+
+
+class ReservoirSample:
+    """
+    固定行数的均匀随机样本（蓄水池抽样）
+
+    每块内向量化处理：第 i 行（全局行号，从 0 开始）以 size / (i + 1) 的概率替换样本中的随机一行，
+    结果与逐行执行算法 R 相同，因此与分块方式无关。
+    """
+
+    def __init__(self, size=PREVIEW_ROWS, seed=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.seen = 0
+        self.rows = None
+        self.positions = np.zeros(0, dtype=np.int64)
+
+    def update(self, chunk):
+        """
+        用一个数据块更新样本
+
+        参数:
+            chunk: DataFrame 数据块
+
+        返回:
+            self
+        """
+        m = len(chunk)
+        positions = self.seen + np.arange(m)
+        # 样本未满时直接加入
+        fill = min(m, max(0, self.size - self.seen))
+        slots = np.full(m, -1, dtype=np.int64)
+        slots[:fill] = np.arange(self.seen, self.seen + fill)
+        if m > fill:
+            draws = self.rng.integers(0, positions[fill:] + 1)
+            slots[fill:] = np.where(draws < self.size, draws, -1)
+        self.seen += m
+
+        accepted = np.flatnonzero(slots >= 0)
+        if len(accepted) == 0:
+            if self.rows is None:
+                # 保留列结构，空数据的样本也有全部列
+                self.rows = chunk.iloc[:0].reset_index(drop=True)
+            return self
+        # 同一位置被多次替换时只保留最后一次
+        reversed_slots = slots[accepted][::-1]
+        _, last = np.unique(reversed_slots, return_index=True)
+        accepted = accepted[len(accepted) - 1 - last]
+
+        new_rows = chunk.iloc[accepted]
+        old = 0 if self.rows is None else len(self.rows)
+        take = np.arange(max(old, slots[accepted].max() + 1))
+        take[slots[accepted]] = old + np.arange(len(accepted))
+        combined = new_rows if self.rows is None else pd.concat([self.rows, new_rows], ignore_index=True)
+        self.rows = combined.iloc[take].reset_index(drop=True)
+        positions_all = np.concatenate([self.positions, positions[accepted]])
+        self.positions = positions_all[take]
+        return self
+
+    def to_frame(self):
+        """样本行（按原始行号排序，索引为原始行号）"""
+        if self.rows is None:
+            return pd.DataFrame()
+        order = np.argsort(self.positions, kind='stable')
+        return self.rows.iloc[order].set_index(pd.Index(self.positions[order]))
+
+
+def _block_size(memory_budget, block_size):
+    if block_size is None:
+        block_size = memory_budget // 16
+    return int(min(MAX_BLOCK_SIZE, max(MIN_BLOCK_SIZE, block_size)))
+
+
+def _dedup_names(names):
+    """重复的列名依次改为 name.1、name.2……（跳过已有的列名，与 pandas.read_csv 一致）"""
+    taken = set(names)
+    seen = set()
+    result = []
+    for name in names:
+        if name in seen:
+            suffix = 1
+            while f"{name}.{suffix}" in taken:
+                suffix += 1
+            name = f"{name}.{suffix}"
+            taken.add(name)
+        seen.add(name)
+        result.append(name)
+    return result
+
+
+def _pyarrow_chunks(source, block_size, usecols, encoding, sink=None):
+    """
+    pyarrow 流式读取；日期 / 时间列按字符串读取，与 pandas 的默认行为一致。
+    无法按编码解码的列会被推断为二进制类型，同样指定为字符串，使其在转换时报错。
+    重复的列名按 pandas 的规则改名；只有表头没有数据行时给出一个带全部列的空块。
+    """
+    read_options = pa_csv.ReadOptions(block_size=block_size, encoding=encoding or 'utf8')
+    convert_options = pa_csv.ConvertOptions(strings_can_be_null=True)
+
+    # 先不投影读取表头与类型：usecols 中的列名可能是去重后的名字
+    reader = pa_csv.open_csv(_rewind(source), read_options=read_options, convert_options=convert_options)
+    names = reader.schema.names
+    unique_names = _dedup_names(names)
+    if unique_names != names:
+        read_options = pa_csv.ReadOptions(block_size=block_size, encoding=encoding or 'utf8',
+                                          column_names=unique_names, skip_rows=1)
+    as_string = {name: pa.string() for name, field in zip(unique_names, reader.schema)
+                 if pa.types.is_temporal(field.type) or pa.types.is_binary(field.type)}
+    if unique_names != names or as_string or usecols is not None:
+        convert_options = pa_csv.ConvertOptions(include_columns=usecols, strings_can_be_null=True,
+                                                column_types=as_string)
+        reader = pa_csv.open_csv(_rewind(source), read_options=read_options, convert_options=convert_options)
+    empty = True
+    for batch in reader:
+        if sink is not None:
+            sink.write_batch(batch)
+        empty = False
+        yield batch.to_pandas()
+    if empty:
+        yield reader.schema.empty_table().to_pandas()
+
+
+def _pandas_chunks(source, block_size, usecols, encoding, read_csv_kwargs):
+    chunksize = max(1, block_size // _bytes_per_line(source))
+    with pd.read_csv(_rewind(source), usecols=usecols, encoding=encoding, chunksize=chunksize,
+                     **read_csv_kwargs) as reader:
+        yield from reader
+
+
+def csv_chunks(source, memory_budget=DEFAULT_MEMORY_BUDGET, block_size=None, usecols=None, encoding=None,
+               engine="auto", sink=None, **read_csv_kwargs):
+    """
+    分块读取 CSV 文件
+
+    参数:
+        source: 文件路径或可随机访问的文件对象（如 Streamlit 上传的文件）
+        memory_budget: 内存预算（字节），默认每块约为预算的 1/16
+        block_size: 每块读取的原始字节数（默认由 memory_budget 决定）
+        usecols: 只读取的列
+        encoding: 文件编码（默认 UTF-8），读取时逐块转码
+        engine: "auto"（安装了 pyarrow 且没有其他 read_csv 参数时用 pyarrow）、"pyarrow" 或 "c"
+        sink: 具有 write_batch 方法的对象，pyarrow 引擎解析出的每个 RecordBatch 同时写入其中
+              （如 DatasetCache 的 Parquet 写入器）；"c" 引擎不写入
+        **read_csv_kwargs: 传给 pd.read_csv 的其他参数（仅 "c" 引擎）
+
+    返回:
+        DataFrame 数据块的迭代器
+    """
+    if engine not in ("auto", "pyarrow", "c"):
+        raise ValueError('engine 必须为 "auto"、"pyarrow" 或 "c"')
+    block_size = _block_size(memory_budget, block_size)
+    if engine == "pyarrow" and (not PYARROW_AVAILABLE or read_csv_kwargs):
+        raise ValueError("pyarrow 引擎需要安装 pyarrow，且不支持其他 read_csv 参数")
+    if engine == "pyarrow" or (engine == "auto" and PYARROW_AVAILABLE and not read_csv_kwargs):
+        return _pyarrow_chunks(source, block_size, usecols, encoding, sink)
+    return _pandas_chunks(source, block_size, usecols, encoding, read_csv_kwargs)
+
+
+class IngestedDataset:
+    """
+    流式读取的结果
+
+    属性:
+        source: 数据源（按需重新读取时使用）
+        n_rows: 总行数
+        columns: 列名
+        profile: ColumnProfile 概况统计
+        preview: 随机预览样本（DataFrame，索引为原始行号）
+        frame: 完整 DataFrame（超出内存预算时为 None）
+        accumulators: 读取时更新的累加器（与 ingest_csv 的 accumulators 顺序相同）
+        memory_budget: 内存预算（字节）
+
+    frame、preview 与 materialize 的结果都经过 compact_frame 压缩，
+    是否转换为 category 按全部数据的不同取值个数判断。
+    """
+
+    def __init__(self, source, profile, preview, frame, accumulators, memory_budget, read_options):
+        self.source = source
+        self.profile = profile
+        self.accumulators = accumulators
+        self.memory_budget = memory_budget
+        self._read_options = read_options
+        self._materialized = {}
+        self._dtype_records = {}
+        self.preview, _ = _compact(preview, self._n_unique(), profile.n_rows)
+        self.frame = None if frame is None else self._compact(frame)
+
+    def _n_unique(self):
+        return {c: self.profile.nunique(c) for c in self.profile.columns}
+
+    def _compact(self, frame):
+        frame, records = _compact(frame, self._n_unique(), self.profile.n_rows)
+        self._dtype_records.update(records)
+        return frame
+
+    @property
+    def dtype_map(self):
+        """类型压缩的转换记录（每个被转换的列一行：from_dtype、to_dtype、nbytes_before、nbytes_after）"""
+        return _dtype_map_frame(self._dtype_records)
+
+    @property
+    def n_rows(self):
+        return self.profile.n_rows
+
+    @property
+    def columns(self):
+        return list(self.profile.columns)
+
+    @property
+    def encoding(self):
+        """读取时使用的编码"""
+        return self._read_options['encoding']
+
+    @property
+    def complete(self):
+        """是否已在内存中保留完整数据"""
+        return self.frame is not None
+
+    @property
+    def nbytes(self):
+        """完整数据在内存中的估计大小（字节）"""
+        return sum(self.profile.nbytes.values())
+
+    @property
+    def numeric_columns(self):
+        return [c for c in self.profile.columns if self.profile.numeric[c]]
+
+    @property
+    def categorical_columns(self):
+        return [c for c in self.profile.columns if not self.profile.numeric[c]]
+
+    def nunique(self, column):
+        """全部数据中该列的不同取值个数（超过 DISTINCT_LIMIT 时返回 DISTINCT_LIMIT + 1）"""
+        return self.profile.nunique(column)
+
+    def materialize(self, columns=None):
+        """
+        逐行数据（分析需要时调用）
+
+        已保留完整数据时直接返回（或其中的列）；否则只重新读取所需的列，
+        结果按列集合缓存，估计大小超过内存预算时报错。
+
+        参数:
+            columns: 所需列名（默认全部列）
+
+        返回:
+            DataFrame
+        """
+        if columns is not None:
+            columns = list(dict.fromkeys(columns))
+            missing = [c for c in columns if c not in self.profile.count]
+            if missing:
+                raise ValueError(f"数据中没有列：{', '.join(map(str, missing))}")
+        if self.frame is not None:
+            return self.frame if columns is None else self.frame[columns]
+
+        key = None if columns is None else tuple(columns)
+        if key not in self._materialized:
+            needed = sum(self.profile.nbytes[c] for c in (columns or self.profile.columns))
+            _check_budget(needed, self.memory_budget)
+            chunks = list(csv_chunks(self.source, self.memory_budget, usecols=columns, **self._read_options))
+            self._materialized = {key: self._compact(_concat(chunks, columns or self.profile.columns))}
+        return self._materialized[key]
+
+
+def _check_budget(needed, memory_budget):
+    if needed > memory_budget // 2:
+        raise ValueError(f"所需列的数据约 {needed / 1024**2:.0f} MB，超过内存预算的一半"
+                         f"（{memory_budget / 2 / 1024**2:.0f} MB），请减少分析变量或提高内存预算")
+
+
+def _arrow_input(source):
+    """本地文件用内存映射打开，文件对象（如上传的文件）直接包装其缓冲区"""
+    if _is_path(source):
+        return pa.memory_map(str(source), 'r')
+    if hasattr(source, 'getbuffer'):
+        return pa.BufferReader(pa.py_buffer(source.getbuffer()))
+    return pa.BufferReader(_rewind(source).read())
+
+
+def _is_numeric_type(arrow_type):
+    return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type)
+
+
+class ArrowDataset:
+    """
+    Parquet / Arrow IPC（Feather V2）数据集
+
+    打开时只读取文件元数据（模式、行数、各列大小）与开头 preview_rows 行（给定 preview 时不读取），
+    逐行数据由 materialize 按列投影读取：Parquet 只解码所需的列，IPC 只加载所需字段的缓冲区，
+    读出后经过 compact_frame 压缩。与 IngestedDataset 提供相同的属性与方法，可互换使用。
+
+    属性:
+        source: 数据源
+        format: "parquet" 或 "ipc"
+        schema: pyarrow.Schema
+        n_rows: 总行数
+        preview: 开头 preview_rows 行或给定的预览样本（DataFrame）
+        memory_budget: 内存预算（字节）
+    """
+
+    encoding = None
+    accumulators = ()
+
+    def __init__(self, source, fmt, memory_budget=DEFAULT_MEMORY_BUDGET, preview_rows=PREVIEW_ROWS, preview=None):
+        if not PYARROW_AVAILABLE:
+            raise ValueError("读取 Parquet / Feather / Arrow 文件需要安装 pyarrow")
+        if fmt not in ('parquet', 'ipc'):
+            raise ValueError('fmt 必须为 "parquet" 或 "ipc"')
+        self.source = source
+        self.format = fmt
+        self.memory_budget = memory_budget
+        self._materialized = {}
+        self._nunique = {}
+        self._frame = None
+        self._dtype_records = {}
+
+        if fmt == 'parquet':
+            parquet = pq.ParquetFile(_arrow_input(source))
+            self.schema = parquet.schema_arrow
+            self.n_rows = parquet.metadata.num_rows
+            self._nbytes = dict.fromkeys(self.schema.names, 0)
+            for i in range(parquet.metadata.num_row_groups):
+                row_group = parquet.metadata.row_group(i)
+                for j in range(row_group.num_columns):
+                    chunk = row_group.column(j)
+                    name = chunk.path_in_schema.split('.')[0]
+                    if name in self._nbytes:
+                        self._nbytes[name] += chunk.total_uncompressed_size
+            if preview is None:
+                batches = parquet.iter_batches(batch_size=max(1, preview_rows))
+                head = next(batches, None)
+                preview = head.to_pandas() if head is not None else self.schema.empty_table().to_pandas()
+                preview, _ = _compact(preview.iloc[:preview_rows])
+        else:
+            stream = _arrow_input(source)
+            try:
+                reader = pa_ipc.open_file(stream)
+            except pa.ArrowInvalid as e:
+                raise ValueError(f"不是 Arrow IPC / Feather V2 文件（Feather V1 请用 pyarrow 重新保存）：{e}") from e
+            self.schema = reader.schema
+            self.n_rows = reader.count_rows()
+            # 定长类型的大小可由行数算出，其余列平分剩下的文件大小
+            widths = {field.name: field.type.bit_width // 8 for field in self.schema
+                      if pa.types.is_primitive(field.type) and field.type.bit_width >= 8}
+            fixed = {name: width * self.n_rows for name, width in widths.items()}
+            variable = [name for name in self.schema.names if name not in fixed]
+            rest = max(0, stream.size() - sum(fixed.values()))
+            self._nbytes = {name: fixed.get(name, rest // max(1, len(variable))) for name in self.schema.names}
+            if preview is None:
+                rows, batches = 0, []
+                for i in range(reader.num_record_batches):
+                    if rows >= preview_rows:
+                        break
+                    batch = reader.get_batch(i)
+                    batches.append(batch)
+                    rows += batch.num_rows
+                preview = pa.Table.from_batches(batches, self.schema).slice(0, preview_rows).to_pandas()
+                preview, _ = _compact(preview.iloc[:preview_rows])
+        self.preview = preview
+
+    @property
+    def columns(self):
+        return list(self.schema.names)
+
+    @property
+    def nbytes(self):
+        """完整数据在内存中的估计大小（字节）"""
+        return sum(self._nbytes.values())
+
+    @property
+    def complete(self):
+        """全部列的估计大小在内存预算的一半以内（frame 可用）"""
+        return self.nbytes <= self.memory_budget // 2
+
+    @property
+    def frame(self):
+        """完整 DataFrame（首次访问时读取；超出内存预算时为 None）"""
+        if self._frame is None and self.complete:
+            self._frame = self._compact(self._read(self.columns).to_pandas())
+        return self._frame
+
+    @property
+    def numeric_columns(self):
+        return [field.name for field in self.schema if _is_numeric_type(field.type)]
+
+    @property
+    def categorical_columns(self):
+        return [field.name for field in self.schema if not _is_numeric_type(field.type)]
+
+    def _compact(self, frame):
+        frame, records = _compact(frame)
+        self._dtype_records.update(records)
+        return frame
+
+    @property
+    def dtype_map(self):
+        """类型压缩的转换记录（每个被转换的列一行：from_dtype、to_dtype、nbytes_before、nbytes_after）"""
+        return _dtype_map_frame(self._dtype_records)
+
+    def _read(self, columns):
+        """只读取给定列的 pyarrow.Table"""
+        if self.format == 'parquet':
+            return pq.read_table(_arrow_input(self.source), columns=columns)
+        fields = [self.schema.get_field_index(c) for c in columns]
+        reader = pa_ipc.open_file(_arrow_input(self.source), options=pa_ipc.IpcReadOptions(included_fields=fields))
+        return reader.read_all().select(columns)
+
+    def nunique(self, column):
+        """该列的不同取值个数（只读取这一列；超过 DISTINCT_LIMIT 时返回 DISTINCT_LIMIT + 1）"""
+        if column not in self._nunique:
+            if pa.types.is_null(self.schema.field(column).type):
+                # 全空列（count_distinct 没有 null 类型的实现）
+                count = 0
+            else:
+                count = pc.count_distinct(self._read([column]).column(0), mode='only_valid').as_py()
+            self._nunique[column] = min(count, DISTINCT_LIMIT + 1)
+        return self._nunique[column]
+
+    def materialize(self, columns=None):
+        """
+        逐行数据：只读取所需的列（结果按列集合缓存，超过内存预算时报错）
+
+        参数:
+            columns: 所需列名（默认全部列）
+
+        返回:
+            DataFrame
+        """
+        if columns is None:
+            columns = self.columns
+        columns = list(dict.fromkeys(columns))
+        missing = [c for c in columns if c not in self._nbytes]
+        if missing:
+            raise ValueError(f"数据中没有列：{', '.join(map(str, missing))}")
+        if self._frame is not None:
+            return self._frame[columns]
+        key = tuple(columns)
+        if key not in self._materialized:
+            table = self._read(columns)
+            _check_budget(table.nbytes, self.memory_budget)
+            self._materialized = {key: self._compact(table.to_pandas())}
+        return self._materialized[key]
+
+
+class _ParquetSink:
+    """把解析出的 RecordBatch 依次写入临时 Parquet 文件（第一批到达时按其模式创建写入器）"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.rows = 0
+        self.failed = False
+        self._writer = None
+
+    def write_batch(self, batch):
+        if self.failed:
+            return
+        try:
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, batch.schema)
+            self._writer.write_batch(batch)
+        except OSError:
+            # 写入失败（如磁盘空间不足）只放弃缓存，读取继续
+            self.abort()
+            self.failed = True
+            return
+        self.rows += batch.num_rows
+
+    def reset(self):
+        """丢弃已写入的内容（从头重新读取时调用）"""
+        self.abort()
+        self.rows = 0
+        self.failed = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def abort(self):
+        try:
+            self.close()
+        except OSError:
+            pass
+        self.path.unlink(missing_ok=True)
+
+
+class DatasetCache:
+    """
+    按文件内容缓存解析结果的 Parquet 文件（内容寻址：文件名为内容与读取参数的 SHA-256）
+
+    命中时返回打开缓存文件的 ArrowDataset（内存映射、按列读取），预览为读取时的随机预览样本：
+    样本与条目一起保存在 <键>.preview 文件中；该文件缺失或抽样参数不同时，对缓存文件重新做蓄水池抽样
+    （抽样结果与分块方式无关，与直接读取 CSV 得到的样本相同）。
+    条目的修改时间即最近访问时间：超过 max_age 未访问或总大小超过 max_bytes 时，
+    在写入新条目后按最近访问时间从旧到新删除。
+
+    参数:
+        directory: 缓存目录（默认为 phi3_stat_studio 配置的 storage_dir 下的 datasets）
+        max_bytes: 缓存文件总大小上限（字节）
+        max_age: 条目最长保留时间（秒）
+    """
+
+    def __init__(self, directory=None, max_bytes=2 * 1024 * 1024 * 1024, max_age=7 * 24 * 3600):
+        if not PYARROW_AVAILABLE:
+            raise ValueError("数据集缓存需要安装 pyarrow")
+        if directory is None:
+            from .config import CONFIG
+            directory = CONFIG.paths.storage_dir / "datasets"
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def key(self, source, options=None):
+        """
+        缓存键：文件内容（逐段读取）与影响解析结果的读取参数的 SHA-256
+
+        参数:
+            source: 文件路径或可随机访问的文件对象
+            options: ingest_csv 的读取参数
+
+        返回:
+            str: 十六进制摘要
+        """
+        digest = hashlib.sha256(f"v{DATASET_CACHE_VERSION}".encode())
+        keyed = {k: v for k, v in (options or {}).items() if k not in _UNKEYED_OPTIONS}
+        digest.update(repr(sorted(keyed.items(), key=lambda item: item[0])).encode())
+        if not _is_path(source) and hasattr(source, 'getbuffer'):
+            digest.update(source.getbuffer())
+        else:
+            for piece in _iter_sample(source, piece_size=1024 * 1024):
+                digest.update(piece)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return self.directory / f"{key}.parquet"
+
+    def _preview_path(self, key):
+        return self.directory / f"{key}.preview"
+
+    def _read_preview(self, key, path, preview_rows, seed):
+        """保存的预览样本（抽样参数不同或文件缺失时对缓存文件重新抽样并保存）"""
+        sample_key = repr((preview_rows, seed)).encode()
+        try:
+            table = pq.read_table(self._preview_path(key))
+            if (table.schema.metadata or {}).get(_PREVIEW_KEY) == sample_key:
+                return table.to_pandas()
+        except (OSError, pa.ArrowInvalid):
+            pass
+        reservoir = ReservoirSample(preview_rows, seed)
+        for batch in pq.ParquetFile(path).iter_batches():
+            reservoir.update(batch.to_pandas())
+        if reservoir.rows is None:
+            reservoir.rows = pq.read_schema(path).empty_table().to_pandas()
+        preview, _ = _compact(reservoir.to_frame())
+        try:
+            self._write_preview(key, preview, preview_rows, seed)
+        except OSError:
+            pass
+        return preview
+
+    def _write_preview(self, key, preview, preview_rows, seed):
+        table = pa.Table.from_pandas(preview)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_PREVIEW_KEY] = repr((preview_rows, seed)).encode()
+        path = self._preview_path(key)
+        tmp = path.with_suffix(f".preview.{os.getpid()}.tmp")
+        pq.write_table(table.replace_schema_metadata(metadata), tmp)
+        os.replace(tmp, path)
+
+    def get(self, key, memory_budget=DEFAULT_MEMORY_BUDGET, preview_rows=PREVIEW_ROWS, seed=0):
+        """
+        读取缓存条目
+
+        参数:
+            key: 缓存键
+            memory_budget: 内存预算（字节）
+            preview_rows: 预览样本行数
+            seed: 预览抽样的随机种子
+
+        返回:
+            ArrowDataset 或 None（未命中）
+        """
+        path = self._path(key)
+        try:
+            preview = self._read_preview(key, path, preview_rows, seed)
+            dataset = ArrowDataset(path, 'parquet', memory_budget, preview_rows, preview=preview)
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        except (ValueError, pa.ArrowInvalid):
+            # 已损坏的条目视为未命中并删除
+            self.misses += 1
+            path.unlink(missing_ok=True)
+            self._preview_path(key).unlink(missing_ok=True)
+            return None
+        self.hits += 1
+        return dataset
+
+    def put(self, key, frame, preview=None, preview_rows=PREVIEW_ROWS, seed=0):
+        """写入 DataFrame（先写临时文件再原子替换）及其预览样本，返回缓存文件路径"""
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        frame.to_parquet(tmp, index=False)
+        if preview is not None:
+            self._write_preview(key, preview, preview_rows, seed)
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def sink(self, key):
+        """流式写入器：读取过程中写入各 RecordBatch，由 commit 完成或 abort 放弃"""
+        return _ParquetSink(self._path(key).with_suffix(f".{os.getpid()}.tmp"))
+
+    def commit(self, key, sink, preview=None, preview_rows=PREVIEW_ROWS, seed=0):
+        """完成流式写入并放入缓存（同时保存预览样本），返回缓存文件路径"""
+        sink.close()
+        path = self._path(key)
+        if preview is not None:
+            self._write_preview(key, preview, preview_rows, seed)
+        os.replace(sink.path, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        """
+        删除过期条目与残留的临时文件，再按最近访问时间从旧到新删除，直到总大小回到上限以内
+        （预览样本随条目一起删除，没有对应条目的预览样本也删除）
+        """
+        now = time.time()
+        entries = []
+        for path in self.directory.iterdir():
+            if path.suffix not in ('.parquet', '.tmp'):
+                continue
+            try:
+                stat = path.stat()
+                if now - stat.st_mtime > self.max_age:
+                    path.unlink()
+                elif path.suffix == '.parquet':
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                # 已被其他进程删除，或仍被内存映射而无法删除（Windows）
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                continue
+        for path in self.directory.glob("*.preview"):
+            if not self._path(path.stem).exists():
+                path.unlink(missing_ok=True)
+
+    def clear(self):
+        for path in [*self.directory.glob("*.parquet"), *self.directory.glob("*.preview")]:
+            try:
+                path.unlink()
+            except OSError:
+                continue
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return self._path(key).exists()
+
+    def __len__(self):
+        return sum(1 for _ in self.directory.glob("*.parquet"))
+
+
+_dataset_cache = None
+
+
+def get_dataset_cache():
+    """进程内共用的数据集缓存（首次调用时在 storage_dir 下创建）"""
+    global _dataset_cache
+    if _dataset_cache is None:
+        _dataset_cache = DatasetCache()
+    return _dataset_cache
+
+
+def ingest_file(source, name=None, memory_budget=DEFAULT_MEMORY_BUDGET, cache=None, **options):
+    """
+    按扩展名读取数据文件：CSV 分块流式读取，Parquet / Feather / Arrow 按列投影读取
+
+    给定 cache 时，CSV 先按内容哈希查找缓存，命中则直接打开缓存的 Parquet；
+    未命中时在同一遍读取中把 pyarrow 解析出的数据块写入缓存（pandas 引擎读取时，
+    数据在内存预算以内则缓存压缩后的 DataFrame）。Parquet / Arrow 文件本身即可按列读取，不缓存。
+
+    参数:
+        source: 文件路径或可随机访问的文件对象
+        name: 文件名（source 为文件对象时用于判断格式，默认取 source 的路径或 name 属性）
+        memory_budget: 内存预算（字节）
+        cache: DatasetCache（默认不使用缓存；传入 accumulators 时不使用缓存）
+        **options: CSV 传给 ingest_csv，其他格式可指定 preview_rows
+
+    返回:
+        IngestedDataset 或 ArrowDataset
+    """
+    if name is None:
+        name = source if _is_path(source) else getattr(source, 'name', '')
+    suffix = Path(str(name)).suffix.lower()
+    if suffix in ARROW_FORMATS:
+        return ArrowDataset(source, ARROW_FORMATS[suffix], memory_budget, **options)
+    if suffix not in ('.csv', '.txt', ''):
+        raise ValueError(f"不支持的文件类型：{suffix}")
+    if cache is None or options.get('accumulators'):
+        return ingest_csv(source, memory_budget, **options)
+
+    key = cache.key(source, options)
+    sample = {'preview_rows': options.get('preview_rows', PREVIEW_ROWS), 'seed': options.get('seed', 0)}
+    dataset = cache.get(key, memory_budget, **sample)
+    if dataset is not None:
+        return dataset
+    sink = cache.sink(key)
+    try:
+        dataset = ingest_csv(source, memory_budget, sink=sink, **options)
+    except BaseException:
+        sink.abort()
+        raise
+    try:
+        if not sink.failed and sink.rows > 0 and sink.rows == dataset.n_rows:
+            cache.commit(key, sink, dataset.preview, **sample)
+        else:
+            sink.abort()
+            if dataset.complete:
+                cache.put(key, dataset.frame, dataset.preview, **sample)
+    except OSError:
+        # 缓存目录不可写或空间不足时只是不缓存，不影响读取结果
+        sink.abort()
+    return dataset
+
+
+def _concat(chunks, columns):
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def ingest_csv(source, memory_budget=DEFAULT_MEMORY_BUDGET, accumulators=(), block_size=None, usecols=None,
+               preview_rows=PREVIEW_ROWS, seed=0, encoding=None, engine="auto", sink=None, **read_csv_kwargs):
+    """
+    在内存预算内一次读完 CSV：计算概况、抽取预览样本并更新累加器
+
+    保留的数据块超过内存预算的一半时丢弃（拼接完整 DataFrame 还需要同样大小的内存），
+    之后由 IngestedDataset.materialize 按列重新读取。pyarrow 按第一块推断列类型，
+    后续块无法转换时（如整数列后面出现小数）改用 pandas 引擎从头重新读取。
+    自动识别为 UTF-8 的文件若在样本之后出现无法解码的字节（如开头全为 ASCII 的 GBK 文件），
+    按 GB18030 从头重新读取。
+
+    参数:
+        source: 文件路径或可随机访问的文件对象
+        memory_budget: 内存预算（字节）
+        accumulators: (累加器, 列名元组) 的序列，对每块调用 accumulator.update_frame(chunk, *列名)，
+                      如 [(GroupMoments(), ("value", "group")), (PairMoments(), ("x", "y"))]
+        block_size: 每块读取的原始字节数
+        usecols: 只读取的列
+        preview_rows: 预览样本行数
+        seed: 预览抽样的随机种子
+        encoding: 文件编码（默认由 detect_encoding 识别）
+        engine: 见 csv_chunks
+        sink: 见 csv_chunks（从头重新读取时先调用其 reset 方法）
+        **read_csv_kwargs: 传给 pd.read_csv 的其他参数
+
+    返回:
+        IngestedDataset（累加后的累加器见其 accumulators 属性）
+    """
+    detected = encoding is None
+    if detected:
+        encoding, _ = detect_encoding(source)
+    read_options = dict(block_size=block_size, encoding=encoding, engine=engine, **read_csv_kwargs)
+    while True:
+        try:
+            return _ingest(source, memory_budget, accumulators, usecols, preview_rows, seed, read_options, sink)
+        except UnicodeDecodeError as e:
+            if not (detected and read_options['encoding'] == 'utf-8'):
+                raise ValueError(f"无法按 {read_options['encoding']} 编码读取文件：{e}") from e
+            read_options.update(encoding='gb18030', engine=engine)
+        except ValueError as e:
+            if not (PYARROW_AVAILABLE and isinstance(e, pa.ArrowInvalid) and read_options['engine'] == "auto"):
+                raise
+            read_options['engine'] = "c"
+        # 已读入部分数据块的累加器换成新对象（结果见 IngestedDataset.accumulators）
+        accumulators = [(type(acc)(), columns) for acc, columns in accumulators]
+        if sink is not None:
+            sink.reset()
+
+
+def _ingest(source, memory_budget, accumulators, usecols, preview_rows, seed, read_options, sink=None):
+    profile = ColumnProfile()
+    reservoir = ReservoirSample(preview_rows, seed)
+    retained = []
+    retained_bytes = 0
+    for chunk in csv_chunks(source, memory_budget, usecols=usecols, sink=sink, **read_options):
+        profile.update(chunk)
+        reservoir.update(chunk)
+        for accumulator, columns in accumulators:
+            accumulator.update_frame(chunk, *columns)
+        if retained is not None:
+            retained_bytes += int(chunk.memory_usage(deep=True, index=False).sum())
+            if retained_bytes > memory_budget // 2:
+                retained = None
+            else:
+                retained.append(chunk)
+    frame = None if retained is None else _concat(retained, profile.columns)
+    return IngestedDataset(source, profile, reservoir.to_frame(), frame,
+                           [accumulator for accumulator, _ in accumulators], memory_budget, read_options)
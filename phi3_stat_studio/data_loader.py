@@ -3,35 +3,69 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Union
 
 import pandas as pd
 
+from .data_ingest import ARROW_FORMATS, ArrowDataset, DatasetCache, IngestedDataset, compact_frame, ingest_file
+
 
 @dataclass
 class DataFrameBundle:
-    """Container for loaded dataset and metadata."""
+    """Container for loaded dataset and metadata.
+
+    ``dataframe`` is None when a CSV file exceeds the ingestion memory budget;
+    use :meth:`frame` to read the columns an analysis needs.
+    """
 
     path: Optional[Path]
-    dataframe: pd.DataFrame
+    dataframe: Optional[pd.DataFrame]
     numeric_columns: List[str]
     categorical_columns: List[str]
+    dataset: Optional[Union[IngestedDataset, ArrowDataset]] = None
+
+    def frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Row-level data for ``columns`` (all columns by default)."""
+        if self.dataframe is not None:
+            return self.dataframe if columns is None else self.dataframe[columns]
+        return self.dataset.materialize(columns)
 
 
 class DataLoader:
-    """Load CSV/Excel data for analysis."""
+    """Load CSV/Excel/Parquet/Feather/Arrow IPC data for analysis."""
 
-    SUPPORTED_EXTENSIONS = {".csv", ".xlsx", ".xls"}
+    # pandas function that reads each supported file type (used in generated code)
+    PANDAS_READERS = {
+        ".csv": "read_csv",
+        ".xlsx": "read_excel",
+        ".xls": "read_excel",
+        ".parquet": "read_parquet",
+        ".pq": "read_parquet",
+        ".feather": "read_feather",
+        ".arrow": "read_feather",
+        ".ipc": "read_feather",
+    }
+    SUPPORTED_EXTENSIONS = set(PANDAS_READERS)
 
     @staticmethod
-    def load(path: Path) -> DataFrameBundle:
-        if path.suffix.lower() not in DataLoader.SUPPORTED_EXTENSIONS:
+    def load(path: Path, cache: Optional[DatasetCache] = None) -> DataFrameBundle:
+        """Load a data file; CSV files are looked up in ``cache`` by content hash first."""
+        suffix = path.suffix.lower()
+        if suffix not in DataLoader.SUPPORTED_EXTENSIONS:
             raise ValueError("Unsupported file type")
 
-        if path.suffix.lower() == ".csv":
-            df = pd.read_csv(path)
-        else:
-            df = pd.read_excel(path)
+        if suffix == ".csv" or suffix in ARROW_FORMATS:
+            # Arrow formats and cache hits only read metadata here; columns are read on demand
+            dataset = ingest_file(path, cache=cache)
+            return DataFrameBundle(
+                path=path,
+                dataframe=dataset.frame,
+                numeric_columns=dataset.numeric_columns,
+                categorical_columns=dataset.categorical_columns,
+                dataset=dataset,
+            )
+
+        df, _ = compact_frame(pd.read_excel(path))
 
         numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
         categorical_cols = df.select_dtypes(exclude=["number"]).columns.tolist()
@@ -0,0 +1,289 @@
+"""
+充分统计量累加器：分块读取、跨进程合并的 t 检验、方差分析、Pearson 相关与简单线性回归
+"""
+import numpy as np
+import pandas as pd
+
+from stats_core import (ttest_from_moments, anova_from_moments, welch_anova_from_moments, pearson_from_moments,
+                        regression_from_fit)
+from stats_regression import ols_from_moments
+
+
+class GroupMoments:
+    """
+    每组的样本量、均值与离差平方和（M2）累加器
+
+    采用 Welford / Chan 并行合并公式：块内先用两遍法求出各组矩，
+    再与已有结果合并，数值稳定且与数据分块方式无关。
+    组的顺序按首次出现排列，与 df[group_col].unique() 一致。
+    """
+
+    def __init__(self):
+        self.labels = []
+        self._index = {}
+        self.n = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+
+    def _register(self, labels):
+        """登记新出现的组，返回这些标签对应的全局组号"""
+        idx = np.empty(len(labels), dtype=np.int64)
+        for i, label in enumerate(labels):
+            if label not in self._index:
+                self._index[label] = len(self.labels)
+                self.labels.append(label)
+            idx[i] = self._index[label]
+        k = len(self.labels)
+        if k > len(self.n):
+            grow = k - len(self.n)
+            self.n = np.concatenate([self.n, np.zeros(grow, dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros(grow)])
+            self.m2 = np.concatenate([self.m2, np.zeros(grow)])
+        return idx
+
+    def _combine(self, idx, n_b, mean_b, m2_b):
+        """按 Chan 公式把另一批组矩合并到 idx 指定的组"""
+        n_a = self.n[idx]
+        n = n_a + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean_b - self.mean[idx]
+            mean = np.where(n > 0, self.mean[idx] + delta * n_b / n, 0.0)
+            m2 = np.where(n > 0, self.m2[idx] + m2_b + delta**2 * n_a * n_b / n, 0.0)
+        self.n[idx] = n
+        self.mean[idx] = mean
+        self.m2[idx] = m2
+
+    def update(self, values, groups):
+        """
+        用一个数据块更新累加器
+
+        参数:
+            values: 数值数组（可含 NaN，自动忽略）
+            groups: 与 values 等长的分组标签（缺失标签的行被忽略）
+
+        返回:
+            self
+        """
+        codes, labels = pd.factorize(pd.Series(groups))
+        values = np.asarray(values, dtype=float)
+        idx = self._register(list(labels))
+        k = len(labels)
+
+        valid = (codes >= 0) & ~np.isnan(values)
+        codes, values = codes[valid], values[valid]
+        n_b = np.bincount(codes, minlength=k)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.where(n_b > 0, np.bincount(codes, weights=values, minlength=k) / n_b, 0.0)
+        deviations = values - mean_b[codes]
+        m2_b = np.bincount(codes, weights=deviations * deviations, minlength=k)
+
+        self._combine(idx, n_b, mean_b, m2_b)
+        return self
+
+    def update_frame(self, chunk, value_col, group_col):
+        """用 DataFrame 数据块更新累加器"""
+        return self.update(chunk[value_col].to_numpy(dtype=float, na_value=np.nan), chunk[group_col])
+
+    def merge(self, other):
+        """
+        合并另一个累加器（例如其他进程处理的数据分片）
+
+        参数:
+            other: GroupMoments
+
+        返回:
+            self
+        """
+        idx = self._register(other.labels)
+        self._combine(idx, other.n, other.mean, other.m2)
+        return self
+
+    @classmethod
+    def from_grouped(cls, grouped):
+        """由 stats_grouping.GroupedData 构建累加器"""
+        acc = cls()
+        acc._register(list(grouped.labels))
+        acc.n[:] = grouped.n
+        acc.mean[:] = np.nan_to_num(grouped.means)
+        acc.m2[:] = grouped.m2
+        return acc
+
+    @classmethod
+    def from_csv(cls, path, value_col, group_col, chunksize=200_000, **read_csv_kwargs):
+        """
+        分块读取 CSV 文件并累加，内存占用只与块大小有关
+
+        参数:
+            path: CSV 文件路径或文件对象
+            value_col: 数值变量列名
+            group_col: 分组变量列名
+            chunksize: 每块行数
+            **read_csv_kwargs: 传给 pd.read_csv 的其他参数
+
+        返回:
+            GroupMoments
+        """
+        acc = cls()
+        reader = pd.read_csv(path, usecols=[value_col, group_col], chunksize=chunksize, **read_csv_kwargs)
+        for chunk in reader:
+            acc.update_frame(chunk, value_col, group_col)
+        return acc
+
+    @property
+    def n_groups(self):
+        return len(self.labels)
+
+    @property
+    def n_total(self):
+        return int(self.n.sum())
+
+    @property
+    def grand_mean(self):
+        return float(np.sum(self.n * self.mean) / self.n_total) if self.n_total > 0 else np.nan
+
+    def variances(self, ddof=1):
+        """每组方差"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.n > ddof, self.m2 / (self.n - ddof), np.nan)
+
+    def ttest(self, equal_var=True, alpha=0.05):
+        """
+        两组独立样本 t 检验（two_group_compare 的参数检验分支）
+
+        正态性与方差齐性检验需要原始数据，累加器无法给出，
+        因此由调用方通过 equal_var 指定等方差 t 检验或 Welch's t 检验，
+        结果中的 normality_p1 / normality_p2 / levene_p 为 None。
+
+        参数:
+            equal_var: True 为独立样本 t 检验，False 为 Welch's t 检验
+            alpha: 显著性水平
+
+        返回:
+            TwoGroupResult: 与 two_group_compare 相同结构的结果
+        """
+        if self.n_groups != 2:
+            raise ValueError(f"分组变量必须恰好有 2 个组，当前有 {self.n_groups} 个组")
+        if (self.n < 3).any():
+            raise ValueError("每组至少需要 3 个观测值")
+        return ttest_from_moments(self.n, self.mean, self.m2, equal_var=equal_var, alpha=alpha)
+
+    def anova(self, alpha=0.05):
+        """
+        单因素方差分析
+
+        参数:
+            alpha: 显著性水平
+
+        返回:
+            AnovaResult: 与 anova_oneway 相同结构的结果
+        """
+        if self.n_groups < 2:
+            raise ValueError("分组变量至少需要 2 个组")
+        if (self.n < 2).any():
+            raise ValueError("每组至少需要 2 个观测值")
+        return anova_from_moments(np.asarray(self.labels, dtype=object), self.n, self.mean, self.m2, alpha)
+
+    def welch_anova(self, alpha=0.05):
+        """
+        Welch 方差分析（不要求方差齐性）
+
+        参数:
+            alpha: 显著性水平
+
+        返回:
+            AnovaResult: 与 anova_oneway 相同结构的结果
+        """
+        if self.n_groups < 2:
+            raise ValueError("分组变量至少需要 2 个组")
+        if (self.n < 2).any():
+            raise ValueError("每组至少需要 2 个观测值")
+        return welch_anova_from_moments(np.asarray(self.labels, dtype=object), self.n, self.mean, self.m2, alpha)
+
+
+class PairMoments:
+    """
+    成对 (x, y) 观测的样本量、均值、离均差平方和与离均差积和累加器
+
+    只使用 x 与 y 同时有效的行（与 dropna 一致），按 Chan 公式合并，
+    可给出 Pearson 相关与简单线性回归的结果。
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.sxx = 0.0
+        self.syy = 0.0
+        self.sxy = 0.0
+
+    def _combine(self, n_b, mean_x_b, mean_y_b, sxx_b, syy_b, sxy_b):
+        """按 Chan 公式合并另一批成对矩"""
+        n_a = self.n
+        n = n_a + n_b
+        if n_b == 0:
+            return
+        dx = mean_x_b - self.mean_x
+        dy = mean_y_b - self.mean_y
+        weight = n_a * n_b / n
+        self.mean_x += dx * n_b / n
+        self.mean_y += dy * n_b / n
+        self.sxx += sxx_b + dx * dx * weight
+        self.syy += syy_b + dy * dy * weight
+        self.sxy += sxy_b + dx * dy * weight
+        self.n = n
+
+    def update(self, x, y):
+        """
+        用一个数据块更新累加器
+
+        参数:
+            x, y: 等长数值数组（任一为 NaN 的行被忽略）
+
+        返回:
+            self
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[valid], y[valid]
+        if len(x) == 0:
+            return self
+        mean_x = x.mean()
+        mean_y = y.mean()
+        dx = x - mean_x
+        dy = y - mean_y
+        self._combine(len(x), mean_x, mean_y, dx @ dx, dy @ dy, dx @ dy)
+        return self
+
+    def update_frame(self, chunk, x_col, y_col):
+        """用 DataFrame 数据块更新累加器"""
+        return self.update(chunk[x_col].to_numpy(dtype=float, na_value=np.nan),
+                           chunk[y_col].to_numpy(dtype=float, na_value=np.nan))
+
+    def merge(self, other):
+        """合并另一个累加器"""
+        self._combine(other.n, other.mean_x, other.mean_y, other.sxx, other.syy, other.sxy)
+        return self
+
+    def pearson(self, alpha=0.05):
+        """
+        Pearson 相关
+
+        返回:
+            CorrelationResult: 与 correlation（Pearson 分支）相同结构的结果
+        """
+        return pearson_from_moments(self.n, self.mean_x, self.mean_y, self.sxx, self.syy, self.sxy, alpha)
+
+    def ols(self, alpha=0.05):
+        """
+        简单线性回归（y 对 x）
+
+        返回:
+            RegressionResult: 与 linear_regression_simple 相同结构的结果
+        """
+        if self.n < 3:
+            raise ValueError("至少需要 3 对有效观测值")
+        if not self.sxx > 0:
+            raise ValueError("自变量 X 没有变异（所有取值相同），无法进行回归分析")
+        fit = ols_from_moments(self.n, self.mean_x, self.mean_y, self.sxx, self.syy, self.sxy, alpha)
+        return regression_from_fit(fit, alpha)
@@ -0,0 +1,418 @@
+"""
+检验前提条件（正态性、方差齐性）的计算与缓存
+"""
+import numpy as np
+from scipy import stats
+
+from stats_cache import LRUCache, array_fingerprint, data_fingerprint
+
+
+LARGE_N_STRATEGIES = ("normaltest", "shapiro_subsample", "anderson", "jarque_bera")
+
+
+def anderson_pvalue(values):
+    """
+    Anderson-Darling 正态性检验的近似 p 值（D'Agostino & Stephens 1986）
+
+    参数:
+        values: 一维数组
+
+    返回:
+        float: p 值
+    """
+    return _anderson_p(stats.anderson(values, dist='norm').statistic, len(values))
+
+
+def _anderson_p(a2, n):
+    """由 A² 统计量与样本量计算近似 p 值"""
+    a2_star = a2 * (1 + 0.75 / n + 2.25 / n**2)
+    if a2_star >= 0.6:
+        p = np.exp(1.2937 - 5.709 * a2_star + 0.0186 * a2_star**2)
+    elif a2_star >= 0.34:
+        p = np.exp(0.9177 - 4.279 * a2_star - 1.38 * a2_star**2)
+    elif a2_star >= 0.2:
+        p = 1 - np.exp(-8.318 + 42.796 * a2_star - 59.938 * a2_star**2)
+    else:
+        p = 1 - np.exp(-13.436 + 101.14 * a2_star - 223.73 * a2_star**2)
+    return float(min(max(p, 0.0), 1.0))
+
+
+def frequency_moments(values, counts):
+    """
+    频数表的样本量、均值与 2～4 阶中心矩（总体矩，除以 n）
+
+    返回:
+        tuple: (n, mean, m2, m3, m4)
+    """
+    n = counts.sum()
+    mean = counts @ values / n
+    d = values - mean
+    d2 = d * d
+    return n, mean, counts @ d2 / n, counts @ (d2 * d) / n, counts @ (d2 * d2) / n
+
+
+def normaltest_from_moments(n, m2, m3, m4):
+    """
+    由中心矩计算 D'Agostino-Pearson 正态性检验 p 值（与 scipy.stats.normaltest 公式一致）
+
+    参数:
+        n: 样本量（小于 8 时返回 NaN）
+        m2, m3, m4: 2～4 阶总体中心矩
+
+    返回:
+        float: p 值
+    """
+    if n < 8 or not m2 > 0:
+        return np.nan
+    b1 = m3 / m2**1.5
+    b2 = m4 / m2**2
+    # 偏度检验
+    y = b1 * np.sqrt(((n + 1) * (n + 3)) / (6.0 * (n - 2)))
+    beta2 = 3.0 * (n**2 + 27 * n - 70) * (n + 1) * (n + 3) / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9))
+    w2 = -1 + np.sqrt(2 * (beta2 - 1))
+    delta = 1 / np.sqrt(0.5 * np.log(w2))
+    a = np.sqrt(2.0 / (w2 - 1))
+    y = 1.0 if y == 0 else y
+    z_skew = delta * np.log(y / a + np.sqrt((y / a)**2 + 1))
+    # 峰度检验
+    e = 3.0 * (n - 1) / (n + 1)
+    var_b2 = 24.0 * n * (n - 2) * (n - 3) / ((n + 1) * (n + 1.0) * (n + 3) * (n + 5))
+    x = (b2 - e) / var_b2**0.5
+    sqrt_beta1 = 6.0 * (n * n - 5 * n + 2) / ((n + 7) * (n + 9)) * np.sqrt(6.0 * (n + 3) * (n + 5) / (n * (n - 2) * (n - 3)))
+    big_a = 6.0 + 8.0 / sqrt_beta1 * (2.0 / sqrt_beta1 + np.sqrt(1 + 4.0 / sqrt_beta1**2))
+    denom = 1 + x * np.sqrt(2 / (big_a - 4.0))
+    if denom == 0:
+        return np.nan
+    term2 = np.sign(denom) * ((1 - 2.0 / big_a) / abs(denom))**(1 / 3)
+    z_kurt = (1 - 2 / (9.0 * big_a) - term2) / np.sqrt(2 / (9.0 * big_a))
+    return float(stats.chi2.sf(z_skew**2 + z_kurt**2, 2))
+
+
+def jarque_bera_from_moments(n, m2, m3, m4):
+    """由中心矩计算 Jarque-Bera 检验 p 值（与 scipy.stats.jarque_bera 一致）"""
+    if not m2 > 0:
+        return np.nan
+    skew = m3 / m2**1.5
+    kurt = m4 / m2**2 - 3
+    return float(stats.chi2.sf(n / 6 * (skew**2 + kurt**2 / 4), 2))
+
+
+def anderson_frequency_pvalue(values, counts):
+    """
+    频数表的 Anderson-Darling 正态性检验近似 p 值（与对展开数据调用 anderson_pvalue 一致）
+
+    同一取值占据排序后的连续位置 a+1..a+c，A² 中的加权和可按取值成段求出。
+
+    参数:
+        values: 升序排列的不同取值
+        counts: 对应频数
+    """
+    n, mean, m2, _, _ = frequency_moments(values, counts)
+    s = np.sqrt(m2 * n / (n - 1))
+    w = (values - mean) / s
+    before = np.cumsum(counts) - counts
+    after = before + counts
+    # Σ(2i-1) over i = a+1..a+c 为 (a+c)² - a²；逆序项 Σ(2n+1-2j) 为 c(2n+1) - [(a+c)(a+c+1) - a(a+1)]
+    weight_cdf = after**2 - before**2
+    weight_sf = counts * (2 * n + 1) - (after * (after + 1) - before * (before + 1))
+    a2 = -n - (weight_cdf @ stats.norm.logcdf(w) + weight_sf @ stats.norm.logsf(w)) / n
+    return _anderson_p(a2, n)
+
+
+def levene_frequency(table):
+    """
+    频数表形式分组数据的 Levene 检验（中位数中心，与对展开数据调用 levene_grouped 一致）
+
+    参数:
+        table: stats_grouping.FrequencyGroupedData
+
+    返回:
+        tuple: (W 统计量, p 值)
+    """
+    k = table.n_groups
+    n_total = table.n_total
+    medians = np.array([table.quantile(i, 0.5) for i in range(k)])
+    z = np.abs(table.values - medians[table.codes])
+    c = table.counts
+    z_means = np.bincount(table.codes, weights=c * z, minlength=k) / table.n
+    z_grand = (c @ z) / n_total
+    between = np.sum(table.n * (z_means - z_grand)**2)
+    dev = z - z_means[table.codes]
+    within = c @ (dev * dev)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = (n_total - k) / (k - 1) * between / within
+    return w, stats.f.sf(w, k - 1, n_total - k)
+
+
+def levene_grouped(grouped):
+    """
+    由分组片段计算 Levene 检验（中位数中心，与 scipy.stats.levene 默认一致）
+
+    每组中位数用 np.median（基于 partition，O(n_i)），
+    离差的组均值与平方和用 bincount 一次完成，总体为 O(n)。
+
+    参数:
+        grouped: stats_grouping.GroupedData
+
+    返回:
+        tuple: (W 统计量, p 值)
+    """
+    k = grouped.n_groups
+    n_total = grouped.n_total
+    medians = np.array([np.median(seg) for seg in grouped.segments()])
+    z = np.abs(grouped.values - medians[grouped.codes])
+    z_means = np.bincount(grouped.codes, weights=z, minlength=k) / grouped.n
+    z_grand = z.sum() / n_total
+    between = np.sum(grouped.n * (z_means - z_grand)**2)
+    dev = z - z_means[grouped.codes]
+    within = np.sum(dev * dev)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = (n_total - k) / (k - 1) * between / within
+    return w, stats.f.sf(w, k - 1, n_total - k)
+
+
+class AssumptionChecker:
+    """
+    正态性与方差齐性检验，结果按（列、分组、数据指纹、检验设置）缓存
+
+    参数:
+        large_n_strategy: 样本量超过 shapiro_max_n 时的正态性检验方法
+            "normaltest"        D'Agostino-Pearson 偏度峰度检验（默认，与原实现一致）
+            "shapiro_subsample" 随机抽取 subsample_size 个观测做 Shapiro-Wilk
+            "anderson"          Anderson-Darling 检验（近似 p 值）
+            "jarque_bera"       基于偏度峰度矩的 Jarque-Bera 检验
+        shapiro_max_n: 使用 Shapiro-Wilk 的最大样本量
+        subsample_size: 抽样 Shapiro-Wilk 的样本量
+        seed: 抽样随机种子（保证同一数据结果可重复）
+        cache_size: 缓存的结果条数
+    """
+
+    def __init__(self, large_n_strategy="normaltest", shapiro_max_n=5000,
+                 subsample_size=5000, seed=0, cache_size=256):
+        if large_n_strategy not in LARGE_N_STRATEGIES:
+            raise ValueError(f"large_n_strategy 必须为 {', '.join(LARGE_N_STRATEGIES)} 之一")
+        self.large_n_strategy = large_n_strategy
+        self.shapiro_max_n = shapiro_max_n
+        self.subsample_size = subsample_size
+        self.seed = seed
+        self.cache = LRUCache(cache_size)
+
+    @property
+    def settings(self):
+        return (self.large_n_strategy, self.shapiro_max_n, self.subsample_size, self.seed)
+
+    def large_n_normality(self, values):
+        """按大样本策略计算正态性检验 p 值"""
+        strategy = self.large_n_strategy
+        if strategy == "normaltest":
+            return stats.normaltest(values).pvalue
+        if strategy == "shapiro_subsample":
+            rng = np.random.default_rng(self.seed)
+            sample = rng.choice(values, size=min(self.subsample_size, len(values)), replace=False)
+            return stats.shapiro(sample).pvalue
+        if strategy == "anderson":
+            return anderson_pvalue(values)
+        return stats.jarque_bera(values).pvalue
+
+    def frequency_normality(self, values, counts, strategy):
+        """
+        频数表的正态性检验 p 值，不展开为原始行
+
+        偏度峰度类检验与 Anderson-Darling 直接由频数计算；Shapiro-Wilk 只在样本量
+        不超过 shapiro_max_n 时使用，此时展开的行数有上限；抽样 Shapiro-Wilk 在按取值
+        排序的展开序列上抽取位置。
+
+        参数:
+            values: 不同取值
+            counts: 对应频数
+            strategy: "shapiro"、"normaltest" 或 LARGE_N_STRATEGIES 之一
+
+        返回:
+            float: p 值
+        """
+        order = np.argsort(values, kind='stable')
+        values, counts = np.asarray(values, dtype=float)[order], np.asarray(counts, dtype=float)[order]
+        n = int(counts.sum())
+        if strategy == "shapiro":
+            return stats.shapiro(np.repeat(values, counts.astype(np.int64))).pvalue
+        if strategy == "shapiro_subsample":
+            rng = np.random.default_rng(self.seed)
+            positions = rng.choice(n, size=min(self.subsample_size, n), replace=False)
+            sample = values[np.searchsorted(np.cumsum(counts), positions, side='right')]
+            return stats.shapiro(sample).pvalue
+        if strategy == "anderson":
+            return anderson_frequency_pvalue(values, counts)
+        moments = frequency_moments(values, counts)
+        if strategy == "normaltest":
+            return normaltest_from_moments(n, *moments[2:])
+        return jarque_bera_from_moments(n, *moments[2:])
+
+    def check_frequency_groups(self, table, value_col=None, group_col=None, weight_col=None):
+        """
+        频数表形式分组数据的正态性（每组）与方差齐性检验，返回结构同 check_groups
+
+        参数:
+            table: stats_grouping.FrequencyGroupedData
+            value_col / group_col / weight_col: 列名（只用于缓存键）
+        """
+        key = ("frequency_groups", value_col, group_col, weight_col,
+               array_fingerprint(table.values, table.counts, table.n, table.labels), self.settings)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        use_shapiro = bool((table.n <= self.shapiro_max_n).all())
+        method = "shapiro" if use_shapiro else self.large_n_strategy
+        p_values = np.full(table.n_groups, np.nan)
+        for i, (values, counts) in enumerate(table.segments()):
+            if table.n[i] >= (3 if use_shapiro else 8):
+                p_values[i] = self.frequency_normality(values, counts, method)
+        levene_stat, levene_p = levene_frequency(table)
+        result = {
+            'normality_p': p_values,
+            'use_shapiro': use_shapiro,
+            'normality_method': method,
+            'levene_stat': levene_stat,
+            'levene_p': levene_p,
+        }
+        self.cache.put(key, result)
+        return result
+
+    def check_frequency_columns(self, df, columns, weight_col):
+        """
+        频数表中多个数值列在共同完整行上的正态性检验（规则同 check_columns）
+
+        参数:
+            df: 频数表 DataFrame
+            columns: 列名列表
+            weight_col: 频数列名
+
+        返回:
+            dict: 列名 -> p 值
+        """
+        columns = list(columns)
+        key = ("frequency_columns", tuple(columns), weight_col,
+               data_fingerprint(df, columns + [weight_col]), self.settings)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        data = df[columns + [weight_col]].dropna()
+        counts = data[weight_col].to_numpy(dtype=float)
+        present = counts > 0
+        strategy = "normaltest" if counts.sum() <= self.shapiro_max_n else self.large_n_strategy
+        result = {}
+        for col in columns:
+            values = data[col].to_numpy(dtype=float)[present]
+            result[col] = self.frequency_normality(values, counts[present], strategy)
+        self.cache.put(key, result)
+        return result
+
+    def _group_normality(self, grouped):
+        """各组正态性 p 值；任一组超过 shapiro_max_n 时全部改用大样本策略"""
+        use_shapiro = bool((grouped.n <= self.shapiro_max_n).all())
+        p_values = np.full(grouped.n_groups, np.nan)
+        for i, seg in enumerate(grouped.segments()):
+            if use_shapiro:
+                if len(seg) >= 3:
+                    p_values[i] = stats.shapiro(seg).pvalue
+            elif len(seg) >= 8:
+                p_values[i] = self.large_n_normality(seg)
+        method = "shapiro" if use_shapiro else self.large_n_strategy
+        return p_values, use_shapiro, method
+
+    def check_groups(self, grouped, value_col=None, group_col=None):
+        """
+        分组数据的正态性（每组）与方差齐性（Levene）检验
+
+        参数:
+            grouped: stats_grouping.GroupedData
+            value_col / group_col: 列名（只用于缓存键）
+
+        返回:
+            dict: normality_p（每组 p 值数组）、use_shapiro、normality_method、levene_stat、levene_p
+        """
+        key = ("groups", value_col, group_col,
+               array_fingerprint(grouped.values, grouped.n, grouped.labels), self.settings)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        p_values, use_shapiro, method = self._group_normality(grouped)
+        levene_stat, levene_p = levene_grouped(grouped)
+        result = {
+            'normality_p': p_values,
+            'use_shapiro': use_shapiro,
+            'normality_method': method,
+            'levene_stat': levene_stat,
+            'levene_p': levene_p,
+        }
+        self.cache.put(key, result)
+        return result
+
+    def check_arrays(self, arrays):
+        """
+        多个等长数值数组（已去除缺失值的共同完整行）的正态性检验（相关性分析使用）
+
+        样本量不超过 shapiro_max_n 时使用 normaltest（与 correlation 原有行为一致），
+        超过时使用大样本策略。
+
+        参数:
+            arrays: 数值数组列表
+
+        返回:
+            list: 每个数组的 p 值
+        """
+        arrays = [np.asarray(values, dtype=float) for values in arrays]
+        key = ("arrays", array_fingerprint(*arrays), self.settings)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = []
+        for values in arrays:
+            if len(values) <= self.shapiro_max_n:
+                result.append(stats.normaltest(values).pvalue)
+            else:
+                result.append(self.large_n_normality(values))
+        self.cache.put(key, result)
+        return result
+
+    def check_columns(self, df, columns):
+        """
+        多个数值列在共同完整行上的正态性检验（见 check_arrays）
+
+        参数:
+            df: DataFrame
+            columns: 列名列表
+
+        返回:
+            dict: 列名 -> p 值
+        """
+        columns = list(columns)
+        data = df[columns].dropna()
+        p_values = self.check_arrays([data[col].to_numpy(dtype=float) for col in columns])
+        return dict(zip(columns, p_values))
+
+
+_default_checker = AssumptionChecker()
+
+
+def get_checker():
+    """返回 stats_core 使用的默认检查器"""
+    return _default_checker
+
+
+def configure(**settings):
+    """
+    替换默认检查器（例如 configure(large_n_strategy="anderson")），同时清空缓存
+
+    参数:
+        **settings: AssumptionChecker 的构造参数
+
+    返回:
+        AssumptionChecker: 新的默认检查器
+    """
+    global _default_checker
+    _default_checker = AssumptionChecker(**settings)
+    return _default_checker
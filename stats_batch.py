@@ -0,0 +1,411 @@
+"""
+批量统计分析：同一分组下对大量数值列同时进行两组比较
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats, special
+
+from stats_assumptions import anderson_pvalue, get_checker
+from stats_multitest import adjust_frame
+from stats_ranks import mannwhitney_pvalue
+
+
+TWO_GROUP_METHODS = {
+    'student': "独立样本 t 检验（等方差）",
+    'welch': "Welch's t 检验（不等方差）",
+    'mannwhitney': "Mann-Whitney U 检验（非参数）",
+}
+
+_BATCH_FIELDS = [
+    'method_name', 'stat', 'p_value', 'n1', 'n2',
+    'group1_mean', 'group2_mean', 'group1_std', 'group2_std',
+    'group1_median', 'group2_median', 'group1_iqr', 'group2_iqr',
+    'cohens_d', 'r_effect', 'normality_p1', 'normality_p2', 'levene_p',
+]
+
+# Shapiro-Wilk（AS R94）系数与 p 值近似所用的多项式常数
+_SW_C1 = [0.0, 0.221157, -0.147981, -2.071190, 4.434685, -2.706056]
+_SW_C2 = [0.0, 0.042981, -0.293762, -1.752461, 5.682633, -3.582633]
+_SW_C3 = [0.5440, -0.39978, 0.025054, -6.714e-4]
+_SW_C4 = [1.3822, -0.77857, 0.062767, -0.0020322]
+_SW_C5 = [-1.5861, -0.31082, -0.083751, 0.0038915]
+_SW_C6 = [-0.4803, -0.082676, 0.0030302]
+_SW_G = [-2.273, 0.459]
+
+
+def _poly(coeffs, x):
+    """多项式求值：coeffs[0] + coeffs[1]·x + ..."""
+    result = coeffs[-1]
+    for c in coeffs[-2::-1]:
+        result = result * x + c
+    return result
+
+
+def _shapiro_coefficients(n):
+    """样本量为 n 时的 Shapiro-Wilk 系数（前 n // 2 个，正值）"""
+    if n == 3:
+        return np.array([np.sqrt(0.5)])
+    m = stats.norm.ppf((np.arange(1, n // 2 + 1) - 0.375) / (n + 0.25))
+    summ2 = 2 * np.sum(m * m)
+    ssumm2 = np.sqrt(summ2)
+    rsn = 1 / np.sqrt(n)
+    a1 = _poly(_SW_C1, rsn) - m[0] / ssumm2
+    if n > 5:
+        a2 = -m[1] / ssumm2 + _poly(_SW_C2, rsn)
+        fac = np.sqrt((summ2 - 2 * m[0]**2 - 2 * m[1]**2) / (1 - 2 * a1**2 - 2 * a2**2))
+        a = -m / fac
+        a[1] = a2
+    else:
+        fac = np.sqrt((summ2 - 2 * m[0]**2) / (1 - 2 * a1**2))
+        a = -m / fac
+    a[0] = a1
+    return a
+
+
+def shapiro_sorted(sorted_block):
+    """
+    按列向量化的 Shapiro-Wilk 检验
+
+    参数:
+        sorted_block: 形状 (n, m) 的数组，每列已升序排列且无缺失值
+
+    返回:
+        tuple: (W 统计量数组, p 值数组)，与 scipy.stats.shapiro 逐列结果一致
+    """
+    n = sorted_block.shape[0]
+    if n < 3:
+        raise ValueError("Shapiro-Wilk 检验至少需要 3 个观测值")
+    half = n // 2
+    a = _shapiro_coefficients(n)
+    spread = sorted_block[::-1][:half] - sorted_block[:half]
+    centered = sorted_block - sorted_block.mean(axis=0)
+    ss = np.einsum('ij,ij->j', centered, centered)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = np.minimum((a @ spread)**2 / ss, 1.0)
+    # 全部取值相同的列：与 scipy 一致返回 W = 1, p = 1
+    w = np.where(ss > 0, w, 1.0)
+
+    if n == 3:
+        pw = np.maximum(6 / np.pi * (np.arcsin(np.sqrt(w)) - np.pi / 3), 0.0)
+        return w, pw
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y = np.log1p(-w)
+        if n <= 11:
+            gamma = _poly(_SW_G, n)
+            mu = _poly(_SW_C3, n)
+            sigma = np.exp(_poly(_SW_C4, n))
+            pw = special.ndtr(-(-np.log(gamma - y) - mu) / sigma)
+            pw = np.where(y >= gamma, 1e-99, pw)
+        else:
+            log_n = np.log(n)
+            mu = _poly(_SW_C5, log_n)
+            sigma = np.exp(_poly(_SW_C6, log_n))
+            pw = special.ndtr(-(y - mu) / sigma)
+    pw = np.where(ss > 0, pw, 1.0)
+    return w, pw
+
+
+def tie_term(sorted_block):
+    """每列的结校正项 Σ(t³ - t)，sorted_block 每列已升序排列"""
+    n, m = sorted_block.shape
+    boundary = np.ones((m, n + 1), dtype=bool)
+    boundary[:, 1:n] = (sorted_block[1:] != sorted_block[:-1]).T
+    starts = np.flatnonzero(boundary.ravel())
+    t = np.diff(starts).astype(float)
+    return np.bincount(starts[:-1] // (n + 1), weights=t**3 - t, minlength=m)
+
+
+def normaltest_columns(values):
+    """
+    按列向量化的 D'Agostino-Pearson 正态性检验（忽略 NaN）
+
+    参数:
+        values: 形状 (n, m) 的数组，可含 NaN
+
+    返回:
+        ndarray: 每列的 p 值，与 scipy.stats.normaltest 逐列结果一致；
+                 有效样本量不足 8 的列为 NaN
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=0).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.nansum(values, axis=0) / n
+        centered = np.where(valid, values - mean, 0.0)
+        m2 = np.einsum('ij,ij->j', centered, centered) / n
+        m3 = (centered**3).sum(axis=0) / n
+        m4 = (centered**4).sum(axis=0) / n
+        skew = m3 / m2**1.5
+        kurt = m4 / m2**2
+
+        # 偏度检验（skewtest）
+        y = skew * np.sqrt((n + 1) * (n + 3) / (6.0 * (n - 2)))
+        beta2 = (3.0 * (n**2 + 27 * n - 70) * (n + 1) * (n + 3)
+                 / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9)))
+        w2 = -1 + np.sqrt(2 * (beta2 - 1))
+        delta = 1 / np.sqrt(0.5 * np.log(w2))
+        alpha = np.sqrt(2.0 / (w2 - 1))
+        y = np.where(y == 0, 1, y)
+        z_skew = delta * np.log(y / alpha + np.sqrt((y / alpha)**2 + 1))
+
+        # 峰度检验（kurtosistest）
+        expected = 3.0 * (n - 1) / (n + 1)
+        var_b2 = 24.0 * n * (n - 2) * (n - 3) / ((n + 1) * (n + 1.) * (n + 3) * (n + 5))
+        x = (kurt - expected) / np.sqrt(var_b2)
+        sqrt_beta1 = (6.0 * (n * n - 5 * n + 2) / ((n + 7) * (n + 9))
+                      * np.sqrt((6.0 * (n + 3) * (n + 5)) / (n * (n - 2) * (n - 3))))
+        a = 6.0 + 8.0 / sqrt_beta1 * (2.0 / sqrt_beta1 + np.sqrt(1 + 4.0 / (sqrt_beta1**2)))
+        term1 = 1 - 2 / (9.0 * a)
+        denom = 1 + x * np.sqrt(2 / (a - 4.0))
+        term2 = np.sign(denom) * np.where(denom == 0.0, np.nan, ((1 - 2.0 / a) / np.abs(denom))**(1 / 3.0))
+        z_kurt = (term1 - term2) / np.sqrt(2 / (9.0 * a))
+
+        k2 = z_skew**2 + z_kurt**2
+    p = stats.chi2.sf(k2, 2)
+    return np.where(n >= 8, p, np.nan)
+
+
+def _levene_median(a, b):
+    """按列向量化的两组 Levene 检验（中位数中心，与 scipy.stats.levene 默认一致）"""
+    n1, n2 = a.shape[0], b.shape[0]
+    n = n1 + n2
+    z1 = np.abs(a - np.median(a, axis=0))
+    z2 = np.abs(b - np.median(b, axis=0))
+    z1_mean = z1.mean(axis=0)
+    z2_mean = z2.mean(axis=0)
+    z_mean = (n1 * z1_mean + n2 * z2_mean) / n
+    between = n1 * (z1_mean - z_mean)**2 + n2 * (z2_mean - z_mean)**2
+    within = ((z1 - z1_mean)**2).sum(axis=0) + ((z2 - z2_mean)**2).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = (n - 2) * between / within
+    return w, stats.f.sf(w, 1, n - 2)
+
+
+def mannwhitney_block(a, b):
+    """
+    按列向量化的 Mann-Whitney U 检验（双侧），方法选择与 scipy 逐列调用一致
+
+    参数:
+        a, b: 两组样本矩阵，形状 (n1, m)、(n2, m)，每列为一个变量（无缺失）
+
+    返回:
+        tuple: (第 1 组的 U 统计量数组, p 值数组)
+    """
+    n1, n2 = a.shape[0], b.shape[0]
+    combined = np.vstack([a, b])
+    ranks = stats.rankdata(combined, axis=0)
+    u1 = ranks[:n1].sum(axis=0) - n1 * (n1 + 1) / 2
+
+    ties = tie_term(np.sort(combined, axis=0))
+    # 小样本且无结时使用精确分布，否则用正态近似（与 scipy 逐列调用一致）
+    return u1, mannwhitney_pvalue(u1, n1, n2, ties)
+
+
+def _large_n_normality(block, checker, raw=None):
+    """
+    按检查器的大样本策略逐列计算正态性 p 值（样本量小于 8 时为 NaN，与 AssumptionChecker 一致）
+
+    抽样 Shapiro-Wilk 的结果依赖行顺序：raw 给出与 block 各列对应的原始顺序数据（可含 NaN），
+    省略时在排序后的列上抽样。
+    """
+    n = block.shape[0]
+    strategy = checker.large_n_strategy
+    if n < 8:
+        return np.full(block.shape[1], np.nan)
+    if strategy == "normaltest":
+        return normaltest_columns(block)
+    if strategy == "jarque_bera":
+        return stats.jarque_bera(block, axis=0).pvalue
+    if strategy == "anderson":
+        return np.array([anderson_pvalue(col) for col in block.T])
+    columns = block.T if raw is None else (col[~np.isnan(col)] for col in raw.T)
+    return np.array([checker.large_n_normality(col) for col in columns])
+
+
+def compare_block(a, b, checker=None, raw=None):
+    """
+    对一组样本量相同的列执行与 two_group_compare 相同的自动方法选择（批量比较与功效模拟共用）
+
+    正态性检验的规则取自 checker：两组均不超过 shapiro_max_n 时用 Shapiro-Wilk，否则用大样本策略。
+
+    参数:
+        a, b: 两组样本矩阵，形状 (n1, m)、(n2, m)，每列已升序排列、无缺失
+        checker: stats_assumptions.AssumptionChecker（默认 get_checker()）
+        raw: 两组原始行顺序的数据 (raw1, raw2)（可含 NaN），只有抽样 Shapiro-Wilk 需要，省略时在排序后的列上抽样
+
+    返回:
+        dict: 字段名 -> 长度 m 的数组（method_name、stat、p_value、n1、n2、各组描述统计、
+              cohens_d、r_effect、normality_p1、normality_p2、levene_p）
+    """
+    checker = get_checker() if checker is None else checker
+    n1, n2 = a.shape[0], b.shape[0]
+    m = a.shape[1]
+
+    mean1, mean2 = a.mean(axis=0), b.mean(axis=0)
+    std1, std2 = a.std(axis=0, ddof=1), b.std(axis=0, ddof=1)
+
+    use_shapiro = n1 <= checker.shapiro_max_n and n2 <= checker.shapiro_max_n
+    if use_shapiro:
+        _, p_norm1 = shapiro_sorted(a)
+        _, p_norm2 = shapiro_sorted(b)
+    else:
+        raw1, raw2 = raw or (None, None)
+        p_norm1 = _large_n_normality(a, checker, raw1)
+        p_norm2 = _large_n_normality(b, checker, raw2)
+    both_normal = (p_norm1 > 0.05) & (p_norm2 > 0.05)
+
+    _, p_var = _levene_median(a, b)
+    equal_var = p_var > 0.05
+
+    student = both_normal & equal_var
+    welch = both_normal & ~equal_var
+    nonparam = ~both_normal
+
+    stat = np.full(m, np.nan)
+    p_value = np.full(m, np.nan)
+    cohens_d = np.full(m, np.nan)
+    r_effect = np.full(m, np.nan)
+    method = np.empty(m, dtype=object)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if student.any():
+            t, p = stats.ttest_ind_from_stats(mean1[student], std1[student], n1,
+                                              mean2[student], std2[student], n2, equal_var=True)
+            stat[student], p_value[student] = t, p
+            pooled = np.sqrt(((n1 - 1) * std1[student]**2 + (n2 - 1) * std2[student]**2) / (n1 + n2 - 2))
+            cohens_d[student] = np.where(pooled > 0, (mean1[student] - mean2[student]) / pooled, 0)
+            method[student] = TWO_GROUP_METHODS['student']
+
+        if welch.any():
+            t, p = stats.ttest_ind_from_stats(mean1[welch], std1[welch], n1,
+                                              mean2[welch], std2[welch], n2, equal_var=False)
+            stat[welch], p_value[welch] = t, p
+            pooled = np.sqrt(std1[welch]**2 / n1 + std2[welch]**2 / n2)
+            cohens_d[welch] = np.where(pooled > 0, (mean1[welch] - mean2[welch]) / pooled, 0)
+            method[welch] = TWO_GROUP_METHODS['welch']
+
+    if nonparam.any():
+        u1, p = mannwhitney_block(a[:, nonparam], b[:, nonparam])
+        stat[nonparam], p_value[nonparam] = u1, p
+        z_score = np.where(p < 0.5, stats.norm.ppf(p / 2), 0)
+        r_effect[nonparam] = np.abs(z_score) / np.sqrt(n1 + n2)
+        method[nonparam] = TWO_GROUP_METHODS['mannwhitney']
+
+    q1 = np.quantile(a, [0.25, 0.5, 0.75], axis=0)
+    q2 = np.quantile(b, [0.25, 0.5, 0.75], axis=0)
+
+    return {
+        'method_name': method,
+        'stat': stat,
+        'p_value': p_value,
+        'n1': np.full(m, n1),
+        'n2': np.full(m, n2),
+        'group1_mean': mean1,
+        'group2_mean': mean2,
+        'group1_std': std1,
+        'group2_std': std2,
+        'group1_median': q1[1],
+        'group2_median': q2[1],
+        'group1_iqr': q1[2] - q1[0],
+        'group2_iqr': q2[2] - q2[0],
+        'cohens_d': cohens_d,
+        'r_effect': r_effect,
+        'normality_p1': p_norm1 if use_shapiro else np.full(m, np.nan),
+        'normality_p2': p_norm2 if use_shapiro else np.full(m, np.nan),
+        'levene_p': p_var,
+    }
+
+
+def two_group_compare_batch(values, groups, alpha=0.05, columns=None, p_adjust=None):
+    """
+    批量两组比较：对矩阵的每一列执行与 two_group_compare 相同的自动方法选择
+
+    正态性检验使用 stats_assumptions.get_checker() 的当前设置（shapiro_max_n 与大样本策略）。
+
+    参数:
+        values: 数值矩阵，形状 (n_obs, n_cols)，可含 NaN
+        groups: 分组向量，长度 n_obs，恰好 2 个组
+        alpha: 显著性水平
+        columns: 列名列表（默认使用 0..n_cols-1）
+        p_adjust: 多重检验校正方法（见 stats_multitest.P_ADJUST_METHODS），在全部列上校正
+
+    返回:
+        DataFrame: 每列一行，包含方法名、统计量、p 值、效应量及检验前提的 p 值；
+                   指定 p_adjust 时另含 p_adjusted 与 significant_adjusted 列
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    n_cols = values.shape[1]
+    if columns is None:
+        columns = list(range(n_cols))
+    if len(columns) != n_cols:
+        raise ValueError("列名数量与数值矩阵列数不一致")
+
+    codes, labels = pd.factorize(pd.Series(groups))
+    if len(codes) != values.shape[0]:
+        raise ValueError("分组向量长度与数值矩阵行数不一致")
+    if len(labels) != 2:
+        raise ValueError(f"分组变量必须恰好有 2 个组，当前有 {len(labels)} 个组")
+
+    # 每组只复制一次并按列排序（NaN 排在末尾），之后各列按有效样本量切出稠密块
+    checker = get_checker()
+    group1, group2 = values[codes == 0], values[codes == 1]
+    sorted1 = np.sort(group1, axis=0)
+    sorted2 = np.sort(group2, axis=0)
+    # 只有抽样 Shapiro-Wilk 依赖原始行顺序，其他策略不保留未排序的副本
+    keep_raw = checker.large_n_strategy == "shapiro_subsample"
+    if not keep_raw:
+        group1 = group2 = None
+    count1 = sorted1.shape[0] - np.isnan(sorted1).sum(axis=0)
+    count2 = sorted2.shape[0] - np.isnan(sorted2).sum(axis=0)
+
+    result = {
+        'column': np.asarray(columns, dtype=object),
+        'group1': np.full(n_cols, labels[0], dtype=object),
+        'group2': np.full(n_cols, labels[1], dtype=object),
+    }
+    for field in _BATCH_FIELDS:
+        result[field] = np.full(n_cols, None if field == 'method_name' else np.nan,
+                                dtype=object if field == 'method_name' else float)
+    result['error'] = np.full(n_cols, None, dtype=object)
+
+    for c1, c2 in np.unique(np.column_stack([count1, count2]), axis=0):
+        cols = np.flatnonzero((count1 == c1) & (count2 == c2))
+        if c1 < 3 or c2 < 3:
+            result['n1'][cols] = c1
+            result['n2'][cols] = c2
+            result['error'][cols] = "每组至少需要 3 个观测值"
+            continue
+        raw = (group1[:, cols], group2[:, cols]) if keep_raw else None
+        block = compare_block(sorted1[:c1, cols], sorted2[:c2, cols], checker, raw)
+        for field, arr in block.items():
+            result[field][cols] = arr
+
+    frame = pd.DataFrame(result)
+    frame['n1'] = frame['n1'].astype(int)
+    frame['n2'] = frame['n2'].astype(int)
+    frame.insert(frame.columns.get_loc('p_value') + 1, 'significant', frame['p_value'] < alpha)
+    if p_adjust is not None:
+        frame = adjust_frame(frame, p_adjust, alpha=alpha)
+    return frame
+
+
+def two_group_compare_columns(df, value_cols, group_col, alpha=0.05, p_adjust=None):
+    """
+    对 DataFrame 中多个数值列批量执行两组比较
+
+    参数:
+        df: DataFrame
+        value_cols: 数值变量列名列表
+        group_col: 分组变量列名
+        alpha: 显著性水平
+        p_adjust: 多重检验校正方法（见 two_group_compare_batch）
+
+    返回:
+        DataFrame: 见 two_group_compare_batch
+    """
+    values = df[list(value_cols)].to_numpy(dtype=float, na_value=np.nan)
+    return two_group_compare_batch(values, df[group_col], alpha=alpha, columns=list(value_cols),
+                                   p_adjust=p_adjust)
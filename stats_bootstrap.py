@@ -0,0 +1,500 @@
+"""
+效应量的 Bootstrap 置信区间（百分位法与 BCa）：分块向量化重抽样、线程/进程并行、进度回调
+
+不同取值较少的样本直接按取值抽取多项分布计数（每次重抽样 O(取值数)），其余样本抽取下标；
+下标块控制在缓存大小以内。bootstrap_effect 按数据指纹与参数缓存结果，界面重复运行时不再重抽样。
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+from scipy import special
+
+from stats_cache import memoize_result
+from stats_grouping import GroupedData
+
+
+# 单块下标矩阵的元素上限（约 8 MB，留在缓存中），样本量大时自动减小块大小
+MAX_BLOCK_ELEMENTS = 1_000_000
+
+# 样本量不小于不同取值数的该倍数时，按取值抽取多项分布计数而不是逐个抽取下标
+MULTINOMIAL_RATIO = 16
+
+BOOTSTRAP_METHODS = ("bca", "percentile")
+
+# 工作进程中的统计量对象（由 _init_worker 设置，避免每个任务重复传输数据）
+_WORKER_DATA = {}
+
+
+def _init_worker(statistic):
+    _WORKER_DATA['statistic'] = statistic
+
+
+def _moments(sums, n):
+    """由 (Σx, Σx²) 计算均值与离差平方和"""
+    mean = sums[..., 0] / n
+    m2 = sums[..., 1] - sums[..., 0] * mean
+    return mean, m2
+
+
+def _cohens_d(sums, n, equal_var=True):
+    """两组 Cohen's d（与 ttest_from_moments 相同：等方差用合并标准差，否则用 √(s1²/n1 + s2²/n2)）"""
+    mean1, m2_1 = _moments(sums[0], n[0])
+    mean2, m2_2 = _moments(sums[1], n[1])
+    if equal_var:
+        scale = np.sqrt((m2_1 + m2_2) / (n[0] + n[1] - 2))
+    else:
+        scale = np.sqrt(m2_1 / (n[0] - 1) / n[0] + m2_2 / (n[1] - 1) / n[1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(scale > 0, (mean1 - mean2) / scale, 0.0)
+
+
+def _eta_squared(sums, n):
+    """单因素方差分析的 η² = SS组间 / SS总"""
+    total = sum(s[..., 0] for s in sums)
+    n_total = sum(n)
+    correction = total * total / n_total
+    ss_between = sum(s[..., 0]**2 / n_i for s, n_i in zip(sums, n)) - correction
+    ss_total = sum(s[..., 1] for s in sums) - correction
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(ss_total > 0, ss_between / ss_total, 0.0)
+
+
+def _pearson_r(sums, n):
+    """由 (Σx, Σy, Σx², Σxy, Σy²) 计算 Pearson r"""
+    s = sums[0]
+    n = n[0]
+    sxx = s[..., 2] - s[..., 0]**2 / n
+    sxy = s[..., 3] - s[..., 0] * s[..., 1] / n
+    syy = s[..., 4] - s[..., 1]**2 / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0)
+
+
+_MOMENT_FUNCTIONS = {
+    'cohens_d': _cohens_d,
+    'eta_squared': _eta_squared,
+    'pearson_r': _pearson_r,
+}
+
+
+def _products(columns):
+    """各列及两两乘积（含平方），如 (x, y) -> (x, y, x², xy, y²)"""
+    c = columns.shape[-1]
+    products = [columns[..., i] * columns[..., j] for i in range(c) for j in range(i, c)]
+    return np.stack([columns[..., i] for i in range(c)] + products, axis=-1)
+
+
+class _MomentStatistic:
+    """
+    由各样本充分统计量（各列之和与两两乘积之和）计算的效应量
+
+    一块重抽样的充分统计量由下标矩阵逐行求和（不同取值较少时由多项分布计数乘取值特征矩阵）一次得到；
+    留一法估计为总和减去被删观测的贡献，不需要重新计算。
+    """
+
+    def __init__(self, name, columns, **kwargs):
+        self.name = name
+        self.columns = [np.asarray(c, dtype=float).reshape(len(c), -1) for c in columns]
+        self.n = [float(len(c)) for c in self.columns]
+        self.features = [_products(c) for c in self.columns]
+        self.sizes = [len(c) for c in self.columns]
+        self.kwargs = kwargs
+        # 不同取值较少的样本：保存各取值的特征与出现概率，重抽样时直接抽计数
+        self.distinct = []
+        for columns in self.columns:
+            values, counts = np.unique(columns, axis=0, return_counts=True)
+            if len(values) * MULTINOMIAL_RATIO <= len(columns):
+                self.distinct.append((_products(values), counts / len(columns)))
+            else:
+                self.distinct.append(None)
+
+    def _evaluate(self, sums, n):
+        return _MOMENT_FUNCTIONS[self.name](sums, n, **self.kwargs)
+
+    def estimate(self):
+        return float(self._evaluate([f.sum(axis=0) for f in self.features], self.n))
+
+    def resample(self, rng, size):
+        """一块 size 次重抽样的统计量"""
+        sums = []
+        for columns, distinct in zip(self.columns, self.distinct):
+            n_obs, c = columns.shape
+            if distinct is not None:
+                features, probabilities = distinct
+                sums.append(rng.multinomial(n_obs, probabilities, size=size) @ features)
+                continue
+            index = rng.integers(0, n_obs, size=(size, n_obs))
+            taken = [np.take(columns[:, i], index) for i in range(c)]
+            # 与 _products 相同的顺序：各列之和，再是两两乘积之和
+            block = [t.sum(axis=1) for t in taken]
+            block += [np.einsum('ij,ij->i', taken[i], taken[j]) for i in range(c) for j in range(i, c)]
+            sums.append(np.column_stack(block))
+        return self._evaluate(sums, self.n)
+
+    def jackknife(self):
+        """逐个样本的留一法估计（闭式：总和减去被删观测的贡献）"""
+        totals = [f.sum(axis=0) for f in self.features]
+        values = []
+        for j, f in enumerate(self.features):
+            sums = list(totals)
+            sums[j] = totals[j] - f
+            n = list(self.n)
+            n[j] = self.n[j] - 1
+            values.append(self._evaluate(sums, n))
+        return values
+
+
+def _r_from_u(u1, ties, n1, n2):
+    """由 U 统计量计算 r = |Z| / √N（与 two_group_compare 相同，Z 取正态近似 p 值的分位数）"""
+    n = n1 + n2
+    u = np.maximum(u1, n1 * n2 - u1)
+    s = np.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (u - n1 * n2 / 2 - 0.5) / s
+    p = np.clip(2 * special.ndtr(-z), 0.0, 1.0)
+    return np.where(p < 0.5, np.abs(special.ndtri(p / 2)), 0.0) / np.sqrt(n)
+
+
+class _RankEffect:
+    """
+    Mann-Whitney 效应量 r
+
+    两组观测先映射到各组自己的不同取值上，一次重抽样只需各取值的计数：
+    U₁ = Σ_v a_v·(第 2 组中小于 v 的个数 + b_v / 2)，其中“第 2 组中小于 v 的个数”为第 2 组计数的
+    前缀和在 v 处的取值；结的校正项由计数直接得到（只有两组共有的取值产生交叉项），
+    不必对每个重抽样样本重新排序。
+    """
+
+    name = 'r_effect'
+
+    def __init__(self, a, b):
+        a = np.asarray(a, dtype=float)
+        b = np.asarray(b, dtype=float)
+        _, inverse = np.unique(np.concatenate([a, b]), return_inverse=True)
+        self.n_bins = int(inverse.max()) + 1
+        self.sizes = [len(a), len(b)]
+        self.bins = [inverse[:len(a)], inverse[len(a):]]
+
+        # 各组的不同取值（合并样本中的编号）、每个观测的组内取值编号与各取值的概率
+        self.values, self.local, self.probabilities = [], [], []
+        for bins in self.bins:
+            values, local, counts = np.unique(bins, return_inverse=True, return_counts=True)
+            self.values.append(values)
+            # 组内无结时组内编号就是观测的排序位置，重抽样的下标可直接作为编号
+            self.local.append(None if len(values) == len(bins) else local)
+            self.probabilities.append(counts / len(bins))
+        values1, values2 = self.values
+        # 第 1 组各取值之前的第 2 组取值个数（前缀和的位置），以及两组共有的取值
+        self.below = np.searchsorted(values2, values1)
+        shared = np.isin(values1, values2, assume_unique=True)
+        self.shared1 = np.flatnonzero(shared)
+        self.shared2 = self.below[shared]
+
+    def _counts(self, rng=None, size=None):
+        """各组不同取值的计数；给定 rng 时为 size 次重抽样的计数，形状 (size, 该组取值数)"""
+        if rng is None:
+            return [np.bincount(local, minlength=len(values)) if local is not None
+                    else np.ones(len(values), dtype=np.int64)
+                    for values, local in zip(self.values, self.local)]
+        counts = []
+        for n_obs, values, local, probabilities in zip(self.sizes, self.values, self.local,
+                                                         self.probabilities):
+            k = len(values)
+            if k * MULTINOMIAL_RATIO <= n_obs:
+                counts.append(rng.multinomial(n_obs, probabilities, size=size))
+                continue
+            flat = rng.integers(0, n_obs, size=(size, n_obs))
+            if local is not None:
+                flat = np.take(local, flat)
+            flat += (np.arange(size) * k)[:, None]
+            counts.append(np.bincount(flat.ravel(), minlength=size * k).reshape(size, k))
+        return counts
+
+    def _evaluate(self, c1, c2):
+        n1, n2 = self.sizes
+        # 整数运算：2·U₁ = Σ_v a_v·(2·(第 2 组中小于 v 的个数) + b_v)
+        below2 = np.zeros(c2.shape[:-1] + (c2.shape[-1] + 1,), dtype=np.int64)
+        np.cumsum(c2, axis=-1, out=below2[..., 1:])
+        shared1, shared2 = c1[..., self.shared1], c2[..., self.shared2]
+        u1 = (2 * np.einsum('...i,...i->...', c1, np.take(below2, self.below, axis=-1))
+              + np.einsum('...i,...i->...', shared1, shared2)) / 2
+        # Σ(t³ - t) = Σt³ - N，t = a + b 只在共有取值上有交叉项 3(a²b + ab²)
+        ties = (np.einsum('...i,...i,...i->...', c1, c1, c1) + np.einsum('...i,...i,...i->...', c2, c2, c2)
+                + 3 * np.einsum('...i,...i->...', shared1 * shared2, shared1 + shared2) - (n1 + n2))
+        return _r_from_u(u1, ties.astype(float), n1, n2)
+
+    def estimate(self):
+        return float(self._evaluate(*self._counts()))
+
+    def resample(self, rng, size):
+        """一块 size 次重抽样的统计量"""
+        return self._evaluate(*self._counts(rng, size))
+
+    def jackknife(self):
+        """逐个样本的留一法估计：删去一个观测只改变 U₁ 的一项与该取值的结"""
+        a, b = (np.bincount(bins, minlength=self.n_bins).astype(float) for bins in self.bins)
+        n1, n2 = self.sizes
+        below2 = np.cumsum(b) - b
+        above1 = n1 - np.cumsum(a)
+        u1 = a @ (below2 + 0.5 * b)
+        t = a + b
+        ties = t @ (t * t - 1) - 3 * t * (t - 1)
+        drop1 = _r_from_u(u1 - (below2 + 0.5 * b), ties, n1 - 1, n2)
+        drop2 = _r_from_u(u1 - (above1 + 0.5 * a), ties, n1, n2 - 1)
+        return [drop1[self.bins[0]], drop2[self.bins[1]]]
+
+
+def _resample_block(seed_seq, size, statistic=None):
+    """一块重抽样：各样本内分别有放回重抽样 size 次，返回形状 (size,) 的统计量"""
+    if statistic is None:
+        statistic = _WORKER_DATA['statistic']
+    return statistic.resample(np.random.default_rng(seed_seq), size)
+
+
+def bootstrap_distribution(statistic, n_resamples=10000, seed=0, block_size=1000,
+                           n_jobs=1, executor="thread", progress=None):
+    """
+    统计量的 Bootstrap 分布（各样本内分别有放回重抽样）
+
+    参数:
+        statistic: _MomentStatistic 或 _RankEffect
+        n_resamples: 重抽样次数
+        seed: 随机种子；每块使用 SeedSequence.spawn 派生的独立随机流，结果与 n_jobs 无关
+        block_size: 每块的重抽样次数（一次矩阵运算）
+        n_jobs: 并行数（1 为当前线程内计算）
+        executor: "thread"（线程池）或 "process"（进程池）
+        progress: 进度回调 progress(已完成次数, 总次数)，每完成一块调用一次
+
+    返回:
+        ndarray: 形状 (n_resamples,) 的统计量
+    """
+    if executor not in ("thread", "process"):
+        raise ValueError("executor 必须为 thread 或 process")
+    block_size = max(1, min(block_size, MAX_BLOCK_ELEMENTS // max(statistic.sizes)))
+    n_blocks = math.ceil(n_resamples / block_size)
+    starts = [i * block_size for i in range(n_blocks)]
+    sizes = [min(block_size, n_resamples - start) for start in starts]
+    seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+
+    theta = np.empty(n_resamples)
+    done = 0
+
+    def store(i, values):
+        nonlocal done
+        theta[starts[i]:starts[i] + sizes[i]] = values
+        done += sizes[i]
+        if progress is not None:
+            progress(done, n_resamples)
+
+    if n_jobs == 1:
+        for i in range(n_blocks):
+            store(i, _resample_block(seeds[i], sizes[i], statistic))
+    elif executor == "thread":
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {pool.submit(_resample_block, seeds[i], sizes[i], statistic): i
+                       for i in range(n_blocks)}
+            for future in as_completed(futures):
+                store(futures[future], future.result())
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(statistic,)) as pool:
+            futures = {pool.submit(_resample_block, seeds[i], sizes[i]): i
+                       for i in range(n_blocks)}
+            for future in as_completed(futures):
+                store(futures[future], future.result())
+    return theta
+
+
+def _acceleration(jackknife_values):
+    """BCa 加速常数（多样本时各样本的留一法分别计算后合并，与 scipy.stats.bootstrap 一致）"""
+    numerator = 0.0
+    denominator = 0.0
+    for values in jackknife_values:
+        n = float(len(values))
+        u = (n - 1) * (values.mean() - values)
+        numerator += np.sum(u**3) / n**3
+        denominator += np.sum(u**2) / n**2
+    if denominator <= 0:
+        return 0.0
+    return numerator / (6 * denominator**1.5)
+
+
+def bootstrap_interval(statistic, confidence=0.95, method="bca", **options):
+    """
+    计算统计量的 Bootstrap 置信区间
+
+    参数:
+        statistic: _MomentStatistic 或 _RankEffect
+        confidence: 置信水平
+        method: "bca"（偏差校正加速，默认）或 "percentile"（百分位法）
+        **options: 传给 bootstrap_distribution 的参数（n_resamples、n_jobs、executor、seed、progress 等）
+
+    返回:
+        dict: statistic、estimate、ci_lower、ci_upper、confidence、method、
+              n_resamples（有效重抽样数）、std_error、bias
+    """
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError(f"method 必须为 {', '.join(BOOTSTRAP_METHODS)} 之一")
+    theta_hat = statistic.estimate()
+    theta = bootstrap_distribution(statistic, **options)
+    theta = theta[np.isfinite(theta)]
+    if len(theta) == 0:
+        raise ValueError("Bootstrap 重抽样统计量全部无效，无法计算置信区间")
+
+    tail = (1 - confidence) / 2
+    if method == "percentile":
+        levels = np.array([tail, 1 - tail])
+    else:
+        percentile = (np.sum(theta < theta_hat) + np.sum(theta <= theta_hat)) / (2 * len(theta))
+        z0 = special.ndtri(percentile)
+        a = _acceleration(statistic.jackknife())
+        z = special.ndtri(np.array([tail, 1 - tail]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            levels = special.ndtr(z0 + (z0 + z) / (1 - a * (z0 + z)))
+        if not np.isfinite(levels).all():
+            # 估计值位于 Bootstrap 分布之外时 BCa 无定义，退回百分位法
+            levels = np.array([tail, 1 - tail])
+            method = "percentile"
+    ci_lower, ci_upper = np.percentile(theta, levels * 100)
+
+    return {
+        'statistic': statistic.name,
+        'estimate': theta_hat,
+        'ci_lower': float(ci_lower),
+        'ci_upper': float(ci_upper),
+        'confidence': confidence,
+        'method': method,
+        'n_resamples': len(theta),
+        'std_error': float(theta.std(ddof=1)) if len(theta) > 1 else np.nan,
+        'bias': float(theta.mean() - theta_hat),
+    }
+
+
+def bootstrap_cohens_d(group1, group2, equal_var=True, **options):
+    """
+    Cohen's d 的 Bootstrap 置信区间（两组内分别重抽样）
+
+    参数:
+        group1, group2: 两组数值数组（无缺失值）
+        equal_var: True 用合并标准差（t 检验），False 用 Welch 的标准误尺度
+        **options: 传给 bootstrap_interval 的参数
+
+    返回:
+        dict: 见 bootstrap_interval
+    """
+    # 减去共同的中心不改变效应量，但减少平方和公式的数值抵消
+    center = np.mean(np.concatenate([group1, group2]))
+    statistic = _MomentStatistic('cohens_d', [np.asarray(group1, dtype=float) - center,
+                                              np.asarray(group2, dtype=float) - center],
+                                 equal_var=equal_var)
+    return bootstrap_interval(statistic, **options)
+
+
+def bootstrap_r_effect(group1, group2, **options):
+    """Mann-Whitney 效应量 r 的 Bootstrap 置信区间，参数同 bootstrap_cohens_d"""
+    return bootstrap_interval(_RankEffect(group1, group2), **options)
+
+
+def bootstrap_eta_squared(groups, **options):
+    """
+    η² 的 Bootstrap 置信区间（各组内分别重抽样）
+
+    参数:
+        groups: 各组数值数组的列表
+        **options: 传给 bootstrap_interval 的参数
+    """
+    center = np.mean(np.concatenate(groups))
+    statistic = _MomentStatistic('eta_squared', [np.asarray(g, dtype=float) - center for g in groups])
+    return bootstrap_interval(statistic, **options)
+
+
+def bootstrap_pearson(x, y, **options):
+    """
+    Pearson r 的 Bootstrap 置信区间（按观测对重抽样）
+
+    参数:
+        x, y: 等长数值数组（无缺失值）
+        **options: 传给 bootstrap_interval 的参数
+    """
+    dx = np.asarray(x, dtype=float)
+    dy = np.asarray(y, dtype=float)
+    dx = dx - dx.mean()
+    dy = dy - dy.mean()
+    statistic = _MomentStatistic('pearson_r', [np.column_stack([dx, dy])])
+    return bootstrap_interval(statistic, **options)
+
+
+@memoize_result(("value_col", "group_col", "col_x", "col_y"), ignore=("n_jobs", "executor", "progress"))
+def bootstrap_effect(df, statistic, value_col=None, group_col=None, col_x=None, col_y=None, equal_var=True,
+                     confidence=0.95, method="bca", n_resamples=10000, seed=0, block_size=1000,
+                     n_jobs=1, executor="thread", progress=None):
+    """
+    DataFrame 中一个效应量的 Bootstrap 置信区间（按所用列的数据指纹与参数缓存）
+
+    结果与 n_jobs、executor 无关，这两个参数与进度回调不参与缓存键；命中缓存时不调用 progress。
+
+    参数:
+        df: DataFrame
+        statistic: "cohens_d"、"r_effect"、"eta_squared" 或 "pearson_r"
+        value_col / group_col: 组间比较的列名
+        col_x / col_y: 相关性分析的列名
+        equal_var: cohens_d 是否使用合并标准差（见 bootstrap_cohens_d）
+        confidence, method: 见 bootstrap_interval
+        n_resamples, seed, block_size, n_jobs, executor, progress: 见 bootstrap_distribution
+
+    返回:
+        dict: 见 bootstrap_interval
+    """
+    options = dict(confidence=confidence, method=method, n_resamples=n_resamples, seed=seed,
+                   block_size=block_size, n_jobs=n_jobs, executor=executor, progress=progress)
+    if statistic == 'pearson_r':
+        data = df[[col_x, col_y]].dropna()
+        return bootstrap_pearson(data[col_x].to_numpy(dtype=float), data[col_y].to_numpy(dtype=float),
+                                 **options)
+    if statistic not in ('cohens_d', 'r_effect', 'eta_squared'):
+        raise ValueError("statistic 必须为 cohens_d、r_effect、eta_squared 或 pearson_r")
+    grouped = GroupedData.from_frame(df, value_col, group_col)
+    if statistic == 'eta_squared':
+        return bootstrap_eta_squared(grouped.segments(), **options)
+    group1, group2 = grouped.segments()
+    if statistic == 'r_effect':
+        return bootstrap_r_effect(group1, group2, **options)
+    return bootstrap_cohens_d(group1, group2, equal_var=equal_var, **options)
+
+
+def attach_bootstrap_ci(result, df, value_col=None, group_col=None, col_x=None, col_y=None, **options):
+    """
+    为 stats_core 的分析结果计算效应量的 Bootstrap 置信区间，写入 extra_info['bootstrap_ci']
+
+    按结果中已有的效应量选择统计量：cohens_d（t 检验）、r_effect（Mann-Whitney）、
+    eta_squared（方差分析）或 Pearson 相关系数；Spearman 与回归结果不做处理。
+    区间由 bootstrap_effect 计算并缓存，同一数据与参数重复调用时不再重抽样。
+
+    参数:
+        result: two_group_compare / anova_oneway / correlation 的返回值
+        df: 分析所用的 DataFrame
+        value_col / group_col: 组间比较的列名
+        col_x / col_y: 相关性分析的列名
+        **options: 传给 bootstrap_effect 的参数
+
+    返回:
+        dict: 原 result（已原地更新）
+    """
+    extra_info = result['extra_info']
+    if 'correlation_coefficient' in extra_info:
+        if "Pearson" not in result['method_name']:
+            return result
+        statistic = 'pearson_r'
+    elif 'eta_squared' in extra_info:
+        statistic = 'eta_squared'
+    elif 'r_effect' in extra_info:
+        statistic = 'r_effect'
+    elif 'cohens_d' in extra_info:
+        statistic = 'cohens_d'
+    else:
+        return result
+    equal_var = statistic != 'cohens_d' or "Welch" not in result['method_name']
+    extra_info['bootstrap_ci'] = bootstrap_effect(df, statistic, value_col=value_col, group_col=group_col,
+                                                  col_x=col_x, col_y=col_y, equal_var=equal_var, **options)
+    return result
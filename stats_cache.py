@@ -0,0 +1,335 @@
+"""
+统计结果缓存工具：数据指纹、进程内 LRU 缓存与 SQLite 持久化缓存
+"""
+import copy
+import functools
+import hashlib
+import inspect
+import pickle
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+
+# 结果格式变化时递增，使旧的持久化缓存自动失效
+CACHE_VERSION = 3
+
+
+def data_fingerprint(df, columns):
+    """
+    计算若干列内容的快速哈希（列名、数据类型与数值都参与计算）
+
+    数值列直接对底层内存做 blake2b 摘要；其他类型先用 pandas 的向量化哈希。
+
+    参数:
+        df: DataFrame
+        columns: 列名列表
+
+    返回:
+        str: 32 位十六进制摘要
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for col in columns:
+        series = df[col]
+        digest.update(repr(col).encode('utf-8'))
+        digest.update(str(series.dtype).encode('utf-8'))
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM':
+            digest.update(np.ascontiguousarray(series.to_numpy()).reshape(-1).view(np.uint8))
+        else:
+            digest.update(pd.util.hash_pandas_object(series, index=False).to_numpy().view(np.uint8))
+    return digest.hexdigest()
+
+
+def array_fingerprint(*arrays):
+    """
+    计算若干 ndarray 内容的快速哈希（形状、数据类型与数值都参与计算）
+
+    返回:
+        str: 32 位十六进制摘要
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for arr in arrays:
+        arr = np.asarray(arr)
+        if arr.dtype == object:
+            arr = pd.util.hash_array(arr.ravel())
+        digest.update(f"{arr.dtype}{arr.shape}".encode('utf-8'))
+        digest.update(np.ascontiguousarray(arr).reshape(-1).view(np.uint8))
+    return digest.hexdigest()
+
+
+def object_nbytes(value):
+    """
+    估算对象占用的内存字节数（数组与 DataFrame 按数据大小，容器递归累加）
+
+    参数:
+        value: 任意对象
+
+    返回:
+        int: 字节数
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(object_nbytes(k) + object_nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(object_nbytes(v) for v in value)
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sys.getsizeof(value) + object_nbytes(vars(value))
+    if hasattr(value, '__slots__') and not isinstance(value, type):
+        slots = [name for cls in type(value).__mro__ for name in getattr(cls, '__slots__', ())]
+        return sys.getsizeof(value) + sum(object_nbytes(getattr(value, name, None)) for name in slots)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    线程安全的最近最少使用缓存
+
+    参数:
+        maxsize: 最多保存的条数（None 为不限）
+        max_bytes: 按 object_nbytes 估算的总字节上限（None 为不限）；单个超过上限的值不缓存
+    """
+
+    def __init__(self, maxsize=256, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = object_nbytes(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                del self._data[key]
+                self.nbytes -= self._sizes.pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            while ((self.maxsize is not None and len(self._data) > self.maxsize)
+                   or (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+                oldest, _ = self._data.popitem(last=False)
+                self.nbytes -= self._sizes.pop(oldest)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """
+    基于 SQLite 的持久化缓存（值以 pickle 保存），超过 max_bytes 时删除最久未访问的条目
+
+    参数:
+        path: 数据库文件路径
+        max_bytes: 保存的总字节上限
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # 每次操作单独连接：Streamlit 每次重新运行可能在不同线程中
+        return closing(sqlite3.connect(self.path, timeout=30))
+
+    def get(self, key, default=None):
+        with self._lock, self._connect() as conn, conn:
+            row = conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            self.misses += 1
+            return default
+        try:
+            value = pickle.loads(row[0])
+        except Exception:
+            # 无法读取的旧条目视为未命中
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock, self._connect() as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                         (key, blob, len(blob), time.time()))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                # 按最近访问时间从旧到新删除，直到总大小回到上限以内
+                excess = total - self.max_bytes
+                stale = []
+                for old_key, size in conn.execute("SELECT key, size FROM results ORDER BY accessed"):
+                    if excess <= 0:
+                        break
+                    stale.append((old_key,))
+                    excess -= size
+                conn.executemany("DELETE FROM results WHERE key = ?", stale)
+
+    def clear(self):
+        with self._lock, self._connect() as conn, conn:
+            conn.execute("DELETE FROM results")
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class ResultCache:
+    """
+    两级结果缓存：进程内 LRU（按字节数淘汰）+ 可选的 SQLite 持久化缓存
+
+    参数:
+        memory_bytes: 内存缓存的字节上限
+        disk: DiskCache 实例（None 为只用内存）
+    """
+
+    def __init__(self, memory_bytes=64 * 1024 * 1024, disk=None):
+        self.memory = LRUCache(maxsize=None, max_bytes=memory_bytes)
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return default if value is None else value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+_result_cache = ResultCache()
+
+
+def get_result_cache():
+    """返回 stats_core 入口函数使用的结果缓存"""
+    return _result_cache
+
+
+def configure_result_cache(memory_bytes=64 * 1024 * 1024, disk=False, disk_path=None,
+                           disk_bytes=256 * 1024 * 1024):
+    """
+    替换结果缓存
+
+    参数:
+        memory_bytes: 内存缓存的字节上限
+        disk: 是否启用持久化缓存
+        disk_path: 数据库文件路径（默认为 phi3_stat_studio 配置的 storage_dir 下的 stats_results.sqlite）
+        disk_bytes: 持久化缓存的字节上限
+
+    返回:
+        ResultCache: 新的结果缓存
+    """
+    global _result_cache
+    disk_cache = None
+    if disk:
+        if disk_path is None:
+            from phi3_stat_studio.config import CONFIG
+            disk_path = CONFIG.paths.storage_dir / "stats_results.sqlite"
+        disk_cache = DiskCache(disk_path, max_bytes=disk_bytes)
+    _result_cache = ResultCache(memory_bytes=memory_bytes, disk=disk_cache)
+    return _result_cache
+
+
+def memoize_result(columns, extra_key=None, ignore=()):
+    """
+    按（函数、所用列的内容指纹、其余参数）缓存分析结果的装饰器
+
+    被装饰函数的第一个参数为 df；命中缓存时返回结果的深拷贝，调用方修改结果不影响缓存。
+    抛出异常的调用不缓存。原函数可通过 wrapper.uncached 调用。
+
+    参数:
+        columns: 保存列名的参数名列表（这些列参与指纹计算，值为 None 的可选列跳过）
+        extra_key: 返回额外键值的无参函数（如检验设置），结果依赖全局设置时使用
+        ignore: 不影响结果、不参与缓存键的参数名（如并行数、进度回调）
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {name: value for name, value in bound.arguments.items() if name not in ignore}
+            df = arguments.pop('df')
+            fingerprint = data_fingerprint(df, [arguments[name] for name in columns
+                                                if arguments[name] is not None])
+            settings = extra_key() if extra_key is not None else None
+            raw_key = repr((CACHE_VERSION, func.__module__, func.__qualname__, fingerprint,
+                            sorted(arguments.items()), settings))
+            key = hashlib.blake2b(raw_key.encode('utf-8'), digest_size=16).hexdigest()
+
+            cache = get_result_cache()
+            cached = cache.get(key)
+            if cached is not None:
+                return copy.deepcopy(cached)
+            result = func(*args, **kwargs)
+            cache.put(key, copy.deepcopy(result))
+            return result
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
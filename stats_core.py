@@ -1,15 +1,20 @@
 """
 经典统计分析核心函数
 """
-import pandas as pd
 import numpy as np
 from scipy import stats
-from scipy.stats import shapiro, levene
-import statsmodels.api as sm
-from statsmodels.stats.power import ttest_power
 
+from stats_assumptions import get_checker
+from stats_cache import memoize_result
+from stats_grouping import GroupedData
+from stats_ranks import group_rank_sums, kruskal_from_rank_sums, mannwhitney_ranked, rank_array, spearman_ranked
+from stats_regression import ols_fit
+from stats_results import AnovaResult, CorrelationResult, RegressionResult, TwoGroupResult
 
-def two_group_compare(df, value_col, group_col, alpha=0.05):
+
+@memoize_result(("value_col", "group_col", "weight_col"), extra_key=lambda: get_checker().settings)
+def two_group_compare(df, value_col, group_col, alpha=0.05, method="auto", permutation_options=None,
+                      weight_col=None):
     """
     两组比较：自动选择 t 检验或 Mann-Whitney U 检验
     
@@ -18,116 +23,148 @@ def two_group_compare(df, value_col, group_col, alpha=0.05):
         value_col: 数值变量列名
         group_col: 分组变量列名
         alpha: 显著性水平
+        method: "auto"（自动选择）或 "permutation"（置换检验，不依赖正态性）
+        permutation_options: 置换检验参数（n_resamples、n_jobs、seed 等），见 stats_permutation.permutation_pvalue
+        weight_col: 频数列名；指定时 df 为（数值, 组, 频数）形式的频数表，见 stats_frequency
     
     返回:
-        dict: 包含方法名、统计量、p值、额外信息、中文解释
+        TwoGroupResult: 包含方法名、统计量、p值、额外信息、中文解释（支持字典式访问）
+    """
+    if weight_col is not None:
+        if method == "permutation":
+            raise ValueError("频数表输入不支持置换检验")
+        from stats_frequency import two_group_compare_frequency
+        return two_group_compare_frequency(df, value_col, group_col, weight_col, alpha)
+    
+    if method == "permutation":
+        from stats_permutation import two_group_permutation
+        return two_group_permutation(df, value_col, group_col, alpha, **(permutation_options or {}))
+    
+    return two_group_compare_arrays(df[value_col].to_numpy(dtype=float, na_value=np.nan), df[group_col], alpha)
+
+
+def two_group_compare_arrays(values, groups, alpha=0.05, mask=None):
     """
-    # 获取两组数据
-    groups = df[group_col].unique()
-    if len(groups) != 2:
-        raise ValueError(f"分组变量必须恰好有 2 个组，当前有 {len(groups)} 个组")
+    两组比较的数组接口：自动选择 t 检验或 Mann-Whitney U 检验
     
-    group1 = df[df[group_col] == groups[0]][value_col].dropna()
-    group2 = df[df[group_col] == groups[1]][value_col].dropna()
+    参数:
+        values: 数值数组（float64 或 float32，NaN 视为缺失）
+        groups: 与 values 等长的分组标签数组
+        alpha: 显著性水平
+        mask: 可选的布尔数组，False 的行不参与分析
+    
+    返回:
+        TwoGroupResult: 与 two_group_compare 相同的结果
+    """
+    # 获取两组数据（分组列只因子化一次）
+    grouped = GroupedData.from_arrays(values, groups, mask)
+    if grouped.n_groups != 2:
+        raise ValueError(f"分组变量必须恰好有 2 个组，当前有 {grouped.n_groups} 个组")
+    
+    group1, group2 = grouped.segments()
     
     if len(group1) < 3 or len(group2) < 3:
         raise ValueError("每组至少需要 3 个观测值")
     
-    # 正态性检验（Shapiro-Wilk，样本量较小时）
-    # 注意：Shapiro-Wilk 在样本量 > 5000 时可能不准确
+    # 正态性检验（Shapiro-Wilk，样本量较小时）与方差齐性检验（Levene）
+    # 注意：Shapiro-Wilk 在样本量 > 5000 时可能不准确，此时改用大样本策略（默认为偏度和峰度检验）
+    # 结果按数据指纹缓存，重复分析同一数据时不再重新计算
     n1, n2 = len(group1), len(group2)
-    use_shapiro = n1 <= 5000 and n2 <= 5000
+    checks = get_checker().check_groups(grouped)
+    use_shapiro = checks['use_shapiro']
+    p_norm1, p_norm2 = checks['normality_p']
+    both_normal = p_norm1 > 0.05 and p_norm2 > 0.05
     
-    if use_shapiro:
-        _, p_norm1 = shapiro(group1)
-        _, p_norm2 = shapiro(group2)
-        both_normal = p_norm1 > 0.05 and p_norm2 > 0.05
-    else:
-        # 样本量太大时，使用偏度和峰度检验
-        from scipy.stats import normaltest
-        _, p_norm1 = normaltest(group1)
-        _, p_norm2 = normaltest(group2)
-        both_normal = p_norm1 > 0.05 and p_norm2 > 0.05
-    
-    # 方差齐性检验（Levene）
-    _, p_var = levene(group1, group2)
+    p_var = checks['levene_p']
     equal_var = p_var > 0.05
     
+    normality_p = (p_norm1, p_norm2) if use_shapiro else (None, None)
+    
     # 选择检验方法
-    if both_normal and equal_var:
-        # 独立样本 t 检验
-        stat, p_value = stats.ttest_ind(group1, group2, equal_var=True)
+    if both_normal:
+        # 独立样本 t 检验（等方差）或 Welch's t 检验（不等方差），仅需两组的样本量、均值和离差平方和
+        return ttest_from_moments(grouped.n, grouped.means, grouped.m2, equal_var=equal_var, alpha=alpha,
+                                  normality_p=normality_p, levene_p=p_var)
+    
+    # Mann-Whitney U 检验（非参数），秩按数据指纹缓存，重复分析同一列时不再排序
+    stat, p_value = mannwhitney_ranked(rank_array(values), grouped.row_codes)
+    method_name = "Mann-Whitney U 检验（非参数）"
+    
+    # 计算效应量（r = Z / sqrt(N)）
+    z_score = stats.norm.ppf(p_value / 2) if p_value < 0.5 else 0
+    r_effect = abs(z_score) / np.sqrt(n1 + n2)
+    
+    q1_1, median1, q3_1 = np.quantile(group1, [0.25, 0.5, 0.75])
+    q1_2, median2, q3_2 = np.quantile(group2, [0.25, 0.5, 0.75])
+    
+    extra_info = {
+        'group1_median': median1,
+        'group2_median': median2,
+        'group1_iqr': q3_1 - q1_1,
+        'group2_iqr': q3_2 - q1_2,
+        'r_effect': r_effect,
+        'normality_p1': normality_p[0],
+        'normality_p2': normality_p[1]
+    }
+    
+    return TwoGroupResult(method_name, stat, p_value, extra_info, _two_group_explanation(p_value, alpha))
+
+
+def _two_group_explanation(p_value, alpha):
+    """两组比较结果的中文解释"""
+    if p_value < alpha:
+        return f"p = {p_value:.4f} < {alpha}，两组间差异具有统计学意义（α = {alpha}）。"
+    return f"p = {p_value:.4f} ≥ {alpha}，两组间差异无统计学意义（α = {alpha}）。"
+
+
+def ttest_from_moments(n, means, m2, equal_var=True, alpha=0.05, normality_p=(None, None), levene_p=None):
+    """
+    由两组充分统计量计算独立样本 t 检验（等方差或 Welch）
+    
+    参数:
+        n: 两组样本量 (n1, n2)
+        means: 两组均值 (mean1, mean2)
+        m2: 两组离差平方和 (M2_1, M2_2)
+        equal_var: True 为独立样本 t 检验，False 为 Welch's t 检验
+        alpha: 显著性水平
+        normality_p: 两组正态性检验 p 值（未检验时为 None）
+        levene_p: Levene 检验 p 值（未检验时为 None）
+    
+    返回:
+        TwoGroupResult: 与 two_group_compare 参数检验分支相同的结果
+    """
+    n1, n2 = int(n[0]), int(n[1])
+    mean1, mean2 = means[0], means[1]
+    std1 = np.sqrt(m2[0] / (n1 - 1))
+    std2 = np.sqrt(m2[1] / (n2 - 1))
+    
+    stat, p_value = stats.ttest_ind_from_stats(mean1, std1, n1, mean2, std2, n2, equal_var=equal_var)
+    
+    if equal_var:
         method_name = "独立样本 t 检验（等方差）"
-        
         # 计算效应量（Cohen's d）
-        pooled_std = np.sqrt(((n1 - 1) * group1.std()**2 + (n2 - 1) * group2.std()**2) / (n1 + n2 - 2))
-        cohens_d = (group1.mean() - group2.mean()) / pooled_std if pooled_std > 0 else 0
-        
-        extra_info = {
-            'group1_mean': group1.mean(),
-            'group2_mean': group2.mean(),
-            'group1_std': group1.std(),
-            'group2_std': group2.std(),
-            'cohens_d': cohens_d,
-            'normality_p1': p_norm1 if use_shapiro else None,
-            'normality_p2': p_norm2 if use_shapiro else None,
-            'levene_p': p_var
-        }
-        
-    elif both_normal and not equal_var:
-        # Welch's t 检验（不等方差）
-        stat, p_value = stats.ttest_ind(group1, group2, equal_var=False)
-        method_name = "Welch's t 检验（不等方差）"
-        
-        pooled_std = np.sqrt((group1.std()**2 / n1 + group2.std()**2 / n2))
-        cohens_d = (group1.mean() - group2.mean()) / pooled_std if pooled_std > 0 else 0
-        
-        extra_info = {
-            'group1_mean': group1.mean(),
-            'group2_mean': group2.mean(),
-            'group1_std': group1.std(),
-            'group2_std': group2.std(),
-            'cohens_d': cohens_d,
-            'normality_p1': p_norm1 if use_shapiro else None,
-            'normality_p2': p_norm2 if use_shapiro else None,
-            'levene_p': p_var
-        }
-        
+        pooled_std = np.sqrt(((n1 - 1) * std1**2 + (n2 - 1) * std2**2) / (n1 + n2 - 2))
     else:
-        # Mann-Whitney U 检验（非参数）
-        stat, p_value = stats.mannwhitneyu(group1, group2, alternative='two-sided')
-        method_name = "Mann-Whitney U 检验（非参数）"
-        
-        # 计算效应量（r = Z / sqrt(N)）
-        z_score = stats.norm.ppf(p_value / 2) if p_value < 0.5 else 0
-        r_effect = abs(z_score) / np.sqrt(n1 + n2)
-        
-        extra_info = {
-            'group1_median': group1.median(),
-            'group2_median': group2.median(),
-            'group1_iqr': group1.quantile(0.75) - group1.quantile(0.25),
-            'group2_iqr': group2.quantile(0.75) - group2.quantile(0.25),
-            'r_effect': r_effect,
-            'normality_p1': p_norm1 if use_shapiro else None,
-            'normality_p2': p_norm2 if use_shapiro else None
-        }
+        method_name = "Welch's t 检验（不等方差）"
+        pooled_std = np.sqrt((std1**2 / n1 + std2**2 / n2))
+    cohens_d = (mean1 - mean2) / pooled_std if pooled_std > 0 else 0
     
-    # 生成解释
-    if p_value < alpha:
-        explanation_zh = f"p = {p_value:.4f} < {alpha}，两组间差异具有统计学意义（α = {alpha}）。"
-    else:
-        explanation_zh = f"p = {p_value:.4f} ≥ {alpha}，两组间差异无统计学意义（α = {alpha}）。"
-    
-    return {
-        'method_name': method_name,
-        'stat': stat,
-        'p_value': p_value,
-        'extra_info': extra_info,
-        'explanation_zh': explanation_zh
+    extra_info = {
+        'group1_mean': mean1,
+        'group2_mean': mean2,
+        'group1_std': std1,
+        'group2_std': std2,
+        'cohens_d': cohens_d,
+        'normality_p1': normality_p[0],
+        'normality_p2': normality_p[1],
+        'levene_p': levene_p
     }
+    
+    return TwoGroupResult(method_name, stat, p_value, extra_info, _two_group_explanation(p_value, alpha))
 
 
-def anova_oneway(df, value_col, group_col, alpha=0.05):
+@memoize_result(("value_col", "group_col", "weight_col"), extra_key=lambda: get_checker().settings)
+def anova_oneway(df, value_col, group_col, alpha=0.05, method="auto", permutation_options=None, weight_col=None):
     """
     单因素方差分析（ANOVA）
     
@@ -136,45 +173,139 @@ def anova_oneway(df, value_col, group_col, alpha=0.05):
         value_col: 数值变量列名
         group_col: 分组变量列名
         alpha: 显著性水平
+        method: "auto"（按正态性与方差齐性自动选择 F 检验、Welch 方差分析或 Kruskal-Wallis 检验）、
+                "f"、"welch"、"kruskal"，或 "permutation"（置换检验，不依赖正态性）
+        permutation_options: 置换检验参数（n_resamples、n_jobs、seed 等），见 stats_permutation.permutation_pvalue
+        weight_col: 频数列名；指定时 df 为（数值, 组, 频数）形式的频数表，见 stats_frequency
+    
+    返回:
+        AnovaResult: 包含方法名、统计量、p值、额外信息、中文解释（支持字典式访问）
+    """
+    if weight_col is not None:
+        if method == "permutation":
+            raise ValueError("频数表输入不支持置换检验")
+        from stats_frequency import anova_oneway_frequency
+        return anova_oneway_frequency(df, value_col, group_col, weight_col, alpha, method)
+    
+    if method == "permutation":
+        from stats_permutation import anova_permutation
+        return anova_permutation(df, value_col, group_col, alpha, **(permutation_options or {}))
+    
+    return anova_oneway_arrays(df[value_col].to_numpy(dtype=float, na_value=np.nan), df[group_col], alpha,
+                               method=method)
+
+
+ANOVA_METHODS = ("auto", "f", "welch", "kruskal")
+
+
+def select_anova_method(normality_p, levene_p):
+    """
+    多组比较的自动方法选择（与 two_group_compare 规则一致）
+    
+    每组正态（p > 0.05）且方差齐（Levene p > 0.05）时用 F 检验，
+    正态但方差不齐时用 Welch 方差分析，任一组不正态（或无法检验）时用 Kruskal-Wallis 检验。
+    
+    返回:
+        str: "f"、"welch" 或 "kruskal"
+    """
+    if not np.all(np.asarray(normality_p, dtype=float) > 0.05):
+        return "kruskal"
+    return "f" if levene_p > 0.05 else "welch"
+
+
+def anova_oneway_arrays(values, groups, alpha=0.05, mask=None, method="auto"):
+    """
+    单因素方差分析的数组接口
+    
+    分组只做一次，F 检验与 Welch 方差分析由每组充分统计量得到，
+    Kruskal-Wallis 检验的秩按数据指纹缓存、所有组共用一次排序。
+    
+    参数:
+        values: 数值数组（float64 或 float32，NaN 视为缺失）
+        groups: 与 values 等长的分组标签数组
+        alpha: 显著性水平
+        mask: 可选的布尔数组，False 的行不参与分析
+        method: "auto"、"f"、"welch" 或 "kruskal"（见 anova_oneway）
     
     返回:
-        dict: 包含方法名、统计量、p值、额外信息、中文解释
+        AnovaResult: 与 anova_oneway 相同的结果
     """
-    # 获取各组数据
-    groups = df[group_col].unique()
+    if method not in ANOVA_METHODS:
+        raise ValueError(f"method 必须为 {', '.join(ANOVA_METHODS)} 或 permutation 之一")
+    
+    # 获取各组数据（分组列只因子化一次，各组为连续片段）
+    grouped = GroupedData.from_arrays(values, groups, mask)
+    groups = grouped.labels
     if len(groups) < 2:
         raise ValueError("分组变量至少需要 2 个组")
     
-    group_data = [df[df[group_col] == g][value_col].dropna() for g in groups]
-    
     # 检查每组至少 2 个观测
-    if any(len(g) < 2 for g in group_data):
+    if (grouped.n < 2).any():
         raise ValueError("每组至少需要 2 个观测值")
     
-    # 执行 ANOVA
-    f_stat, p_value = stats.f_oneway(*group_data)
+    # 检验前提（每组正态性、Levene 方差齐性），结果按数据指纹缓存
+    checks = get_checker().check_groups(grouped)
+    if method == "auto":
+        method = select_anova_method(checks['normality_p'], checks['levene_p'])
+    
+    if method == "f":
+        result = anova_from_moments(groups, grouped.n, grouped.means, grouped.m2, alpha)
+    elif method == "welch":
+        result = welch_anova_from_moments(groups, grouped.n, grouped.means, grouped.m2, alpha)
+    else:
+        rank_sums, _, tie = group_rank_sums(rank_array(values), grouped.row_codes, grouped.n_groups)
+        result = kruskal_from_moments(groups, grouped.n, grouped.means, grouped.m2, rank_sums, tie, alpha)
+    result['extra_info']['normality_p'] = dict(zip(groups, checks['normality_p']))
+    result['extra_info']['normality_method'] = checks['normality_method']
+    result['extra_info']['levene_p'] = checks['levene_p']
+    return result
+
+
+def anova_from_moments(groups, n, means, m2, alpha=0.05):
+    """
+    由每组充分统计量计算单因素方差分析
     
-    # 计算组间和组内平方和
-    all_values = df[value_col].dropna()
-    grand_mean = all_values.mean()
+    参数:
+        groups: 组标签
+        n: 每组样本量
+        means: 每组均值
+        m2: 每组离差平方和
+        alpha: 显著性水平
     
-    ss_between = sum(len(g) * (g.mean() - grand_mean)**2 for g in group_data)
-    ss_within = sum((g - g.mean()).pow(2).sum() for g in group_data)
+    返回:
+        AnovaResult: 与 anova_oneway 相同的结果
+    """
+    n = np.asarray(n)
+    group_means_arr = np.asarray(means, dtype=float)
+    m2 = np.asarray(m2, dtype=float)
+    
+    # 由每组充分统计量计算组间和组内平方和
+    n_total = int(n.sum())
+    grand_mean = np.sum(n * group_means_arr) / n_total
+    
+    ss_between = float(np.sum(n * (group_means_arr - grand_mean)**2))
+    ss_within = float(np.sum(m2))
     ss_total = ss_between + ss_within
     
     df_between = len(groups) - 1
-    df_within = len(all_values) - len(groups)
-    df_total = len(all_values) - 1
+    df_within = n_total - len(groups)
+    df_total = n_total - 1
     
     ms_between = ss_between / df_between if df_between > 0 else 0
     ms_within = ss_within / df_within if df_within > 0 else 0
     
+    # 执行 ANOVA（F = MS_between / MS_within）
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_stat = np.float64(ms_between) / ms_within
+    p_value = stats.f.sf(f_stat, df_between, df_within)
+    
     # 计算效应量（eta-squared）
     eta_squared = ss_between / ss_total if ss_total > 0 else 0
     
     # 组均值
-    group_means = {g: data.mean() for g, data in zip(groups, group_data)}
-    group_stds = {g: data.std() for g, data in zip(groups, group_data)}
+    group_stds_arr = np.sqrt(m2 / (n - 1))
+    group_means = dict(zip(groups, group_means_arr))
+    group_stds = dict(zip(groups, group_stds_arr))
     
     extra_info = {
         'n_groups': len(groups),
@@ -198,16 +329,89 @@ def anova_oneway(df, value_col, group_col, alpha=0.05):
     else:
         explanation_zh = f"p = {p_value:.4f} ≥ {alpha}，各组间差异无统计学意义（α = {alpha}）。"
     
-    return {
-        'method_name': method_name,
-        'stat': f_stat,
-        'p_value': p_value,
-        'extra_info': extra_info,
-        'explanation_zh': explanation_zh
-    }
+    return AnovaResult(method_name, f_stat, p_value, extra_info, explanation_zh)
+
+
+def welch_anova_from_moments(groups, n, means, m2, alpha=0.05):
+    """
+    由每组充分统计量计算 Welch 方差分析（不要求方差齐性）
+    
+    参数:
+        groups: 组标签
+        n: 每组样本量
+        means: 每组均值
+        m2: 每组离差平方和
+        alpha: 显著性水平
+    
+    返回:
+        AnovaResult: 与 anova_oneway 相同的结果，extra_info 另含 welch_df1、welch_df2
+    """
+    result = anova_from_moments(groups, n, means, m2, alpha)
+    n = np.asarray(n, dtype=float)
+    means = np.asarray(means, dtype=float)
+    k = len(groups)
+    
+    # 以 n / s² 为权重的加权均值与组间离差
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = n / (np.asarray(m2, dtype=float) / (n - 1))
+        total_weight = weights.sum()
+        weighted_mean = np.sum(weights * means) / total_weight
+        a = np.sum(weights * (means - weighted_mean)**2) / (k - 1)
+        tmp = np.sum((1 - weights / total_weight)**2 / (n - 1))
+        b = 1 + 2 * (k - 2) / (k**2 - 1) * tmp
+        f_stat = np.float64(a / b)
+        df2 = (k**2 - 1) / (3 * tmp)
+    p_value = stats.f.sf(f_stat, k - 1, df2)
+    
+    result['extra_info']['welch_df1'] = k - 1
+    result['extra_info']['welch_df2'] = float(df2)
+    result['method_name'] = "Welch 方差分析（不等方差）"
+    result['stat'] = f_stat
+    result['p_value'] = p_value
+    
+    if p_value < alpha:
+        result['explanation_zh'] = f"p = {p_value:.4f} < {alpha}，各组间差异具有统计学意义（α = {alpha}）。各组方差不齐，建议使用 Games-Howell 事后检验确定具体哪些组间存在差异。"
+    else:
+        result['explanation_zh'] = f"p = {p_value:.4f} ≥ {alpha}，各组间差异无统计学意义（α = {alpha}）。"
+    return result
+
+
+def kruskal_from_moments(groups, n, means, m2, rank_sums, tie_term, alpha=0.05):
+    """
+    由每组充分统计量与秩和计算 Kruskal-Wallis H 检验（非参数）
+    
+    参数:
+        groups: 组标签
+        n: 每组样本量
+        means: 每组均值（用于描述统计）
+        m2: 每组离差平方和（用于描述统计）
+        rank_sums: 各组秩和（在所有组的合并样本内排秩）
+        tie_term: 合并样本的结校正项 Σ(t³ - t)
+        alpha: 显著性水平
+    
+    返回:
+        AnovaResult: 与 anova_oneway 相同的结果，extra_info 另含 mean_ranks、epsilon_squared
+    """
+    result = anova_from_moments(groups, n, means, m2, alpha)
+    n = np.asarray(n, dtype=float)
+    h_stat, p_value = kruskal_from_rank_sums(rank_sums, n, tie_term)
+    
+    # 效应量 ε² = H / (N - 1)
+    result['extra_info']['mean_ranks'] = dict(zip(groups, np.asarray(rank_sums, dtype=float) / n))
+    result['extra_info']['epsilon_squared'] = float(h_stat / (n.sum() - 1))
+    result['method_name'] = "Kruskal-Wallis H 检验（非参数）"
+    result['stat'] = np.float64(h_stat)
+    result['p_value'] = float(p_value)
+    
+    if p_value < alpha:
+        result['explanation_zh'] = f"p = {p_value:.4f} < {alpha}，各组间差异具有统计学意义（α = {alpha}）。建议进行 Dunn 事后检验以确定具体哪些组间存在差异。"
+    else:
+        result['explanation_zh'] = f"p = {p_value:.4f} ≥ {alpha}，各组间差异无统计学意义（α = {alpha}）。"
+    return result
 
 
-def correlation(df, col_x, col_y, method="auto", alpha=0.05):
+@memoize_result(("col_x", "col_y", "weight_col"), extra_key=lambda: get_checker().settings)
+def correlation(df, col_x, col_y, method="auto", alpha=0.05, weight_col=None):
     """
     相关性分析：自动选择 Pearson 或 Spearman
     
@@ -217,42 +421,106 @@ def correlation(df, col_x, col_y, method="auto", alpha=0.05):
         col_y: 变量 Y 列名
         method: "auto", "pearson", "spearman"
         alpha: 显著性水平
+        weight_col: 频数列名；指定时 df 为（x, y, 频数）形式的频数表，见 stats_frequency
     
     返回:
-        dict: 包含方法名、统计量、p值、额外信息、中文解释
+        CorrelationResult: 包含方法名、统计量、p值、额外信息、中文解释（支持字典式访问）
     """
-    # 去除缺失值
-    data = df[[col_x, col_y]].dropna()
+    if weight_col is not None:
+        from stats_frequency import correlation_frequency
+        return correlation_frequency(df, col_x, col_y, weight_col, method, alpha)
     
-    if len(data) < 3:
-        raise ValueError("至少需要 3 对有效观测值")
+    return correlation_arrays(df[col_x].to_numpy(dtype=float, na_value=np.nan),
+                              df[col_y].to_numpy(dtype=float, na_value=np.nan), method, alpha)
+
+
+def correlation_arrays(x, y, method="auto", alpha=0.05, mask=None):
+    """
+    相关性分析的数组接口：自动选择 Pearson 或 Spearman
+    
+    参数:
+        x, y: 等长数值数组（float64 或 float32，任一为 NaN 的行被去除）
+        method: "auto", "pearson", "spearman"
+        alpha: 显著性水平
+        mask: 可选的布尔数组，False 的行不参与分析
+    
+    返回:
+        CorrelationResult: 与 correlation 相同的结果
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
     
-    x = data[col_x]
-    y = data[col_y]
+    # 去除缺失值
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if mask is not None:
+        valid &= np.asarray(mask, dtype=bool)
+    x_valid = x[valid]
+    y_valid = y[valid]
+    n = len(x_valid)
+    
+    if n < 3:
+        raise ValueError("至少需要 3 对有效观测值")
     
     # 自动选择方法
     if method == "auto":
-        # 检查是否近似正态（使用偏度和峰度）
-        from scipy.stats import normaltest
-        _, p_x = normaltest(x)
-        _, p_y = normaltest(y)
+        # 检查是否近似正态（使用偏度和峰度），结果按数据指纹缓存
+        p_x, p_y = get_checker().check_arrays([x_valid, y_valid])
         
         if p_x > 0.05 and p_y > 0.05:
             method = "pearson"
         else:
             method = "spearman"
     
+    # 均值与离均差平方和只计算一次
+    mean_x = x_valid.mean()
+    mean_y = y_valid.mean()
+    dx = x_valid - mean_x
+    dy = y_valid - mean_y
+    sxx = dx @ dx
+    syy = dy @ dy
+    
     # 执行相关性检验
     if method == "pearson":
-        stat, p_value = stats.pearsonr(x, y)
+        return pearson_from_moments(n, mean_x, mean_y, sxx, syy, dx @ dy, alpha)
+    
+    stat, p_value = spearman_ranked(rank_array(x), rank_array(y), valid)
+    return _correlation_result(method, stat, p_value, n, mean_x, mean_y,
+                               np.sqrt(sxx / (n - 1)), np.sqrt(syy / (n - 1)), alpha)
+
+
+def pearson_from_moments(n, mean_x, mean_y, sxx, syy, sxy, alpha=0.05):
+    """
+    由中心化充分统计量计算 Pearson 相关（结果结构与 correlation 的 Pearson 分支相同）
+    
+    参数:
+        n: 成对有效观测数
+        mean_x, mean_y: X 与 Y 的均值
+        sxx, syy, sxy: 离均差平方和与离均差积和
+        alpha: 显著性水平
+    
+    返回:
+        CorrelationResult: 包含方法名、统计量、p值、额外信息、中文解释
+    """
+    n = int(n)
+    if n < 3:
+        raise ValueError("至少需要 3 对有效观测值")
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = float(np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0))
+        t = r * np.sqrt((n - 2) / ((1.0 - r) * (1.0 + r)))
+    p_value = 0.0 if abs(r) >= 1.0 else 2 * stats.t.sf(abs(t), n - 2)
+    return _correlation_result("pearson", r, p_value, n, mean_x, mean_y,
+                               np.sqrt(sxx / (n - 1)), np.sqrt(syy / (n - 1)), alpha)
+
+
+def _correlation_result(method, stat, p_value, n, x_mean, y_mean, x_std, y_std, alpha):
+    """组装相关性分析结果（Pearson 时附 Fisher z 置信区间）"""
+    if method == "pearson":
         method_name = "Pearson 相关系数"
     else:
-        stat, p_value = stats.spearmanr(x, y)
         method_name = "Spearman 等级相关系数"
     
     # 计算置信区间（仅 Pearson）
-    if method == "pearson" and len(data) > 3:
-        n = len(data)
+    if method == "pearson" and n > 3:
         z = np.arctanh(stat)  # Fisher's z transformation
         se = 1 / np.sqrt(n - 3)
         z_lower = z - 1.96 * se
@@ -265,11 +533,11 @@ def correlation(df, col_x, col_y, method="auto", alpha=0.05):
     
     extra_info = {
         'correlation_coefficient': stat,
-        'n': len(data),
-        'x_mean': x.mean(),
-        'y_mean': y.mean(),
-        'x_std': x.std(),
-        'y_std': y.std(),
+        'n': n,
+        'x_mean': x_mean,
+        'y_mean': y_mean,
+        'x_std': x_std,
+        'y_std': y_std,
         'ci_95': ci
     }
     
@@ -293,16 +561,11 @@ def correlation(df, col_x, col_y, method="auto", alpha=0.05):
     else:
         explanation_zh = f"r = {stat:.4f}，{direction}{strength}（p = {p_value:.4f} ≥ {alpha}，无统计学意义）。"
     
-    return {
-        'method_name': method_name,
-        'stat': stat,
-        'p_value': p_value,
-        'extra_info': extra_info,
-        'explanation_zh': explanation_zh
-    }
+    return CorrelationResult(method_name, stat, p_value, extra_info, explanation_zh)
 
 
-def linear_regression_simple(df, x_col, y_col, alpha=0.05):
+@memoize_result(("x_col", "y_col", "weight_col"), extra_key=lambda: get_checker().settings)
+def linear_regression_simple(df, x_col, y_col, alpha=0.05, weight_col=None):
     """
     简单线性回归
     
@@ -311,52 +574,84 @@ def linear_regression_simple(df, x_col, y_col, alpha=0.05):
         x_col: 自变量列名
         y_col: 因变量列名
         alpha: 显著性水平
+        weight_col: 频数列名；指定时 df 为（x, y, 频数）形式的频数表，见 stats_frequency
+    
+    返回:
+        RegressionResult: 包含方法名、统计量、p值、额外信息、中文解释（支持字典式访问）
+    """
+    if weight_col is not None:
+        from stats_frequency import linear_regression_frequency
+        return linear_regression_frequency(df, x_col, y_col, weight_col, alpha)
+    
+    return linear_regression_arrays(df[x_col].to_numpy(dtype=float, na_value=np.nan),
+                                    df[y_col].to_numpy(dtype=float, na_value=np.nan), alpha)
+
+
+def linear_regression_arrays(x, y, alpha=0.05, mask=None):
+    """
+    简单线性回归的数组接口
+    
+    参数:
+        x: 自变量数组（float64 或 float32）
+        y: 因变量数组（任一为 NaN 的行被去除）
+        alpha: 显著性水平
+        mask: 可选的布尔数组，False 的行不参与分析
     
     返回:
-        dict: 包含方法名、统计量、p值、额外信息、中文解释
+        RegressionResult: 与 linear_regression_simple 相同的结果
     """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    
     # 去除缺失值
-    data = df[[x_col, y_col]].dropna()
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if mask is not None:
+        valid &= np.asarray(mask, dtype=bool)
+    x = x[valid]
+    y = y[valid]
     
-    if len(data) < 3:
+    if len(x) < 3:
         raise ValueError("至少需要 3 对有效观测值")
     
-    x = data[x_col]
-    y = data[y_col]
+    # 闭式最小二乘解：由充分统计量直接得到斜率、截距及检验统计量
+    if not (x[1:] != x[0]).any():
+        raise ValueError("自变量 X 没有变异（所有取值相同），无法进行回归分析")
+    fit = ols_fit(x, y, alpha)
+    return regression_from_fit(fit, alpha)
+
+
+def regression_from_fit(fit, alpha=0.05):
+    """
+    由闭式最小二乘结果组装回归分析结果
     
-    # 使用 statsmodels 进行回归
-    X = sm.add_constant(x)  # 添加常数项
-    model = sm.OLS(y, X).fit()
+    参数:
+        fit: stats_regression.ols_from_moments / ols_fit 的返回值（标量）
+        alpha: 显著性水平
     
+    返回:
+        RegressionResult: 与 linear_regression_simple 相同结构的结果
+    """
     # 提取结果
-    slope = model.params[x_col]
-    intercept = model.params['const']
-    r_squared = model.rsquared
-    p_value = model.pvalues[x_col]
+    slope = fit['slope']
+    intercept = fit['intercept']
+    r_squared = fit['r_squared']
+    p_value = fit['p_value']
     
     # F 统计量
-    f_stat = model.fvalue
-    f_pvalue = model.f_pvalue
-    
-    # 残差标准误
-    std_err = np.sqrt(model.mse_resid)
-    
-    # 斜率的标准误和置信区间
-    slope_se = model.bse[x_col]
-    slope_ci = model.conf_int(alpha=alpha).loc[x_col]
+    f_stat = fit['f_statistic']
     
     extra_info = {
         'slope': slope,
         'intercept': intercept,
         'r_squared': r_squared,
-        'adj_r_squared': model.rsquared_adj,
-        'std_err': std_err,
-        'slope_se': slope_se,
-        'slope_ci_lower': slope_ci[0],
-        'slope_ci_upper': slope_ci[1],
+        'adj_r_squared': fit['adj_r_squared'],
+        'std_err': fit['std_err'],
+        'slope_se': fit['slope_se'],
+        'slope_ci_lower': fit['slope_ci_lower'],
+        'slope_ci_upper': fit['slope_ci_upper'],
         'f_statistic': f_stat,
-        'f_pvalue': f_pvalue,
-        'n': len(data)
+        'f_pvalue': fit['f_pvalue'],
+        'n': int(fit['n'])
     }
     
     method_name = "简单线性回归（OLS）"
@@ -367,11 +662,6 @@ def linear_regression_simple(df, x_col, y_col, alpha=0.05):
     else:
         explanation_zh = f"回归方程：y = {intercept:.4f} + {slope:.4f} × x。斜率无统计学意义（p = {p_value:.4f} ≥ {alpha}），R² = {r_squared:.4f}。"
     
-    return {
-        'method_name': method_name,
-        'stat': f_stat,  # 使用 F 统计量
-        'p_value': p_value,  # 斜率的 p 值
-        'extra_info': extra_info,
-        'explanation_zh': explanation_zh
-    }
+    # stat 为 F 统计量，p_value 为斜率的 p 值
+    return RegressionResult(method_name, f_stat, p_value, extra_info, explanation_zh)
 
@@ -0,0 +1,251 @@
+"""
+全部变量两两相关矩阵：Pearson / Spearman 系数、p 值与 Fisher z 置信区间
+"""
+import numpy as np
+import pandas as pd
+from scipy import special, stats
+
+from stats_batch import normaltest_columns
+from stats_multitest import P_ADJUST_METHODS, adjust_pvalues
+
+
+def rank_columns(values):
+    """
+    按列计算平均秩（有结时取平均），缺失值保持为 NaN
+
+    参数:
+        values: 形状 (n, m) 的数组，可含 NaN
+
+    返回:
+        ndarray: 与 values 同形状的秩矩阵
+    """
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    if not missing.any():
+        return stats.rankdata(values, axis=0)
+    # 缺失值替换为 +inf 后排在最后，不影响有效值的秩
+    ranks = stats.rankdata(np.where(missing, np.inf, values), axis=0)
+    ranks[missing] = np.nan
+    return ranks
+
+
+def _pearson_matrix(values):
+    """
+    按成对完整观测计算 Pearson 相关矩阵
+
+    返回:
+        tuple: (r 矩阵, 成对有效样本量矩阵)
+    """
+    values = np.asarray(values, dtype=float)
+    missing = np.isnan(values)
+    # 先按列均值中心化，减少后续平方和公式的数值抵消
+    with np.errstate(invalid='ignore'):
+        centered = values - np.nanmean(values, axis=0)
+
+    if not missing.any():
+        n_obs = values.shape[0]
+        ss = np.einsum('ij,ij->j', centered, centered)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = centered / np.sqrt(ss)
+        r = scaled.T @ scaled
+        n = np.full(r.shape, n_obs, dtype=float)
+    else:
+        # 掩码矩阵运算：每个元素只统计两列同时有效的行
+        mask = (~missing).astype(float)
+        filled = np.where(missing, 0.0, centered)
+        n = mask.T @ mask
+        sums = filled.T @ mask            # sums[i, j]：列 i 在 (i, j) 成对有效行上的和
+        sumsq = (filled * filled).T @ mask
+        cross = filled.T @ filled
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = cross - sums * sums.T / n
+            var_x = sumsq - sums**2 / n
+            r = cov / np.sqrt(var_x * var_x.T)
+
+    r = np.clip(r, -1.0, 1.0)
+    np.fill_diagonal(r, 1.0)
+    return r, n
+
+
+def _r_pvalues(r, n):
+    """相关系数的双侧 p 值（t 分布，自由度 n - 2）"""
+    dof = n - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+        p = 2 * special.stdtr(dof, -np.abs(t))
+    p = np.where(np.abs(r) >= 1.0, 0.0, p)
+    return np.where(dof > 0, p, np.nan)
+
+
+def _fisher_ci(r, n):
+    """Fisher z 变换的 95% 置信区间（与 correlation 相同，使用 1.96）"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.arctanh(r)
+        se = 1 / np.sqrt(n - 3)
+        lower = np.tanh(z - 1.96 * se)
+        upper = np.tanh(z + 1.96 * se)
+    valid = n > 3
+    return np.where(valid, lower, np.nan), np.where(valid, upper, np.nan)
+
+
+def _symmetric(upper_values, m, diagonal=np.nan):
+    """由上三角元素构造对称矩阵"""
+    matrix = np.empty((m, m))
+    i, j = np.triu_indices(m, k=1)
+    matrix[i, j] = upper_values
+    matrix[j, i] = upper_values
+    np.fill_diagonal(matrix, diagonal)
+    return matrix
+
+
+def _rerank_pairs(r, values, n, spearman):
+    """
+    缺失模式不同的 Spearman 变量对：在成对完整行内重新排秩（原地修改 r）
+
+    缺失模式相同的列归为一组；每两组只在两组共同的有效行上排一次秩，
+    组间的全部系数由一次矩阵乘法得到。Python 循环次数为缺失模式组数的平方，与列数无关。
+    """
+    valid = ~np.isnan(values)
+    counts = np.count_nonzero(valid, axis=0)
+    rerank = spearman & (n >= 3) & ((n != counts[:, None]) | (n != counts[None, :]))
+    involved = np.flatnonzero(rerank.any(axis=0))
+    if len(involved) == 0:
+        return
+    patterns, pattern_of = np.unique(valid[:, involved].T, axis=0, return_inverse=True)
+    groups = [involved[pattern_of.ravel() == g] for g in range(len(patterns))]
+    for s in range(len(groups)):
+        for q in range(s + 1, len(groups)):
+            a, b = groups[s], groups[q]
+            block = rerank[np.ix_(a, b)]
+            if not block.any():
+                continue
+            rows = patterns[s] & patterns[q]
+            ranks = stats.rankdata(values[np.ix_(rows, np.concatenate([a, b]))], axis=0)
+            centered = ranks - ranks.mean(axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scaled = centered / np.sqrt(np.einsum('ij,ij->j', centered, centered))
+            coef = np.clip(scaled[:, :len(a)].T @ scaled[:, len(a):], -1.0, 1.0)
+            sub = np.where(block, coef, r[np.ix_(a, b)])
+            r[np.ix_(a, b)] = sub
+            r[np.ix_(b, a)] = sub.T
+
+
+def correlation_matrix(df, columns=None, method="auto", missing="pairwise", p_adjust=None, exact_ranks=False):
+    """
+    全部数值变量的两两相关矩阵
+
+    参数:
+        df: DataFrame
+        columns: 参与计算的列名列表（默认全部数值列）
+        method: "auto", "pearson", "spearman"
+            auto 时每列只做一次 normaltest，两列均近似正态的变量对用 Pearson，否则用 Spearman
+        missing: "pairwise"（成对完整观测）或 "complete"（整行删除含缺失值的行）
+            pairwise 时 Spearman 使用各列在自身全部有效行上的秩（每列排一次秩，再做掩码矩阵运算），
+            两列缺失模式不同时与在成对完整行内重新排秩的结果略有差异
+        p_adjust: 多重检验校正方法（见 stats_multitest.P_ADJUST_METHODS），在全部 m(m-1)/2 个变量对上校正
+        exact_ranks: pairwise 时是否在每对变量的成对完整行内重新排秩（与 scipy.stats.spearmanr 逐对计算一致）；
+            按缺失模式分组计算，缺失模式种类少时很快，缺失值零散分布时耗时随列数平方增长
+
+    返回:
+        dict: 包含 r、p_value、ci_lower、ci_upper、n 矩阵（DataFrame），
+              pearson_mask（各变量对是否使用 Pearson）、各列正态性检验 p 值 normality_p 及 method；
+              指定 p_adjust 时另含校正后的 p 值矩阵 p_adjusted 与校正方法 p_adjust
+    """
+    if method not in ("auto", "pearson", "spearman"):
+        raise ValueError("method 必须为 auto、pearson 或 spearman")
+    if missing not in ("pairwise", "complete"):
+        raise ValueError("missing 必须为 pairwise 或 complete")
+    if p_adjust is not None and p_adjust not in P_ADJUST_METHODS:
+        raise ValueError(f"p_adjust 必须为 {', '.join(P_ADJUST_METHODS)} 之一")
+
+    if columns is None:
+        columns = df.select_dtypes(include=[np.number]).columns.tolist()
+    columns = list(columns)
+    if len(columns) < 2:
+        raise ValueError("至少需要 2 个数值变量")
+
+    data = df[columns]
+    if missing == "complete":
+        data = data.dropna()
+    values = data.to_numpy(dtype=float, na_value=np.nan)
+    m = len(columns)
+
+    # 每列只做一次正态性检验
+    normality_p = normaltest_columns(values)
+    if method == "auto":
+        normal = normality_p > 0.05
+        use_pearson = normal[:, None] & normal[None, :]
+    else:
+        use_pearson = np.full((m, m), method == "pearson")
+
+    r = np.full((m, m), np.nan)
+    n = None
+    if use_pearson.any():
+        r_pearson, n = _pearson_matrix(values)
+        r = np.where(use_pearson, r_pearson, r)
+    if not use_pearson.all():
+        # 每列只排一次秩，Spearman 即秩的 Pearson 相关
+        r_spearman, n = _pearson_matrix(rank_columns(values))
+        if exact_ranks:
+            _rerank_pairs(r_spearman, values, n, ~use_pearson)
+        r = np.where(use_pearson, r, r_spearman)
+
+    r = np.where(n >= 3, r, np.nan)
+    np.fill_diagonal(r, 1.0)
+
+    # p 值与置信区间只在上三角上计算，再镜像为对称矩阵
+    i, j = np.triu_indices(m, k=1)
+    r_upper, n_upper, pearson_upper = r[i, j], n[i, j], use_pearson[i, j]
+    p_upper = _r_pvalues(r_upper, n_upper)
+    p_value = _symmetric(p_upper, m)
+    lower, upper = _fisher_ci(r_upper, n_upper)
+    # 与 correlation 一致：仅 Pearson 给出置信区间
+    ci_lower = _symmetric(np.where(pearson_upper, lower, np.nan), m)
+    ci_upper = _symmetric(np.where(pearson_upper, upper, np.nan), m)
+
+    def frame(matrix):
+        return pd.DataFrame(matrix, index=columns, columns=columns)
+
+    result = {
+        'method': method,
+        'r': frame(r),
+        'p_value': frame(p_value),
+        'ci_lower': frame(ci_lower),
+        'ci_upper': frame(ci_upper),
+        'n': frame(n.astype(np.int64)),
+        'pearson_mask': frame(use_pearson),
+        'normality_p': pd.Series(normality_p, index=columns),
+    }
+    if p_adjust is not None:
+        result['p_adjusted'] = frame(_symmetric(adjust_pvalues(p_upper, p_adjust), m))
+        result['p_adjust'] = p_adjust
+    return result
+
+
+def correlation_pairs(result):
+    """
+    把 correlation_matrix 的结果展开为长表（每个变量对一行，仅上三角）
+
+    参数:
+        result: correlation_matrix 的返回值
+
+    返回:
+        DataFrame: 列为 x、y、method、r、p_value、ci_lower、ci_upper、n
+                   （结果含 p_adjusted 时在 p_value 之后增加 p_adjusted 列）
+    """
+    columns = result['r'].columns
+    i, j = np.triu_indices(len(columns), k=1)
+    pairs = pd.DataFrame({
+        'x': columns[i],
+        'y': columns[j],
+        'method': np.where(result['pearson_mask'].to_numpy()[i, j], "pearson", "spearman"),
+        'r': result['r'].to_numpy()[i, j],
+        'p_value': result['p_value'].to_numpy()[i, j],
+        'ci_lower': result['ci_lower'].to_numpy()[i, j],
+        'ci_upper': result['ci_upper'].to_numpy()[i, j],
+        'n': result['n'].to_numpy()[i, j],
+    })
+    if 'p_adjusted' in result:
+        pairs.insert(pairs.columns.get_loc('p_value') + 1, 'p_adjusted', result['p_adjusted'].to_numpy()[i, j])
+        pairs.attrs['p_adjust'] = result['p_adjust']
+    return pairs
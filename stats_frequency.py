@@ -0,0 +1,207 @@
+"""
+频数表输入：对（数值, 组, 频数）形式的数据直接做经典检验，不展开为原始行
+
+仪器导出的数据常常只有几百个不同取值却有上百万行，按频数加权计算矩、秩与回归，
+内存与计算量只取决于不同取值的个数，结果与展开后的数据完全一致。
+"""
+import numpy as np
+from scipy import stats
+
+from stats_assumptions import get_checker
+from stats_core import (ANOVA_METHODS, _correlation_result, _two_group_explanation, anova_from_moments,
+                        kruskal_from_moments, pearson_from_moments, regression_from_fit, select_anova_method,
+                        ttest_from_moments, welch_anova_from_moments)
+from stats_grouping import FrequencyGroupedData, frequency_counts
+from stats_ranks import _midranks, _tie_term, mannwhitney_pvalue
+from stats_regression import ols_from_moments
+from stats_results import TwoGroupResult
+
+
+def _tie_ranks(values, counts):
+    """
+    频数表中每行取值的平均秩与结校正项
+
+    返回:
+        tuple: (与 values 对齐的平均秩, Σ(t³ - t))
+    """
+    unique, inverse = np.unique(values, return_inverse=True)
+    ties = np.bincount(inverse, weights=counts, minlength=len(unique))
+    return _midranks(ties)[inverse], _tie_term(ties)
+
+
+def _pair_moments(x, y, w):
+    """加权成对矩：(n, mean_x, mean_y, sxx, syy, sxy)"""
+    n = w.sum()
+    mean_x = w @ x / n
+    mean_y = w @ y / n
+    dx = x - mean_x
+    dy = y - mean_y
+    wdx = w * dx
+    return n, mean_x, mean_y, wdx @ dx, (w * dy) @ dy, wdx @ dy
+
+
+def _pair_table(df, col_x, col_y, weight_col):
+    """两列同时有效且频数为正的行：(x, y, 频数)"""
+    x = df[col_x].to_numpy(dtype=float, na_value=np.nan)
+    y = df[col_y].to_numpy(dtype=float, na_value=np.nan)
+    w = frequency_counts(df[weight_col].to_numpy(dtype=float, na_value=np.nan))
+    valid = ~(np.isnan(x) | np.isnan(y)) & (w > 0)
+    return x[valid], y[valid], w[valid]
+
+
+def two_group_compare_frequency(df, value_col, group_col, weight_col, alpha=0.05):
+    """
+    频数表的两组比较：自动选择 t 检验或 Mann-Whitney U 检验（规则与 two_group_compare 相同）
+
+    参数:
+        df: 频数表 DataFrame，每行为（数值, 组, 频数）
+        value_col: 数值变量列名
+        group_col: 分组变量列名
+        weight_col: 频数列名（非负整数）
+        alpha: 显著性水平
+
+    返回:
+        TwoGroupResult: 与 two_group_compare 相同结构的结果
+    """
+    table = FrequencyGroupedData.from_frame(df, value_col, group_col, weight_col)
+    if table.n_groups != 2:
+        raise ValueError(f"分组变量必须恰好有 2 个组，当前有 {table.n_groups} 个组")
+    n1, n2 = int(table.n[0]), int(table.n[1])
+    if n1 < 3 or n2 < 3:
+        raise ValueError("每组至少需要 3 个观测值")
+
+    checks = get_checker().check_frequency_groups(table, value_col, group_col, weight_col)
+    p_norm1, p_norm2 = checks['normality_p']
+    p_var = checks['levene_p']
+    normality_p = (p_norm1, p_norm2) if checks['use_shapiro'] else (None, None)
+
+    if p_norm1 > 0.05 and p_norm2 > 0.05:
+        return ttest_from_moments(table.n, table.means, table.m2, equal_var=p_var > 0.05, alpha=alpha,
+                                  normality_p=normality_p, levene_p=p_var)
+
+    # Mann-Whitney U 检验：在两组合并的不同取值上排秩
+    ranks, tie = _tie_ranks(table.values, table.counts)
+    mask = table.codes == 0
+    u1 = table.counts[mask] @ ranks[mask] - n1 * (n1 + 1) / 2
+    p_value = float(mannwhitney_pvalue(u1, n1, n2, tie))
+
+    z_score = stats.norm.ppf(p_value / 2) if p_value < 0.5 else 0
+    q1_1, median1, q3_1 = table.quantile(0, [0.25, 0.5, 0.75])
+    q1_2, median2, q3_2 = table.quantile(1, [0.25, 0.5, 0.75])
+    extra_info = {
+        'group1_median': median1,
+        'group2_median': median2,
+        'group1_iqr': q3_1 - q1_1,
+        'group2_iqr': q3_2 - q1_2,
+        'r_effect': abs(z_score) / np.sqrt(n1 + n2),
+        'normality_p1': normality_p[0],
+        'normality_p2': normality_p[1]
+    }
+    return TwoGroupResult("Mann-Whitney U 检验（非参数）", u1, p_value, extra_info,
+                          _two_group_explanation(p_value, alpha))
+
+
+def anova_oneway_frequency(df, value_col, group_col, weight_col, alpha=0.05, method="auto"):
+    """
+    频数表的单因素方差分析：自动选择 F 检验、Welch 方差分析或 Kruskal-Wallis 检验（规则与 anova_oneway 相同）
+
+    参数:
+        df: 频数表 DataFrame，每行为（数值, 组, 频数）
+        value_col: 数值变量列名
+        group_col: 分组变量列名
+        weight_col: 频数列名（非负整数）
+        alpha: 显著性水平
+        method: "auto"、"f"、"welch" 或 "kruskal"
+
+    返回:
+        AnovaResult: 与 anova_oneway 相同结构的结果
+    """
+    if method not in ANOVA_METHODS:
+        raise ValueError(f"method 必须为 {', '.join(ANOVA_METHODS)} 之一")
+    table = FrequencyGroupedData.from_frame(df, value_col, group_col, weight_col)
+    groups = table.labels
+    if len(groups) < 2:
+        raise ValueError("分组变量至少需要 2 个组")
+    if (table.n < 2).any():
+        raise ValueError("每组至少需要 2 个观测值")
+
+    checks = get_checker().check_frequency_groups(table, value_col, group_col, weight_col)
+    if method == "auto":
+        method = select_anova_method(checks['normality_p'], checks['levene_p'])
+
+    if method == "f":
+        result = anova_from_moments(groups, table.n, table.means, table.m2, alpha)
+    elif method == "welch":
+        result = welch_anova_from_moments(groups, table.n, table.means, table.m2, alpha)
+    else:
+        # Kruskal-Wallis 检验：在所有组合并的不同取值上排秩，秩和按频数加权
+        ranks, tie = _tie_ranks(table.values, table.counts)
+        rank_sums = np.bincount(table.codes, weights=table.counts * ranks, minlength=table.n_groups)
+        result = kruskal_from_moments(groups, table.n, table.means, table.m2, rank_sums, tie, alpha)
+    result['extra_info']['normality_p'] = dict(zip(groups, checks['normality_p']))
+    result['extra_info']['normality_method'] = checks['normality_method']
+    result['extra_info']['levene_p'] = checks['levene_p']
+    return result
+
+
+def correlation_frequency(df, col_x, col_y, weight_col, method="auto", alpha=0.05):
+    """
+    频数表的相关性分析：自动选择 Pearson 或 Spearman（规则与 correlation 相同）
+
+    Spearman 的秩为按频数展开后的平均秩（含结），由各不同取值的频数直接得到。
+
+    参数:
+        df: 频数表 DataFrame，每行为（x, y, 频数）
+        col_x: 变量 X 列名
+        col_y: 变量 Y 列名
+        weight_col: 频数列名（非负整数）
+        method: "auto", "pearson", "spearman"
+        alpha: 显著性水平
+
+    返回:
+        CorrelationResult: 与 correlation 相同结构的结果
+    """
+    x, y, w = _pair_table(df, col_x, col_y, weight_col)
+    n, mean_x, mean_y, sxx, syy, sxy = _pair_moments(x, y, w)
+    if n < 3:
+        raise ValueError("至少需要 3 对有效观测值")
+
+    if method == "auto":
+        normality = get_checker().check_frequency_columns(df, [col_x, col_y], weight_col)
+        method = "pearson" if normality[col_x] > 0.05 and normality[col_y] > 0.05 else "spearman"
+
+    if method == "pearson":
+        return pearson_from_moments(n, mean_x, mean_y, sxx, syy, sxy, alpha)
+
+    rank_x, _ = _tie_ranks(x, w)
+    rank_y, _ = _tie_ranks(y, w)
+    _, _, _, rxx, ryy, rxy = _pair_moments(rank_x, rank_y, w)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho = float(np.clip(rxy / np.sqrt(rxx * ryy), -1.0, 1.0))
+        t = rho * np.sqrt((n - 2) / ((rho + 1.0) * (1.0 - rho)))
+    p_value = 0.0 if abs(rho) >= 1.0 else 2 * stats.t.sf(abs(t), n - 2)
+    return _correlation_result("spearman", rho, p_value, int(n), mean_x, mean_y,
+                               np.sqrt(sxx / (n - 1)), np.sqrt(syy / (n - 1)), alpha)
+
+
+def linear_regression_frequency(df, x_col, y_col, weight_col, alpha=0.05):
+    """
+    频数表的简单线性回归（按频数加权的最小二乘，与展开数据的 OLS 一致）
+
+    参数:
+        df: 频数表 DataFrame，每行为（x, y, 频数）
+        x_col: 自变量列名
+        y_col: 因变量列名
+        weight_col: 频数列名（非负整数）
+        alpha: 显著性水平
+
+    返回:
+        RegressionResult: 与 linear_regression_simple 相同结构的结果
+    """
+    x, y, w = _pair_table(df, x_col, y_col, weight_col)
+    n, mean_x, mean_y, sxx, syy, sxy = _pair_moments(x, y, w)
+    if n < 3:
+        raise ValueError("至少需要 3 对有效观测值")
+    if len(np.unique(x)) < 2:
+        raise ValueError("自变量 X 没有变异（所有取值相同），无法进行回归分析")
+    return regression_from_fit(ols_from_moments(n, mean_x, mean_y, sxx, syy, sxy, alpha), alpha)
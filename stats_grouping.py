@@ -0,0 +1,263 @@
+"""
+分组数据引擎：一次因子化分组列，按组排成连续片段；也支持（数值, 组, 频数）形式的频数表
+"""
+import numpy as np
+import pandas as pd
+
+
+class GroupedData:
+    """
+    按分组变量整理后的数值数据
+
+    分组列只因子化一次，数值按组号稳定排序为连续片段，
+    每组数据通过切片视图获取（不复制），同时提供每组的
+    样本量、和、平方和、均值与离差平方和（M2）。
+
+    属性:
+        labels: 组标签（ndarray，顺序与组号一致）
+        values: 按组排序后的有效数值（已去除缺失值）
+        offsets: 各组片段的起止位置，长度为 k + 1
+        codes: 与 values 对齐的组号
+        row_codes: 与原始行对齐的组号（被去除的行为 -1），用于与按行缓存的结果（如秩）对齐
+        n / sums / sumsq / means / m2: 每组充分统计量
+    """
+
+    def __init__(self, values, codes, labels):
+        values = np.asarray(values, dtype=float)
+        codes = np.asarray(codes)
+        k = len(labels)
+
+        # 去除缺失组标签（code = -1）和缺失数值
+        valid = (codes >= 0) & ~np.isnan(values)
+        self.row_codes = np.where(valid, codes, -1)
+        if not valid.all():
+            values = values[valid]
+            codes = codes[valid]
+
+        # 组号范围较小时使用 int16，使稳定排序走基数排序（O(n)）
+        if k <= np.iinfo(np.int16).max:
+            codes = codes.astype(np.int16, copy=False)
+        order = np.argsort(codes, kind="stable")
+
+        self.labels = np.asarray(labels)
+        self.values = values[order]
+        self.codes = codes[order]
+        self.n = np.bincount(self.codes, minlength=k)
+        self.offsets = np.concatenate(([0], np.cumsum(self.n)))
+        self.sums = np.bincount(self.codes, weights=self.values, minlength=k)
+        self.sumsq = np.bincount(self.codes, weights=self.values * self.values, minlength=k)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.means = self.sums / self.n
+        # 两遍法计算离差平方和，避免 sumsq - sum²/n 的数值抵消
+        deviations = self.values - self.means[self.codes]
+        self.m2 = np.bincount(self.codes, weights=deviations * deviations, minlength=k)
+
+    @classmethod
+    def from_frame(cls, df, value_col, group_col, sort=False):
+        """
+        从 DataFrame 构建分组数据
+
+        参数:
+            df: DataFrame
+            value_col: 数值变量列名
+            group_col: 分组变量列名
+            sort: 是否按组标签排序（False 时保持首次出现顺序，与 unique() 一致）
+
+        返回:
+            GroupedData
+        """
+        return cls.from_arrays(df[value_col].to_numpy(dtype=float, na_value=np.nan), df[group_col], sort=sort)
+
+    @classmethod
+    def from_arrays(cls, values, groups, mask=None, sort=False):
+        """
+        从数值数组与分组标签数组构建分组数据
+
+        参数:
+            values: 数值数组（float64 或 float32，NaN 视为缺失）
+            groups: 与 values 等长的分组标签（ndarray 或 Series，缺失标签的行被去除）
+            mask: 可选的布尔数组，False 的行不参与分析
+            sort: 是否按组标签排序
+
+        返回:
+            GroupedData
+        """
+        if mask is None:
+            codes, labels = pd.factorize(groups, sort=sort)
+        else:
+            # 只对参与分析的行因子化，被排除的行不产生空组
+            mask = np.asarray(mask, dtype=bool)
+            kept_codes, labels = pd.factorize(pd.Series(groups)[mask], sort=sort)
+            codes = np.full(len(mask), -1, dtype=np.int64)
+            codes[mask] = kept_codes
+        return cls(values, codes, np.asarray(labels))
+
+    @property
+    def n_groups(self):
+        return len(self.n)
+
+    @property
+    def n_total(self):
+        return int(self.offsets[-1])
+
+    @property
+    def grand_mean(self):
+        return self.sums.sum() / self.n_total if self.n_total > 0 else np.nan
+
+    def variances(self, ddof=1):
+        """每组方差（ddof=1 时与 pandas .var() 一致）"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > ddof, self.m2 / (self.n - ddof), np.nan)
+
+    def stds(self, ddof=1):
+        """每组标准差"""
+        return np.sqrt(self.variances(ddof))
+
+    def segment(self, i):
+        """第 i 组数据的只读视图（不复制）"""
+        view = self.values[self.offsets[i]:self.offsets[i + 1]]
+        view.flags.writeable = False
+        return view
+
+    def segments(self):
+        """所有组数据视图的列表，顺序与 labels 一致"""
+        return [self.segment(i) for i in range(self.n_groups)]
+
+
+def frequency_counts(values):
+    """
+    校验并返回频数列（非负整数，缺失视为 0）
+
+    参数:
+        values: 频数数组
+
+    返回:
+        ndarray: float 类型的频数
+    """
+    counts = np.nan_to_num(np.asarray(values, dtype=float), nan=0.0)
+    if (counts < 0).any() or not np.array_equal(counts, np.floor(counts)) or not np.isfinite(counts).all():
+        raise ValueError("频数列必须为非负整数")
+    return counts
+
+
+def weighted_quantile(values, counts, q):
+    """
+    频数表的分位数（线性插值，与对展开数据调用 np.quantile 一致）
+
+    参数:
+        values: 升序排列的不同取值
+        counts: 对应频数（均为正）
+        q: 分位点（标量或数组）
+
+    返回:
+        分位数
+    """
+    cum = np.cumsum(counts)
+    h = (cum[-1] - 1) * np.asarray(q, dtype=float)
+    lower = np.floor(h)
+    v_lo = values[np.searchsorted(cum, lower, side='right')]
+    v_hi = values[np.searchsorted(cum, np.ceil(h), side='right')]
+    return v_lo + (h - lower) * (v_hi - v_lo)
+
+
+class FrequencyGroupedData:
+    """
+    频数表形式（数值, 组, 频数）的分组数据
+
+    相同（组, 数值）的行先合并，每组只保存不同取值及其频数，
+    内存与计算量取决于不同取值的个数而不是展开后的行数。
+    属性名与 GroupedData 一致，其中 n / sums / means / m2 为按频数加权的精确值。
+
+    属性:
+        labels: 组标签（顺序与组号一致）
+        values: 按（组号, 数值）升序排列的不同取值
+        counts: 与 values 对齐的频数
+        offsets: 各组片段在 values 中的起止位置，长度为 k + 1
+        codes: 与 values 对齐的组号
+        n / sums / means / m2: 每组充分统计量（n 为频数之和）
+    """
+
+    def __init__(self, values, codes, labels, counts):
+        values = np.asarray(values, dtype=float)
+        codes = np.asarray(codes, dtype=np.int64)
+        counts = frequency_counts(counts)
+        k = len(labels)
+
+        valid = (codes >= 0) & ~np.isnan(values) & (counts > 0)
+        values, codes, counts = values[valid], codes[valid], counts[valid]
+
+        # 按（组号, 数值）排序并合并重复的（组, 数值）行
+        order = np.lexsort((values, codes))
+        values, codes, counts = values[order], codes[order], counts[order]
+        start = np.ones(len(values), dtype=bool)
+        start[1:] = (values[1:] != values[:-1]) | (codes[1:] != codes[:-1])
+        starts = np.flatnonzero(start)
+
+        self.labels = np.asarray(labels)
+        self.values = values[starts]
+        self.codes = codes[starts]
+        self.counts = np.add.reduceat(counts, starts) if len(starts) else counts
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(self.codes, minlength=k))))
+        self.n = np.bincount(self.codes, weights=self.counts, minlength=k).astype(np.int64)
+        self.sums = np.bincount(self.codes, weights=self.counts * self.values, minlength=k)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.means = self.sums / self.n
+        deviations = self.values - self.means[self.codes]
+        self.m2 = np.bincount(self.codes, weights=self.counts * deviations * deviations, minlength=k)
+
+    @classmethod
+    def from_frame(cls, df, value_col, group_col, weight_col, sort=False):
+        """
+        从频数表 DataFrame 构建分组数据（频数为 0 的行不参与分组，与展开后的数据一致）
+
+        参数:
+            df: DataFrame
+            value_col: 数值变量列名
+            group_col: 分组变量列名
+            weight_col: 频数列名
+            sort: 是否按组标签排序（False 时保持首次出现顺序）
+
+        返回:
+            FrequencyGroupedData
+        """
+        counts = frequency_counts(df[weight_col].to_numpy(dtype=float, na_value=np.nan))
+        present = counts > 0
+        codes, labels = pd.factorize(df[group_col][present], sort=sort)
+        values = df[value_col].to_numpy(dtype=float, na_value=np.nan)[present]
+        return cls(values, codes, np.asarray(labels), counts[present])
+
+    @property
+    def n_groups(self):
+        return len(self.n)
+
+    @property
+    def n_total(self):
+        return int(self.n.sum())
+
+    @property
+    def grand_mean(self):
+        return self.sums.sum() / self.n_total if self.n_total > 0 else np.nan
+
+    def variances(self, ddof=1):
+        """每组方差"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.n > ddof, self.m2 / (self.n - ddof), np.nan)
+
+    def stds(self, ddof=1):
+        """每组标准差"""
+        return np.sqrt(self.variances(ddof))
+
+    def segment(self, i):
+        """第 i 组的（不同取值, 频数）"""
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return self.values[lo:hi], self.counts[lo:hi]
+
+    def segments(self):
+        """所有组的（不同取值, 频数）列表"""
+        return [self.segment(i) for i in range(self.n_groups)]
+
+    def quantile(self, i, q):
+        """第 i 组的分位数（与展开数据的 np.quantile 一致）"""
+        return weighted_quantile(*self.segment(i), q)
@@ -0,0 +1,246 @@
+"""
+增量分析：数据集追加新行后，只用新行更新 t 检验、方差分析、Pearson 相关与线性回归的结果
+"""
+import copy
+import os
+from io import BytesIO
+
+import pandas as pd
+
+from stats_accumulators import GroupMoments, PairMoments
+from stats_core import (two_group_compare, ttest_from_moments, anova_oneway, correlation,
+                        linear_regression_simple)
+
+
+TASKS = {
+    'two_group': ("value_col", "group_col"),
+    'anova': ("value_col", "group_col"),
+    'correlation': ("col_x", "col_y"),
+    'regression': ("x_col", "y_col"),
+}
+
+# 依赖全部原始数据、无法由充分统计量更新的字段（追加数据后保留上次完整计算的值并标记为过期）
+_CHECK_KEYS = {
+    'two_group': ('normality_p1', 'normality_p2', 'levene_p'),
+    'anova': ('normality_p', 'normality_method', 'levene_p'),
+    'correlation': (),
+    'regression': (),
+}
+
+
+class CsvTail:
+    """
+    跟踪一个不断追加的 CSV 文件，每次只读取上次之后新增的完整行
+
+    记录已读取的字节位置，末尾不完整的行留到下次读取。
+    """
+
+    def __init__(self, path, **read_csv_kwargs):
+        self.path = path
+        self.offset = 0
+        self.columns = None
+        self.read_csv_kwargs = read_csv_kwargs
+
+    def read(self):
+        """
+        读取新增的行（首次调用读取整个文件并记录表头）
+
+        返回:
+            DataFrame: 新增行（没有新行时为空表）
+        """
+        if os.path.getsize(self.path) < self.offset:
+            raise ValueError("文件被截断或改写，请重新完整分析")
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return pd.DataFrame(columns=self.columns)
+        if self.columns is None:
+            frame = pd.read_csv(BytesIO(data[:end]), **self.read_csv_kwargs)
+            self.columns = list(frame.columns)
+        else:
+            frame = pd.read_csv(BytesIO(data[:end]), header=None, names=self.columns, **self.read_csv_kwargs)
+        self.offset += end
+        return frame
+
+
+class IncrementalAnalysis:
+    """
+    可增量更新的分析任务
+
+    fit 做一次完整分析（与 stats_core 相同），同时保存每组的矩（样本量、均值、M2）
+    或成对矩（均值、Sxx、Syy、Sxy）；append 只把新行合并进这些矩，
+    在 O(新增行数) 内给出更新后的 t 检验、方差分析、Pearson 相关与回归结果。
+
+    正态性、方差齐性检验以及秩检验（Mann-Whitney、Spearman）需要全部原始数据，
+    追加后沿用上次完整计算的值，并在 extra_info['stale'] 中列出过期的字段；
+    检验方法（t / Welch / 秩检验、F / Welch / Kruskal-Wallis、Pearson / Spearman）也沿用上次的选择。
+    needs_refresh 为 True 时由调用方在合适的时机调用 refresh 完整重算。
+
+    参数:
+        task: "two_group"、"anova"、"correlation" 或 "regression"
+        alpha: 显著性水平
+        **columns: 与 stats_core 对应函数相同的列名参数
+                   （two_group / anova: value_col、group_col；correlation: col_x、col_y；
+                   regression: x_col、y_col）
+    """
+
+    def __init__(self, task, alpha=0.05, **columns):
+        if task not in TASKS:
+            raise ValueError(f"task 必须为 {', '.join(TASKS)} 之一")
+        missing = [name for name in TASKS[task] if name not in columns]
+        if missing:
+            raise ValueError(f"缺少列名参数：{', '.join(missing)}")
+        self.task = task
+        self.alpha = alpha
+        self.columns = {name: columns[name] for name in TASKS[task]}
+        self.moments = None
+        self.n_rows = 0
+        self.n_appended = 0
+        self.stale = []
+        self._base = None
+        self._result = None
+        self._tail = None
+
+    def fit(self, df):
+        """
+        完整分析并保存充分统计量
+
+        参数:
+            df: DataFrame
+
+        返回:
+            dict: 与 stats_core 对应函数相同的结果
+        """
+        cols = list(self.columns.values())
+        if self.task == 'two_group':
+            result = two_group_compare(df, alpha=self.alpha, **self.columns)
+        elif self.task == 'anova':
+            result = anova_oneway(df, alpha=self.alpha, **self.columns)
+        elif self.task == 'correlation':
+            result = correlation(df, alpha=self.alpha, **self.columns)
+        else:
+            result = linear_regression_simple(df, alpha=self.alpha, **self.columns)
+
+        if self.task in ('two_group', 'anova'):
+            self.moments = GroupMoments().update_frame(df, *cols)
+        else:
+            self.moments = PairMoments().update_frame(df, *cols)
+        self.n_rows = len(df)
+        self.n_appended = 0
+        self.stale = []
+        self._base = result
+        self._result = result
+        return copy.deepcopy(result)
+
+    def append(self, rows):
+        """
+        合并新增行并更新结果
+
+        参数:
+            rows: 新增行的 DataFrame（包含分析所用的列）
+
+        返回:
+            dict: 更新后的结果；extra_info 另含 n_appended（自上次完整分析以来的新增行数）
+                  与 stale（沿用旧值、需完整重算的字段）
+        """
+        if self._base is None:
+            raise ValueError("请先调用 fit 完成一次完整分析")
+        self.moments.update_frame(rows, *self.columns.values())
+        self.n_rows += len(rows)
+        self.n_appended += len(rows)
+
+        base = self._base
+        info = base['extra_info']
+        method_name = base['method_name']
+        if self.task == 'two_group' and "t 检验" in method_name:
+            m = self.moments
+            if m.n_groups != 2:
+                raise ValueError(f"分组变量必须恰好有 2 个组，当前有 {m.n_groups} 个组")
+            result = ttest_from_moments(m.n, m.mean, m.m2, equal_var="不等方差" not in method_name, alpha=self.alpha,
+                                        normality_p=(info['normality_p1'], info['normality_p2']),
+                                        levene_p=info['levene_p'])
+            stale = [key for key in _CHECK_KEYS['two_group'] if info.get(key) is not None]
+        elif self.task == 'anova' and not method_name.startswith("Kruskal"):
+            m = self.moments
+            if (m.n < 2).any():
+                raise ValueError("每组至少需要 2 个观测值")
+            if method_name.startswith("Welch"):
+                result = m.welch_anova(self.alpha)
+            else:
+                result = m.anova(self.alpha)
+            result['extra_info'].update({key: copy.deepcopy(info[key]) for key in _CHECK_KEYS['anova']})
+            stale = list(_CHECK_KEYS['anova'])
+        elif self.task == 'correlation' and method_name.startswith("Pearson"):
+            result = self.moments.pearson(self.alpha)
+            stale = []
+        elif self.task == 'regression':
+            result = self.moments.ols(self.alpha)
+            stale = []
+        else:
+            # 秩检验无法增量更新：保留上次结果，整体标记为过期
+            result = copy.deepcopy(base)
+            stale = ['stat', 'p_value'] + list(info)
+
+        result['extra_info']['n_appended'] = self.n_appended
+        result['extra_info']['stale'] = stale
+        self.stale = stale
+        self._result = result
+        return copy.deepcopy(result)
+
+    @property
+    def needs_refresh(self):
+        """是否有沿用旧值的部分（需要完整重算）"""
+        return bool(self.stale)
+
+    @property
+    def result(self):
+        """当前结果"""
+        return copy.deepcopy(self._result)
+
+    def refresh(self, df=None):
+        """
+        完整重算（惰性：通常在 needs_refresh 为 True 且需要展示前提检验时调用）
+
+        参数:
+            df: 全部数据；由 fit_csv 开始的分析可省略，此时重新读取整个文件
+
+        返回:
+            dict: 完整分析结果
+        """
+        if df is None:
+            if self._tail is None:
+                raise ValueError("请提供完整数据 df")
+            tail = CsvTail(self._tail.path, **self._tail.read_csv_kwargs)
+            df = tail.read()
+            self._tail = tail
+        return self.fit(df)
+
+    def fit_csv(self, path, **read_csv_kwargs):
+        """
+        读取整个 CSV 文件做完整分析，并记录读取位置供 poll 使用
+
+        参数:
+            path: CSV 文件路径
+            **read_csv_kwargs: 传给 pd.read_csv 的其他参数（不要指定 header / names）
+
+        返回:
+            dict: 完整分析结果
+        """
+        self._tail = CsvTail(path, **read_csv_kwargs)
+        return self.fit(self._tail.read())
+
+    def poll(self):
+        """
+        读取 CSV 文件自上次以来追加的行并增量更新（没有新行时返回当前结果）
+
+        返回:
+            dict: 更新后的结果
+        """
+        if self._tail is None:
+            raise ValueError("请先调用 fit_csv")
+        rows = self._tail.read()
+        if len(rows) == 0:
+            return self.result
+        return self.append(rows)
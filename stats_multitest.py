@@ -0,0 +1,176 @@
+"""
+多重检验校正：Bonferroni、Holm、Hochberg、Benjamini-Hochberg、Benjamini-Yekutieli 与 Storey q 值
+
+对 ndarray 一次排序（O(n log n)）后按校正族向量化计算，缺失的 p 值不计入检验个数、结果为 NaN；
+可按分层变量分别在每个族内校正。批量分析的输出（two_group_compare_batch、correlation_pairs 等
+DataFrame、correlation_matrix 的 p 值矩阵或 StatResult 列表）均可直接校正。
+"""
+import numpy as np
+import pandas as pd
+
+
+P_ADJUST_METHODS = {
+    'bonferroni': "Bonferroni",
+    'holm': "Holm",
+    'hochberg': "Hochberg",
+    'bh': "Benjamini-Hochberg（FDR）",
+    'by': "Benjamini-Yekutieli（FDR，任意相关）",
+    'storey': "Storey q 值",
+}
+
+
+def storey_pi0(p_values, lambda_=0.5):
+    """
+    Storey 方法估计的原假设为真的比例 π0 = #{p > λ} / (m (1 - λ))，上限为 1
+
+    参数:
+        p_values: p 值数组（NaN 忽略）
+        lambda_: 调节参数 λ（0 ≤ λ < 1）
+
+    返回:
+        float: π0
+    """
+    if not 0 <= lambda_ < 1:
+        raise ValueError("lambda_ 必须在 [0, 1) 内")
+    p = np.asarray(p_values, dtype=float)
+    p = p[~np.isnan(p)]
+    if len(p) == 0:
+        return np.nan
+    return min(1.0, np.count_nonzero(p > lambda_) / (len(p) * (1 - lambda_)))
+
+
+def _adjust_sorted(p, method, pi0, lambda_):
+    """
+    校正族内升序排列的 p 值（p 的每一行为一个大小相同的校正族，结果同样按行升序对齐）
+    """
+    m = p.shape[1]
+    rank = np.arange(1, m + 1)
+    if method == 'bonferroni':
+        adjusted = p * m
+    elif method == 'holm':
+        # 逐步下降：累积最大
+        adjusted = np.maximum.accumulate((m - rank + 1) * p, axis=1)
+    elif method == 'hochberg':
+        # 逐步上升：从最大的 p 值起累积最小
+        adjusted = np.minimum.accumulate(((m - rank + 1) * p)[:, ::-1], axis=1)[:, ::-1]
+    else:
+        adjusted = np.minimum.accumulate((p * m / rank)[:, ::-1], axis=1)[:, ::-1]
+        if method == 'by':
+            adjusted = adjusted * np.sum(1.0 / rank)
+        elif method == 'storey':
+            if pi0 is None:
+                pi0 = np.minimum(1.0, np.count_nonzero(p > lambda_, axis=1) / (m * (1 - lambda_)))[:, None]
+            adjusted = adjusted * pi0
+    return np.minimum(adjusted, 1.0)
+
+
+def adjust_pvalues(p_values, method="bh", groups=None, pi0=None, lambda_=0.5):
+    """
+    多重检验校正后的 p 值（FDR 方法为 q 值）
+
+    参数:
+        p_values: p 值数组（任意形状，NaN 视为缺失：不计入检验个数，结果为 NaN）
+        method: "bonferroni"、"holm"、"hochberg"、"bh"、"by" 或 "storey"
+        groups: 与 p_values 同形状的分层标签（每层为一个校正族，分别校正；缺失标签的结果为 NaN），
+                默认全部为一个族
+        pi0: Storey 方法的 π0（默认由 storey_pi0 在每个族内估计）
+        lambda_: 估计 π0 的调节参数 λ
+
+    返回:
+        ndarray: 与 p_values 同形状的校正结果
+    """
+    if method not in P_ADJUST_METHODS:
+        raise ValueError(f"method 必须为 {', '.join(P_ADJUST_METHODS)} 之一")
+    if method == 'storey' and not 0 <= lambda_ < 1:
+        raise ValueError("lambda_ 必须在 [0, 1) 内")
+    p = np.asarray(p_values, dtype=float)
+    flat = p.ravel()
+    if np.any((flat < 0) | (flat > 1)):
+        raise ValueError("p 值必须在 [0, 1] 内")
+    if groups is None:
+        codes = np.zeros(len(flat), dtype=np.int64)
+    else:
+        groups = np.asarray(groups)
+        if groups.shape != p.shape:
+            raise ValueError("groups 必须与 p_values 形状相同")
+        codes, _ = pd.factorize(groups.ravel())
+    valid = ~np.isnan(flat) & (codes >= 0)
+
+    # 按（族, p 值）排序，各族为连续片段
+    index = np.flatnonzero(valid)
+    if groups is None:
+        order = index[np.argsort(flat[index])]
+        sorted_p = flat[order]
+        adjusted = _adjust_sorted(sorted_p[None, :], method, pi0, lambda_)[0] if len(order) else sorted_p
+    else:
+        # 先按 p 值排序，再按族稳定排序（比 lexsort 快）
+        order = index[np.argsort(flat[index])]
+        order = order[np.argsort(codes[order], kind='stable')]
+        sorted_p = flat[order]
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        starts = np.concatenate([[0], bounds])
+        sizes = np.diff(np.concatenate([starts, [len(order)]]))
+
+        # 大小相同的族组成一个矩阵一起计算，不同的族大小至多 O(√n) 种
+        adjusted = np.empty(len(order))
+        for size in np.unique(sizes):
+            rows = starts[sizes == size][:, None] + np.arange(size)
+            adjusted[rows] = _adjust_sorted(sorted_p[rows], method, pi0, lambda_)
+
+    result = np.full(len(flat), np.nan)
+    result[order] = adjusted
+    return result.reshape(p.shape)
+
+
+def adjust_frame(frame, method="bh", p_col="p_value", group_col=None, alpha=0.05, **options):
+    """
+    为批量分析结果表增加校正后的 p 值列 p_adjusted 与 significant_adjusted（返回新表）
+
+    参数:
+        frame: 含 p 值列的 DataFrame（如 two_group_compare_batch、correlation_pairs 的输出）
+        method: 校正方法（见 P_ADJUST_METHODS）
+        p_col: p 值列名
+        group_col: 分层列名（每层分别校正）
+        alpha: 校正后 p 值的显著性水平
+        **options: 传给 adjust_pvalues 的其他参数（pi0、lambda_）
+
+    返回:
+        DataFrame: 在 p_col 之后插入 p_adjusted、significant_adjusted 两列，attrs['p_adjust'] 记录校正方法
+    """
+    groups = None if group_col is None else frame[group_col].to_numpy()
+    adjusted = adjust_pvalues(frame[p_col].to_numpy(dtype=float, na_value=np.nan), method, groups, **options)
+    frame = frame.drop(columns=['p_adjusted', 'significant_adjusted'], errors='ignore')
+    position = frame.columns.get_loc(p_col) + 1
+    if 'significant' in frame.columns and frame.columns.get_loc('significant') == position:
+        position += 1
+    frame.insert(position, 'p_adjusted', adjusted)
+    frame.insert(position + 1, 'significant_adjusted', adjusted < alpha)
+    frame.attrs['p_adjust'] = method
+    return frame
+
+
+def adjust_results(results, method="bh", groups=None, alpha=0.05, **options):
+    """
+    对一组 stats_core 结果（如对多个变量分别调用 two_group_compare / correlation）做多重检验校正
+
+    校正后的 p 值、校正方法与校正后是否显著写入每个结果 extra_info 的
+    p_adjusted、p_adjust 与 significant_adjusted。
+
+    参数:
+        results: StatResult（或结果字典）的序列
+        method: 校正方法（见 P_ADJUST_METHODS）
+        groups: 与 results 等长的分层标签
+        alpha: 校正后 p 值的显著性水平
+        **options: 传给 adjust_pvalues 的其他参数（pi0、lambda_）
+
+    返回:
+        ndarray: 校正后的 p 值
+    """
+    p = np.fromiter((np.nan if r['p_value'] is None else r['p_value'] for r in results), dtype=float,
+                    count=len(results))
+    adjusted = adjust_pvalues(p, method, None if groups is None else np.asarray(groups), **options)
+    for result, value in zip(results, adjusted):
+        result['extra_info']['p_adjusted'] = value
+        result['extra_info']['p_adjust'] = method
+        result['extra_info']['significant_adjusted'] = bool(value < alpha)
+    return adjusted
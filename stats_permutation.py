@@ -0,0 +1,260 @@
+"""
+置换检验引擎：分块向量化生成置换、多进程并行、可提前停止
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, islice
+
+import numpy as np
+from scipy import stats
+
+from stats_core import anova_from_moments, _two_group_explanation
+from stats_grouping import GroupedData
+from stats_results import TwoGroupResult
+
+
+# 单块随机键矩阵的元素上限（约 32 MB），样本量大时自动减小块大小
+MAX_BLOCK_ELEMENTS = 4_000_000
+
+# 工作进程中的共享数据（由 _init_worker 设置，避免每个任务重复传输数组）
+_WORKER_DATA = {}
+
+
+def _init_worker(values, n):
+    _WORKER_DATA['values'] = values
+    _WORKER_DATA['n'] = n
+
+
+def _between_stat(sums, n):
+    """组间平方和中随置换变化的部分 Σ S_i² / n_i（总和固定，F 与之单调）"""
+    return (sums * sums / n).sum(axis=1)
+
+
+def _permuted_group_sums(rng, values, n, block_size):
+    """
+    一块随机置换下的各组和，形状 (block_size, k)；values 按组排成连续片段
+
+    两组时每行给所有观测生成独立均匀随机键，键最小的 n_0 个归第 1 组，
+    这与随机置换组标签同分布；分界键值用 np.partition 求得（O(N)），
+    避免逐元素洗牌的随机整数开销。多组时逐行洗牌数值，再按片段求和。
+    """
+    if len(n) == 2:
+        keys = rng.random((block_size, len(values)))
+        bound = int(n[0])
+        threshold = np.partition(keys, bound, axis=1)[:, bound:bound + 1]
+        s1 = (keys < threshold).astype(float) @ values
+        return np.column_stack([s1, values.sum() - s1])
+
+    permuted = rng.permuted(np.broadcast_to(values, (block_size, len(values))), axis=1)
+    starts = np.concatenate(([0], np.cumsum(n)[:-1])).astype(np.int64)
+    return np.add.reduceat(permuted, starts, axis=1)
+
+
+def _count_block(seed_seq, block_size, threshold):
+    """一个 Monte Carlo 块：返回统计量不小于观测值的置换数"""
+    values = _WORKER_DATA['values']
+    n = _WORKER_DATA['n']
+    rng = np.random.default_rng(seed_seq)
+    stat = _between_stat(_permuted_group_sums(rng, values, n, block_size), n)
+    return int(np.count_nonzero(stat >= threshold))
+
+
+def _p_bounds(count, total, confidence):
+    """p 值的 Clopper-Pearson 置信区间"""
+    tail = (1 - confidence) / 2
+    lower = stats.beta.ppf(tail, count, total - count + 1) if count > 0 else 0.0
+    upper = stats.beta.ppf(1 - tail, count + 1, total - count) if count < total else 1.0
+    return lower, upper
+
+
+def permutation_pvalue(values, codes, n_resamples=10000, alpha=0.05, block_size=1000,
+                       n_jobs=1, seed=0, early_stop=True, confidence=0.999, exact="auto"):
+    """
+    组间差异的置换检验 p 值（统计量为 Σ S_i²/n_i，两组时等价于 |均值差| 和合并方差 t，多组时等价于 F）
+
+    参数:
+        values: 数值数组（无缺失值）
+        codes: 与 values 对齐的组号（0..k-1，每组至少 1 个观测）
+        n_resamples: Monte Carlo 置换次数上限
+        alpha: 显著性水平（用于提前停止判断）
+        block_size: 每块生成的置换数（一次矩阵运算）
+        n_jobs: 并行进程数（1 为当前进程内计算）
+        seed: 随机种子；每块使用 SeedSequence.spawn 派生的独立随机流，结果与 n_jobs 无关
+        early_stop: p 值相对 alpha 的结论已确定（置信度 confidence）时提前停止
+        confidence: 提前停止所用 Clopper-Pearson 区间的置信度
+        exact: "auto" 时两组且全部组合数不超过 n_resamples 则精确枚举；True 强制精确；False 只用 Monte Carlo
+
+    返回:
+        dict: p_value、observed（观测统计量）、n_resamples（实际使用的置换数）、exact、stopped_early、p_ci
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    order = np.argsort(codes, kind='stable')
+    values = np.asarray(values, dtype=float)[order]
+    # 先减去总均值：统计量即为组间平方和，避免大数值时的精度损失
+    values = values - values.mean()
+    codes = codes[order]
+    n = np.bincount(codes).astype(float)
+    k = len(n)
+    observed = _between_stat(np.bincount(codes, weights=values, minlength=k)[None, :], n)[0]
+    # 相对容差：同一组值以不同顺序求和会有舍入差异，避免把相等的置换统计量漏计
+    threshold = observed - 1e-10 * max(abs(observed), 1.0)
+
+    n_total = len(values)
+    n_combinations = math.comb(n_total, int(n[0])) if k == 2 else None
+    if exact is True and n_combinations is None:
+        raise ValueError("精确置换检验仅支持两组比较")
+    use_exact = exact is True or (exact == "auto" and n_combinations is not None
+                                  and n_combinations <= n_resamples)
+
+    if use_exact:
+        # 枚举第 1 组的全部组合（以观测位置表示），按块计算第 1 组的和
+        total_sum = values.sum()
+        count = 0
+        combos = combinations(range(n_total), int(n[0]))
+        while True:
+            chunk = np.array(list(islice(combos, block_size)), dtype=np.int64)
+            if chunk.size == 0:
+                break
+            s1 = values[chunk].sum(axis=1)
+            stat = s1 * s1 / n[0] + (total_sum - s1)**2 / n[1]
+            count += int(np.count_nonzero(stat >= threshold))
+        return {
+            'p_value': count / n_combinations,
+            'observed': observed,
+            'n_resamples': n_combinations,
+            'exact': True,
+            'stopped_early': False,
+            'p_ci': (count / n_combinations, count / n_combinations),
+        }
+
+    block_size = max(1, min(block_size, MAX_BLOCK_ELEMENTS // n_total))
+    n_blocks = math.ceil(n_resamples / block_size)
+    sizes = [block_size] * (n_blocks - 1) + [n_resamples - block_size * (n_blocks - 1)]
+    seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+
+    count = 0
+    done = 0
+    stopped_early = False
+
+    def consume(block_counts):
+        # 按块顺序累加并判断是否停止，保证结果与并行方式无关
+        nonlocal count, done, stopped_early
+        for i, c in block_counts:
+            count += c
+            done += sizes[i]
+            if early_stop and done < n_resamples:
+                lower, upper = _p_bounds(count + 1, done + 1, confidence)
+                if upper < alpha or lower > alpha:
+                    stopped_early = True
+                    return True
+        return False
+
+    if n_jobs == 1:
+        _init_worker(values, n)
+        for i in range(n_blocks):
+            if consume([(i, _count_block(seeds[i], sizes[i], threshold))]):
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(values, n)) as pool:
+            for start in range(0, n_blocks, n_jobs):
+                wave = range(start, min(start + n_jobs, n_blocks))
+                futures = [(i, pool.submit(_count_block, seeds[i], sizes[i], threshold)) for i in wave]
+                if consume([(i, f.result()) for i, f in futures]):
+                    break
+
+    p_value = (count + 1) / (done + 1)
+    return {
+        'p_value': p_value,
+        'observed': observed,
+        'n_resamples': done,
+        'exact': False,
+        'stopped_early': stopped_early,
+        'p_ci': _p_bounds(count + 1, done + 1, 0.95),
+    }
+
+
+def two_group_permutation(df, value_col, group_col, alpha=0.05, **options):
+    """
+    两组比较的置换检验（均值差）
+
+    参数:
+        df: DataFrame
+        value_col: 数值变量列名
+        group_col: 分组变量列名
+        alpha: 显著性水平
+        **options: 传给 permutation_pvalue 的参数（n_resamples、n_jobs、seed 等）
+
+    返回:
+        TwoGroupResult: 包含方法名、统计量（合并方差 t）、p值、额外信息、中文解释
+    """
+    grouped = GroupedData.from_frame(df, value_col, group_col)
+    if grouped.n_groups != 2:
+        raise ValueError(f"分组变量必须恰好有 2 个组，当前有 {grouped.n_groups} 个组")
+    if (grouped.n < 3).any():
+        raise ValueError("每组至少需要 3 个观测值")
+
+    perm = permutation_pvalue(grouped.values, grouped.codes, alpha=alpha, **options)
+    n1, n2 = grouped.n
+    mean1, mean2 = grouped.means
+    std1, std2 = grouped.stds()
+    pooled_std = np.sqrt(grouped.m2.sum() / (n1 + n2 - 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stat = (mean1 - mean2) / (pooled_std * np.sqrt(1 / n1 + 1 / n2))
+    cohens_d = (mean1 - mean2) / pooled_std if pooled_std > 0 else 0
+
+    kind = "精确" if perm['exact'] else "Monte Carlo"
+    extra_info = {
+        'group1_mean': mean1,
+        'group2_mean': mean2,
+        'group1_std': std1,
+        'group2_std': std2,
+        'mean_diff': mean1 - mean2,
+        'cohens_d': cohens_d,
+        'n_resamples': perm['n_resamples'],
+        'exact': perm['exact'],
+        'stopped_early': perm['stopped_early'],
+        'p_ci_95': perm['p_ci'],
+    }
+    return TwoGroupResult(f"置换检验（均值差，{kind}）", t_stat, perm['p_value'], extra_info,
+                          _two_group_explanation(perm['p_value'], alpha))
+
+
+def anova_permutation(df, value_col, group_col, alpha=0.05, **options):
+    """
+    单因素方差分析的置换检验（F 统计量）
+
+    参数:
+        df: DataFrame
+        value_col: 数值变量列名
+        group_col: 分组变量列名
+        alpha: 显著性水平
+        **options: 传给 permutation_pvalue 的参数（n_resamples、n_jobs、seed 等）
+
+    返回:
+        AnovaResult: 与 anova_oneway 相同结构，p 值来自置换分布
+    """
+    grouped = GroupedData.from_frame(df, value_col, group_col)
+    if grouped.n_groups < 2:
+        raise ValueError("分组变量至少需要 2 个组")
+    if (grouped.n < 2).any():
+        raise ValueError("每组至少需要 2 个观测值")
+
+    result = anova_from_moments(grouped.labels, grouped.n, grouped.means, grouped.m2, alpha)
+    perm = permutation_pvalue(grouped.values, grouped.codes, alpha=alpha, **options)
+    p_value = perm['p_value']
+
+    kind = "精确" if perm['exact'] else "Monte Carlo"
+    result['method_name'] = f"单因素方差分析（置换检验，{kind}）"
+    result['p_value'] = p_value
+    result['extra_info'].update({
+        'n_resamples': perm['n_resamples'],
+        'exact': perm['exact'],
+        'stopped_early': perm['stopped_early'],
+        'p_ci_95': perm['p_ci'],
+    })
+    if p_value < alpha:
+        result['explanation_zh'] = f"置换检验 p = {p_value:.4f} < {alpha}，各组间差异具有统计学意义（α = {alpha}）。建议进行事后检验以确定具体哪些组间存在差异。"
+    else:
+        result['explanation_zh'] = f"置换检验 p = {p_value:.4f} ≥ {alpha}，各组间差异无统计学意义（α = {alpha}）。"
+    return result
@@ -0,0 +1,214 @@
+"""
+功效分析与样本量规划：两独立样本 t 检验、单因素方差分析、Pearson 相关与简单线性回归
+
+基于非中心 t / F 分布，功效、所需样本量与可检测效应量都可对（效应量 × alpha × 样本量）
+网格一次向量化求解；另提供按参数缓存的功效查找表，供界面滑块实时重绘功效曲线。
+"""
+from functools import lru_cache
+
+import numpy as np
+from scipy import stats
+from statsmodels.stats.power import ttest_power
+
+
+POWER_TESTS = {
+    'ttest': "两独立样本 t 检验",
+    'anova': "单因素方差分析",
+    'correlation': "Pearson 相关",
+    'regression': "简单线性回归",
+}
+
+# 各检验的效应量指标
+EFFECT_LABELS = {
+    'ttest': "Cohen's d",
+    'anova': "Cohen's f",
+    'correlation': "相关系数 ρ",
+    'regression': "Cohen's f²",
+}
+
+# 样本量含义：t 检验与方差分析为每组样本量（t 检验为第 1 组），相关与回归为总样本量
+_MIN_N = {'ttest': 2, 'anova': 2, 'correlation': 3, 'regression': 3}
+
+# 求可检测效应量时的搜索上限，以及功效查找表的效应量范围
+_MAX_EFFECT = {'ttest': 10.0, 'anova': 10.0, 'correlation': 0.999, 'regression': 100.0}
+_TABLE_EFFECT = {'ttest': 2.0, 'anova': 1.0, 'correlation': 0.95, 'regression': 1.0}
+_TABLE_STEPS = 200
+
+
+def _check_test(test):
+    if test not in POWER_TESTS:
+        raise ValueError(f"test 必须为 {', '.join(POWER_TESTS)} 之一")
+
+
+def power(test, effect, n, alpha=0.05, k=3, ratio=1.0):
+    """
+    双侧检验的功效（effect、n、alpha 可为任意可广播的数组）
+
+    t 检验使用非中心 t 分布（statsmodels.ttest_power，有效样本量 n1·n2/(n1+n2)）；
+    方差分析、相关与回归使用非中心 F 分布，非中心参数 λ = f²·N
+    （相关按 f² = ρ²/(1-ρ²) 换算为斜率检验，即固定 X 的回归模型）。
+
+    参数:
+        test: "ttest"、"anova"、"correlation" 或 "regression"
+        effect: 效应量（见 EFFECT_LABELS）
+        n: 样本量（t 检验与方差分析为每组，相关与回归为总样本量）
+        alpha: 显著性水平
+        k: 方差分析的组数
+        ratio: t 检验第 2 组与第 1 组样本量之比
+
+    返回:
+        ndarray: 功效
+    """
+    _check_test(test)
+    effect = np.abs(np.asarray(effect, dtype=float))
+    n = np.asarray(n, dtype=float)
+    alpha = np.asarray(alpha, dtype=float)
+    if np.any(n < _MIN_N[test]):
+        raise ValueError(f"样本量至少为 {_MIN_N[test]}")
+
+    if test == 'ttest':
+        n2 = n * ratio
+        nobs = 1 / (1 / n + 1 / n2)
+        dof = n + n2 - 2
+        # 两个尾分别计算：非中心参数很大时非中心 t 的数值计算返回 NaN，此时上尾概率为 1、下尾为 0
+        upper = ttest_power(effect, nobs, alpha / 2, df=dof, alternative="larger")
+        lower = ttest_power(effect, nobs, alpha / 2, df=dof, alternative="smaller")
+        upper = np.nan_to_num(np.asarray(upper, dtype=float), nan=1.0)
+        return upper + np.nan_to_num(np.asarray(lower, dtype=float), nan=0.0)
+
+    if test == 'anova':
+        df1 = k - 1
+        n_total = k * n
+        f2 = effect**2
+    else:
+        df1 = 1
+        n_total = n
+        f2 = effect**2 / (1 - np.minimum(effect, 1 - 1e-12)**2) if test == 'correlation' else effect
+    df2 = n_total - df1 - 1
+    critical = stats.f.isf(alpha, df1, df2)
+    return np.asarray(stats.ncf.sf(critical, df1, df2, f2 * n_total))
+
+
+def power_grid(test, effects, alphas, ns, **options):
+    """
+    （效应量 × alpha × 样本量）网格上的功效
+
+    参数:
+        test: 检验名称
+        effects / alphas / ns: 一维数组
+        **options: 传给 power 的其他参数（k、ratio）
+
+    返回:
+        ndarray: 形状为 (len(effects), len(alphas), len(ns)) 的功效
+    """
+    effects, alphas, ns = np.ix_(np.atleast_1d(effects), np.atleast_1d(alphas), np.atleast_1d(ns))
+    return np.broadcast_to(power(test, effects, ns, alphas, **options),
+                           (effects.shape[0], alphas.shape[1], ns.shape[2]))
+
+
+def sample_size(test, effect, target=0.8, alpha=0.05, max_n=1_000_000, **options):
+    """
+    达到目标功效所需的最小样本量（对各参数的广播网格同时做整数二分查找）
+
+    参数:
+        test: 检验名称
+        effect: 效应量
+        target: 目标功效
+        alpha: 显著性水平
+        max_n: 搜索上限，超过时结果为 NaN
+        **options: 传给 power 的其他参数（k、ratio）
+
+    返回:
+        ndarray: 样本量（含义同 power 的 n）
+    """
+    _check_test(test)
+    effect, target, alpha = np.broadcast_arrays(np.asarray(effect, dtype=float),
+                                                np.asarray(target, dtype=float),
+                                                np.asarray(alpha, dtype=float))
+    lo = np.full(effect.shape, _MIN_N[test], dtype=np.int64)
+    hi = np.full(effect.shape, max_n, dtype=np.int64)
+    reachable = power(test, effect, hi, alpha, **options) >= target
+    active = reachable & (lo < hi)
+    while active.any():
+        mid = (lo + hi) // 2
+        ok = power(test, effect, mid, alpha, **options) >= target
+        hi = np.where(active & ok, mid, hi)
+        lo = np.where(active & ~ok, mid + 1, lo)
+        active = reachable & (lo < hi)
+    return np.where(reachable, hi, np.nan)
+
+
+def detectable_effect(test, n, target=0.8, alpha=0.05, tol=1e-6, **options):
+    """
+    给定样本量下达到目标功效的最小可检测效应量（向量化二分查找）
+
+    参数:
+        test: 检验名称
+        n: 样本量
+        target: 目标功效
+        alpha: 显著性水平
+        tol: 效应量的求解精度
+        **options: 传给 power 的其他参数（k、ratio）
+
+    返回:
+        ndarray: 效应量（在搜索范围内无法达到目标功效时为 NaN）
+    """
+    _check_test(test)
+    n, target, alpha = np.broadcast_arrays(np.asarray(n, dtype=float),
+                                           np.asarray(target, dtype=float),
+                                           np.asarray(alpha, dtype=float))
+    lo = np.zeros(n.shape)
+    hi = np.full(n.shape, _MAX_EFFECT[test])
+    reachable = power(test, hi, n, alpha, **options) >= target
+    while np.any(hi - lo > tol):
+        mid = (lo + hi) / 2
+        ok = power(test, mid, n, alpha, **options) >= target
+        hi = np.where(ok, mid, hi)
+        lo = np.where(ok, lo, mid)
+    return np.where(reachable, hi, np.nan)
+
+
+@lru_cache(maxsize=64)
+def power_table(test, alpha=0.05, k=3, ratio=1.0, n_max=500):
+    """
+    功效查找表（按参数缓存，首次调用时一次性向量化计算）
+
+    参数:
+        test: 检验名称
+        alpha: 显著性水平
+        k: 方差分析的组数
+        ratio: t 检验两组样本量之比
+        n_max: 样本量上限
+
+    返回:
+        tuple: (效应量网格, 样本量网格, 功效表)，功效表形状为 (效应量数, 样本量数)，均为只读
+    """
+    _check_test(test)
+    effects = np.linspace(0.0, _TABLE_EFFECT[test], _TABLE_STEPS + 1)
+    ns = np.arange(_MIN_N[test], max(int(n_max), _MIN_N[test]) + 1)
+    table = power(test, effects[:, None], ns[None, :], alpha, k=k, ratio=ratio)
+    for arr in (effects, ns, table):
+        arr.flags.writeable = False
+    return effects, ns, table
+
+
+def power_curve(test, effect, alpha=0.05, k=3, ratio=1.0, n_max=500):
+    """
+    功效随样本量变化的曲线（由 power_table 按效应量线性插值，重复调用只需毫秒级）
+
+    参数:
+        test: 检验名称
+        effect: 效应量（超出查找表范围时直接计算）
+        alpha / k / ratio / n_max: 同 power_table
+
+    返回:
+        tuple: (样本量数组, 功效数组)
+    """
+    effects, ns, table = power_table(test, float(alpha), int(k), float(ratio), int(n_max))
+    effect = abs(float(effect))
+    if effect > effects[-1]:
+        return ns, power(test, effect, ns, alpha, k=k, ratio=ratio)
+    position = effect / (effects[1] - effects[0])
+    i = min(int(position), len(effects) - 2)
+    weight = position - i
+    return ns, (1 - weight) * table[i] + weight * table[i + 1]
@@ -0,0 +1,282 @@
+"""
+秩计算引擎：每列只排序一次，保存结（相同取值）的信息，供 Mann-Whitney、Spearman、Kruskal-Wallis 共用
+"""
+import math
+
+import numpy as np
+from scipy import special, stats
+
+from stats_cache import LRUCache, array_fingerprint
+
+
+# 小样本精确分布的阈值：任一组样本量不超过该值且无结时使用精确分布（与 scipy 的 auto 规则一致）
+EXACT_MAX_N = 8
+
+_rank_cache = LRUCache(32, max_bytes=256 * 1024 * 1024)
+
+
+class RankedColumn:
+    """
+    一列数值的平均秩（有结时取平均）
+
+    只做一次 O(n log n) 排序，记录每个观测所属的不同取值编号（tie_ids）。
+    任意行子集的秩与结校正项都可以由各取值的计数在 O(n) 内得到，无需重新排序。
+
+    属性:
+        n: 有效（非缺失）观测数
+        ranks: 与原数组对齐的秩，缺失值为 NaN
+        tie_ids: 与原数组对齐的取值编号（按取值升序，缺失值为 -1）
+        tie_counts: 每个不同取值的出现次数
+        tie_term: 结校正项 Σ(t³ - t)
+    """
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        valid_values = values[valid]
+        order = np.argsort(valid_values, kind='stable')
+        sorted_values = valid_values[order]
+
+        # 排序后相邻取值不同的位置开始一个新的结组
+        new_value = np.empty(len(sorted_values), dtype=bool)
+        new_value[:1] = True
+        np.not_equal(sorted_values[1:], sorted_values[:-1], out=new_value[1:])
+        ids_sorted = np.cumsum(new_value) - 1
+
+        valid_ids = np.empty(len(valid_values), dtype=np.int64)
+        valid_ids[order] = ids_sorted
+        self.tie_ids = np.full(len(values), -1, dtype=np.int64)
+        self.tie_ids[valid] = valid_ids
+        self.n = len(valid_values)
+        self.tie_counts = np.bincount(valid_ids, minlength=int(new_value.sum()))
+        self.tie_term = _tie_term(self.tie_counts)
+        self.ranks = np.full(len(values), np.nan)
+        self.ranks[valid] = _midranks(self.tie_counts)[valid_ids]
+
+    def subset(self, mask):
+        """
+        行子集内重新计算的秩
+
+        参数:
+            mask: 与原数组等长的布尔数组（缺失值行自动排除）
+
+        返回:
+            tuple: (子集的秩（与 mask 中的有效行对齐）, 子集的 tie_ids, 子集的结校正项)
+        """
+        ids = self.tie_ids[np.asarray(mask, dtype=bool)]
+        ids = ids[ids >= 0]
+        if len(ids) == self.n:
+            return self.ranks[self.tie_ids >= 0], ids, self.tie_term
+        counts = np.bincount(ids, minlength=len(self.tie_counts))
+        return _midranks(counts)[ids], ids, _tie_term(counts)
+
+
+def _midranks(counts):
+    """各取值的平均秩：之前的观测数 + (t + 1) / 2"""
+    return np.cumsum(counts) - counts + (counts + 1) / 2
+
+
+def _tie_term(counts):
+    counts = counts.astype(float)
+    return float(np.sum(counts**3 - counts))
+
+
+def rank_array(values):
+    """
+    数值数组的秩（按数据内容指纹缓存，数据变化后自动重新计算）
+
+    参数:
+        values: 数值数组（NaN 视为缺失）
+
+    返回:
+        RankedColumn
+    """
+    values = np.asarray(values, dtype=float)
+    key = array_fingerprint(values)
+    ranked = _rank_cache.get(key)
+    if ranked is None:
+        ranked = RankedColumn(values)
+        _rank_cache.put(key, ranked)
+    return ranked
+
+
+def rank_column(df, column):
+    """
+    一列的秩（与 rank_array 共用缓存）
+
+    参数:
+        df: DataFrame
+        column: 列名
+
+    返回:
+        RankedColumn
+    """
+    return rank_array(df[column].to_numpy(dtype=float, na_value=np.nan))
+
+
+def clear_rank_cache():
+    """清空秩缓存"""
+    _rank_cache.clear()
+
+
+def group_rank_sums(ranked, row_codes, k):
+    """
+    各组的秩和（在所有组的合并样本内排秩）
+
+    参数:
+        ranked: RankedColumn
+        row_codes: 与原数组对齐的组号（0..k-1，不参与分析的行为 -1）
+        k: 组数
+
+    返回:
+        tuple: (各组秩和, 各组样本量, 合并样本的结校正项)
+    """
+    row_codes = np.asarray(row_codes)
+    mask = row_codes >= 0
+    ranks, _, tie = ranked.subset(mask)
+    codes = row_codes[mask & (ranked.tie_ids >= 0)]
+    rank_sums = np.bincount(codes, weights=ranks, minlength=k)
+    n = np.bincount(codes, minlength=k)
+    return rank_sums, n, tie
+
+
+def _mwu_exact_cdf(n1, n2, max_u):
+    """
+    无结时 U 统计量的精确分布函数 P(U ≤ u)，u = 0..max_u
+
+    U 的频数生成函数为 Gauss 二项式系数 Π_{i=1..m} (1 - q^{n+i}) / (1 - q^i)
+    （m = min(n1, n2)，n = max(n1, n2)），按 q^{max_u + 1} 截断的幂级数计算，
+    复杂度 O(m · max_u)。
+    """
+    m, n = min(n1, n2), max(n1, n2)
+    length = int(max_u) + 1
+    counts = np.zeros(length)
+    counts[0] = 1.0
+    for i in range(1, m + 1):
+        shift = n + i
+        if shift < length:
+            counts[shift:] -= counts[:length - shift].copy()
+        # 除以 (1 - q^i)：按步长 i 累加
+        for r in range(min(i, length)):
+            np.cumsum(counts[r::i], out=counts[r::i])
+    return np.minimum(np.cumsum(counts) / math.comb(n1 + n2, m), 1.0)
+
+
+def mannwhitney_pvalue(u1, n1, n2, tie_term=0.0, method="auto"):
+    """
+    Mann-Whitney U 检验的双侧 p 值（可向量化）
+
+    参数:
+        u1: 第 1 组的 U 统计量
+        n1, n2: 两组样本量
+        tie_term: 合并样本的结校正项 Σ(t³ - t)
+        method: "auto"（任一组 ≤ EXACT_MAX_N 且无结时用精确分布，否则用正态近似）、
+                "exact" 或 "asymptotic"
+
+    返回:
+        p 值（与 u1 形状相同）
+    """
+    u1 = np.asarray(u1, dtype=float)
+    tie_term = np.broadcast_to(np.asarray(tie_term, dtype=float), u1.shape)
+    n = n1 + n2
+    u = np.maximum(u1, n1 * n2 - u1)
+    s = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (u - n1 * n2 / 2 - 0.5) / s
+    p = 2 * special.ndtr(-z)
+
+    if method == "exact":
+        exact = np.ones(u1.shape, dtype=bool)
+    elif method == "auto" and min(n1, n2) <= EXACT_MAX_N:
+        exact = tie_term == 0
+    else:
+        exact = np.zeros(u1.shape, dtype=bool)
+    if exact.any():
+        # 由对称性，P(U ≥ max(U1, U2)) = P(U ≤ min(U1, U2))
+        u_min = np.rint(n1 * n2 - u[exact]).astype(np.int64)
+        p = np.array(p, dtype=float)
+        p[exact] = 2 * _mwu_exact_cdf(n1, n2, u_min.max())[u_min]
+    return np.clip(p, 0.0, 1.0)
+
+
+def mannwhitney_ranked(ranked, row_codes, method="auto"):
+    """
+    由缓存的秩计算 Mann-Whitney U 检验（双侧，连续性校正，结果与 scipy.stats.mannwhitneyu 一致）
+
+    参数:
+        ranked: RankedColumn
+        row_codes: 与原数组对齐的组号（0 或 1，不参与分析的行为 -1）
+        method: 见 mannwhitney_pvalue
+
+    返回:
+        tuple: (第 1 组的 U 统计量, p 值)
+    """
+    rank_sums, n, tie = group_rank_sums(ranked, row_codes, 2)
+    n1, n2 = int(n[0]), int(n[1])
+    u1 = rank_sums[0] - n1 * (n1 + 1) / 2
+    return u1, float(mannwhitney_pvalue(u1, n1, n2, tie, method))
+
+
+def kruskal_ranked(ranked, row_codes, k):
+    """
+    由缓存的秩计算 Kruskal-Wallis H 检验（含结校正，与 scipy.stats.kruskal 一致）
+
+    参数:
+        ranked: RankedColumn
+        row_codes: 与原数组对齐的组号（0..k-1，不参与分析的行为 -1）
+        k: 组数
+
+    返回:
+        tuple: (H 统计量, p 值)
+    """
+    rank_sums, n, tie = group_rank_sums(ranked, row_codes, k)
+    return kruskal_from_rank_sums(rank_sums, n, tie)
+
+
+def kruskal_from_rank_sums(rank_sums, n, tie_term):
+    """
+    由各组秩和计算 Kruskal-Wallis H 检验（含结校正）
+
+    参数:
+        rank_sums: 各组秩和（在所有组的合并样本内排秩）
+        n: 各组样本量
+        tie_term: 合并样本的结校正项 Σ(t³ - t)
+
+    返回:
+        tuple: (H 统计量, p 值)
+    """
+    rank_sums = np.asarray(rank_sums, dtype=float)
+    n = np.asarray(n, dtype=float)
+    k = len(n)
+    n_total = n.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = 12.0 / (n_total * (n_total + 1)) * np.sum(rank_sums**2 / n) - 3 * (n_total + 1)
+        h /= 1 - tie_term / (n_total**3 - n_total)
+    return h, stats.chi2.sf(h, k - 1)
+
+
+def spearman_ranked(ranked_x, ranked_y, mask=None):
+    """
+    由两列缓存的秩计算 Spearman 等级相关（只用两列同时有效的行，与 scipy.stats.spearmanr 一致）
+
+    参数:
+        ranked_x, ranked_y: 同一 DataFrame 两列的 RankedColumn
+        mask: 可选的布尔数组，False 的行不参与分析
+
+    返回:
+        tuple: (rho, p 值)
+    """
+    valid = (ranked_x.tie_ids >= 0) & (ranked_y.tie_ids >= 0)
+    mask = valid if mask is None else valid & np.asarray(mask, dtype=bool)
+    rx, _, _ = ranked_x.subset(mask)
+    ry, _, _ = ranked_y.subset(mask)
+    n = len(rx)
+    rx = rx - rx.mean()
+    ry = ry - ry.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho = np.clip((rx @ ry) / np.sqrt((rx @ rx) * (ry @ ry)), -1.0, 1.0)
+        t = rho * np.sqrt((n - 2) / ((rho + 1.0) * (1.0 - rho)))
+    p = 2 * special.stdtr(n - 2, -np.abs(t))
+    if abs(rho) >= 1.0:
+        p = 0.0
+    return rho, p
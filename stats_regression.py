@@ -0,0 +1,180 @@
+"""
+简单线性回归的闭式解引擎：由充分统计量直接计算，支持批量回归
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def ols_from_moments(n, mean_x, mean_y, sxx, syy, sxy, alpha=0.05):
+    """
+    由中心化充分统计量计算简单线性回归（可向量化）
+
+    参数:
+        n: 有效观测数
+        mean_x, mean_y: X 与 Y 的均值
+        sxx, syy, sxy: 离均差平方和 Σ(x-x̄)²、Σ(y-ȳ)² 与离均差积和 Σ(x-x̄)(y-ȳ)
+        alpha: 显著性水平（用于斜率置信区间）
+
+    返回:
+        dict: slope、intercept、r_squared、adj_r_squared、std_err、slope_se、
+              slope_ci_lower、slope_ci_upper、f_statistic、f_pvalue、p_value、n
+              （与 linear_regression_simple 的 extra_info 键一致，另含斜率 p 值）
+    """
+    n = np.asarray(n, dtype=float)
+    dof = n - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = sxy / sxx
+        intercept = mean_y - slope * mean_x
+        sse = np.maximum(syy - slope * sxy, 0.0)
+        mse = sse / dof
+        r_squared = 1 - sse / syy
+        adj_r_squared = 1 - (1 - r_squared) * (n - 1) / dof
+        slope_se = np.sqrt(mse / sxx)
+        t_stat = slope / slope_se
+        f_stat = t_stat**2
+    p_value = 2 * stats.t.sf(np.abs(t_stat), dof)
+    margin = stats.t.ppf(1 - alpha / 2, dof) * slope_se
+
+    return {
+        'slope': slope,
+        'intercept': intercept,
+        'r_squared': r_squared,
+        'adj_r_squared': adj_r_squared,
+        'std_err': np.sqrt(mse),
+        'slope_se': slope_se,
+        'slope_ci_lower': slope - margin,
+        'slope_ci_upper': slope + margin,
+        'f_statistic': f_stat,
+        'f_pvalue': stats.f.sf(f_stat, 1, dof),
+        'p_value': p_value,
+        'n': n,
+    }
+
+
+def ols_from_sums(n, sum_x, sum_y, sum_xx, sum_yy, sum_xy, alpha=0.05):
+    """
+    由原始和 Σx、Σy、Σx²、Σy²、Σxy 计算简单线性回归
+
+    适用于分块累加的场景；数据量级差异很大时建议先减去一个参考值再累加，
+    以减少 Σx² - (Σx)²/n 的数值抵消。
+
+    参数与返回值同 ols_from_moments。
+    """
+    n = np.asarray(n, dtype=float)
+    mean_x = sum_x / n
+    mean_y = sum_y / n
+    sxx = sum_xx - sum_x * mean_x
+    syy = sum_yy - sum_y * mean_y
+    sxy = sum_xy - sum_x * mean_y
+    return ols_from_moments(n, mean_x, mean_y, sxx, syy, sxy, alpha)
+
+
+def ols_fit(x, y, alpha=0.05):
+    """
+    单个 (x, y) 对的闭式最小二乘拟合（无缺失值的数组）
+
+    返回:
+        dict: 同 ols_from_moments，数值为标量
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    mean_x = x.mean()
+    mean_y = y.mean()
+    dx = x - mean_x
+    dy = y - mean_y
+    return ols_from_moments(len(x), mean_x, mean_y, dx @ dx, dy @ dy, dx @ dy, alpha)
+
+
+def _as_matrix(a):
+    a = np.asarray(a, dtype=float)
+    return a[:, None] if a.ndim == 1 else a
+
+
+def linear_regression_batch(x, y, alpha=0.05, x_names=None, y_names=None):
+    """
+    批量简单线性回归：一次向量化调用完成多组回归
+
+    支持三种形式：
+        - 一个 X 对多个 Y：x 形状 (n,)，y 形状 (n, q)
+        - 多个 X 对一个 Y：x 形状 (n, p)，y 形状 (n,)
+        - 逐列配对：x 与 y 形状均为 (n, q)
+    每对回归只使用该对同时有效（非 NaN）的观测。
+
+    参数:
+        x: 自变量数组
+        y: 因变量数组
+        alpha: 显著性水平
+        x_names / y_names: 列名（默认使用列序号）
+
+    返回:
+        DataFrame: 每个回归一行，列为 x、y 及 ols_from_moments 的全部结果
+    """
+    x = _as_matrix(x)
+    y = _as_matrix(y)
+    if x.shape[0] != y.shape[0]:
+        raise ValueError("X 与 Y 的观测数不一致")
+    if x.shape[1] != 1 and y.shape[1] != 1 and x.shape[1] != y.shape[1]:
+        raise ValueError("X 与 Y 的列数必须相同，或其中之一只有 1 列")
+
+    n_fits = max(x.shape[1], y.shape[1])
+    x_names = list(range(x.shape[1])) if x_names is None else list(x_names)
+    y_names = list(range(y.shape[1])) if y_names is None else list(y_names)
+    x_labels = x_names * n_fits if len(x_names) == 1 else x_names
+    y_labels = y_names * n_fits if len(y_names) == 1 else y_names
+
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    n = valid.sum(axis=0)
+    if valid.all():
+        mean_x = x.mean(axis=0)
+        mean_y = y.mean(axis=0)
+        dx = x - mean_x
+        dy = y - mean_y
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_x = np.where(valid, x, 0.0).sum(axis=0) / n
+            mean_y = np.where(valid, y, 0.0).sum(axis=0) / n
+        dx = np.where(valid, x - mean_x, 0.0)
+        dy = np.where(valid, y - mean_y, 0.0)
+
+    dx, dy = np.broadcast_arrays(dx, dy)
+    sxx = np.einsum('ij,ij->j', dx, dx)
+    syy = np.einsum('ij,ij->j', dy, dy)
+    sxy = np.einsum('ij,ij->j', dx, dy)
+    mean_x, mean_y, n = np.broadcast_arrays(mean_x, mean_y, n)
+
+    result = ols_from_moments(n, mean_x, mean_y, sxx, syy, sxy, alpha)
+    enough = n >= 3
+    for key, value in result.items():
+        if key != 'n':
+            result[key] = np.where(enough, value, np.nan)
+    result['n'] = n.astype(np.int64)
+
+    frame = pd.DataFrame({'x': x_labels, 'y': y_labels})
+    for key, value in result.items():
+        frame[key] = value
+    return frame
+
+
+def linear_regression_columns(df, x_cols, y_cols, alpha=0.05):
+    """
+    对 DataFrame 中的列批量执行简单线性回归
+
+    参数:
+        df: DataFrame
+        x_cols: 自变量列名或列名列表
+        y_cols: 因变量列名或列名列表
+        alpha: 显著性水平
+
+    返回:
+        DataFrame: 见 linear_regression_batch
+    """
+    x_cols = [x_cols] if isinstance(x_cols, str) else list(x_cols)
+    y_cols = [y_cols] if isinstance(y_cols, str) else list(y_cols)
+    return linear_regression_batch(
+        df[x_cols].to_numpy(dtype=float, na_value=np.nan),
+        df[y_cols].to_numpy(dtype=float, na_value=np.nan),
+        alpha=alpha,
+        x_names=x_cols,
+        y_names=y_cols,
+    )
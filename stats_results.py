@@ -0,0 +1,354 @@
+"""
+分析结果对象：按检验类型划分的紧凑结果类（__slots__），保留字典式访问
+
+stats_core 各函数返回这些对象，app.py 中 result['p_value']、result['extra_info'][...]、
+result.get(...) 等用法不变。写入的 numpy 标量、数组与 pandas 对象统一转换为 Python 内置类型，
+大量结果可一次转换为 pyarrow Table（数值列由 numpy 数组直接构造）或列式 JSON，用于批量存储与传输。
+"""
+import json
+import math
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+
+_FIELDS = ('method_name', 'stat', 'p_value', 'extra_info', 'explanation_zh')
+
+
+def _plain(value):
+    """numpy 标量 / 数组与 pandas 对象转换为 Python 内置类型（dict、tuple、list 递归转换）"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {_plain(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_plain(v) for v in value)
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, pd.Series):
+        return {_plain(k): _plain(v) for k, v in value.items()}
+    return value
+
+
+class ExtraInfo(dict):
+    """extra_info 字典：写入时把 numpy / pandas 值转换为 Python 内置类型"""
+
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, _plain(value))
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+
+class StatResult(Mapping):
+    """
+    单次检验的结果
+
+    字段与原来的结果字典相同：method_name、stat、p_value、extra_info、explanation_zh；
+    支持 result[key]、result.get(key)、key in result、dict(result) 以及对这五个字段的赋值。
+
+    子类的 KIND 为检验类型，COLUMNS 为导出 Arrow 表时单独成列的 extra_info 标量字段
+    （字段名: Arrow 类型名），其余 extra_info 字段以 JSON 保存在 extra_json 列。
+    """
+
+    __slots__ = _FIELDS
+    KIND = 'generic'
+    COLUMNS = {}
+
+    def __init__(self, method_name, stat, p_value, extra_info=None, explanation_zh=""):
+        self.method_name = method_name
+        self.stat = _plain(stat)
+        self.p_value = _plain(p_value)
+        self.extra_info = ExtraInfo(extra_info or {})
+        self.explanation_zh = explanation_zh
+
+    @classmethod
+    def from_dict(cls, result):
+        """由结果字典构造"""
+        return cls(**{field: result[field] for field in _FIELDS})
+
+    def __getitem__(self, key):
+        if key not in _FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in _FIELDS:
+            raise KeyError(f"结果没有字段 {key!r}（附加信息请写入 extra_info）")
+        if key == 'extra_info':
+            value = ExtraInfo(value)
+        elif key in ('stat', 'p_value'):
+            value = _plain(value)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(_FIELDS)
+
+    def __len__(self):
+        return len(_FIELDS)
+
+    def to_dict(self):
+        """转换为普通字典（extra_info 为独立副本）"""
+        result = dict(self.items())
+        result['extra_info'] = dict(self.extra_info)
+        return result
+
+    def __repr__(self):
+        return (f"{type(self).__name__}(method_name={self.method_name!r}, stat={self.stat!r}, "
+                f"p_value={self.p_value!r})")
+
+
+class TwoGroupResult(StatResult):
+    """两组比较（t 检验、Welch's t 检验、Mann-Whitney U 检验、置换检验）"""
+
+    __slots__ = ()
+    KIND = 'two_group'
+    COLUMNS = {
+        'group1_mean': 'float64',
+        'group2_mean': 'float64',
+        'group1_std': 'float64',
+        'group2_std': 'float64',
+        'group1_median': 'float64',
+        'group2_median': 'float64',
+        'group1_iqr': 'float64',
+        'group2_iqr': 'float64',
+        'mean_diff': 'float64',
+        'cohens_d': 'float64',
+        'r_effect': 'float64',
+        'normality_p1': 'float64',
+        'normality_p2': 'float64',
+        'levene_p': 'float64',
+    }
+
+
+class AnovaResult(StatResult):
+    """多组比较（F 检验、Welch 方差分析、Kruskal-Wallis 检验、置换检验）"""
+
+    __slots__ = ()
+    KIND = 'anova'
+    COLUMNS = {
+        'n_groups': 'int64',
+        'ss_between': 'float64',
+        'ss_within': 'float64',
+        'ss_total': 'float64',
+        'df_between': 'int64',
+        'df_within': 'int64',
+        'ms_between': 'float64',
+        'ms_within': 'float64',
+        'eta_squared': 'float64',
+        'welch_df2': 'float64',
+        'epsilon_squared': 'float64',
+        'levene_p': 'float64',
+    }
+
+
+class CorrelationResult(StatResult):
+    """相关性分析（Pearson、Spearman）"""
+
+    __slots__ = ()
+    KIND = 'correlation'
+    COLUMNS = {
+        'correlation_coefficient': 'float64',
+        'n': 'int64',
+        'x_mean': 'float64',
+        'y_mean': 'float64',
+        'x_std': 'float64',
+        'y_std': 'float64',
+    }
+
+
+class RegressionResult(StatResult):
+    """简单线性回归"""
+
+    __slots__ = ()
+    KIND = 'regression'
+    COLUMNS = {
+        'slope': 'float64',
+        'intercept': 'float64',
+        'r_squared': 'float64',
+        'adj_r_squared': 'float64',
+        'std_err': 'float64',
+        'slope_se': 'float64',
+        'slope_ci_lower': 'float64',
+        'slope_ci_upper': 'float64',
+        'f_statistic': 'float64',
+        'f_pvalue': 'float64',
+        'n': 'int64',
+    }
+
+
+RESULT_TYPES = {cls.KIND: cls for cls in (StatResult, TwoGroupResult, AnovaResult, CorrelationResult,
+                                          RegressionResult)}
+
+
+def _encode(value):
+    """extra_info 的非标量字段编码为 JSON 兼容对象（保留 dict 键、tuple 与 NaN / inf）"""
+    if isinstance(value, dict):
+        return {'__items__': [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return {'__float__': repr(value)}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if '__items__' in value:
+            return {_decode(k): _decode(v) for k, v in value['__items__']}
+        if '__tuple__' in value:
+            return tuple(_decode(v) for v in value['__tuple__'])
+        if '__float__' in value:
+            return float(value['__float__'])
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+def _kind_columns(kinds):
+    """各结果类型的 COLUMNS 按出现顺序合并（同名字段取第一次出现的类型）"""
+    columns = {}
+    for kind in dict.fromkeys(kinds):
+        for name, dtype in RESULT_TYPES.get(kind, StatResult).COLUMNS.items():
+            columns.setdefault(name, dtype)
+    return columns
+
+
+def _is_column_value(result, key, value):
+    """extra_info 字段是否写入单独的标量列（属于该结果类型的 COLUMNS 且为数值）"""
+    return key in result.COLUMNS and isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def results_to_arrow(results):
+    """
+    把多个结果转换为一个 pyarrow Table（每个结果一行）
+
+    列为 kind（检验类型）、method_name、stat、p_value、explanation_zh、
+    各结果类型 COLUMNS 中的 extra_info 标量字段（该结果没有的字段为 null），
+    以及其余 extra_info 字段的 JSON（extra_json）。数值列由 numpy 数组直接构造，不逐个装箱。
+
+    参数:
+        results: StatResult 或结果字典的序列
+
+    返回:
+        pyarrow.Table
+    """
+    import pyarrow as pa
+
+    results = [r if isinstance(r, StatResult) else StatResult.from_dict(r) for r in results]
+    columns = _kind_columns(r.KIND for r in results)
+    n = len(results)
+
+    def floats(values):
+        return pa.array(np.fromiter((np.nan if v is None else v for v in values), dtype=np.float64, count=n))
+
+    data = {
+        'kind': pa.array([r.KIND for r in results], type=pa.string()).dictionary_encode(),
+        'method_name': pa.array([r.method_name for r in results], type=pa.string()).dictionary_encode(),
+        'stat': floats(r.stat for r in results),
+        'p_value': floats(r.p_value for r in results),
+        'explanation_zh': pa.array([r.explanation_zh for r in results], type=pa.string()),
+    }
+    for name, dtype in columns.items():
+        present = np.fromiter((_is_column_value(r, name, r.extra_info.get(name)) for r in results),
+                              dtype=bool, count=n)
+        fill = np.nan if dtype == 'float64' else 0
+        values = np.fromiter((r.extra_info[name] if ok else fill for r, ok in zip(results, present)),
+                             dtype=dtype, count=n)
+        data[name] = pa.array(values, mask=None if present.all() else ~present)
+    data['extra_json'] = pa.array(
+        [json.dumps({k: _encode(v) for k, v in r.extra_info.items() if not _is_column_value(r, k, v)},
+                    ensure_ascii=False)
+         for r in results],
+        type=pa.string())
+    return pa.table(data)
+
+
+def results_from_arrow(table):
+    """
+    由 results_to_arrow 的输出还原结果对象
+
+    参数:
+        table: pyarrow.Table
+
+    返回:
+        list: StatResult 子类对象列表
+    """
+    columns = table.to_pydict()
+    results = []
+    for i in range(table.num_rows):
+        cls = RESULT_TYPES.get(columns['kind'][i], StatResult)
+        extra_info = {name: columns[name][i] for name in cls.COLUMNS
+                      if name in columns and columns[name][i] is not None}
+        extra_info.update({k: _decode(v) for k, v in json.loads(columns['extra_json'][i]).items()})
+        results.append(cls(columns['method_name'][i], columns['stat'][i], columns['p_value'][i],
+                           extra_info, columns['explanation_zh'][i]))
+    return results
+
+
+def results_to_json(results):
+    """
+    把多个结果转换为列式 JSON（{"列名": [各结果的值, ...]}，列与 results_to_arrow 相同）
+
+    缺失的字段为 null；数值列中的 NaN / inf 也写为 null，其行号与取值记录在
+    "__nonfinite__"（{"列名": [[行号, "nan"], ...]}）中。
+
+    参数:
+        results: StatResult 或结果字典的序列
+
+    返回:
+        str: JSON 文本
+    """
+    data = {}
+    nonfinite = {}
+    for name, values in results_to_arrow(results).to_pydict().items():
+        special = [[i, repr(v)] for i, v in enumerate(values) if isinstance(v, float) and not math.isfinite(v)]
+        if special:
+            nonfinite[name] = special
+            values = list(values)
+            for i, _ in special:
+                values[i] = None
+        data[name] = values
+    data['__nonfinite__'] = nonfinite
+    return json.dumps(data, ensure_ascii=False, allow_nan=False)
+
+
+def results_from_json(text):
+    """
+    由 results_to_json 的输出还原结果对象
+
+    参数:
+        text: JSON 文本
+
+    返回:
+        list: StatResult 子类对象列表
+    """
+    import pyarrow as pa
+
+    data = json.loads(text)
+    nonfinite = data.pop('__nonfinite__', {})
+    types = dict.fromkeys(('stat', 'p_value'), 'float64')
+    types.update(_kind_columns(data['kind']))
+    arrays = {}
+    for name, values in data.items():
+        for i, value in nonfinite.get(name, ()):
+            values[i] = float(value)
+        arrays[name] = pa.array(values, type=pa.type_for_alias(types.get(name, 'string')))
+    return results_from_arrow(pa.table(arrays))
@@ -0,0 +1,144 @@
+"""
+Monte Carlo 功效模拟：两组比较的自动方法选择（t / Welch / Mann-Whitney）在给定分布下的功效
+
+解析功效公式只适用于正态等方差的 t 检验；two_group_compare 在非正态或方差不齐时
+会改用 Welch 或 Mann-Whitney 检验，其实际功效只能通过模拟得到。
+每个情景按块生成整个样本矩阵（每列一个模拟数据集），用 stats_batch 的批量实现
+执行与 two_group_compare 相同的自动选择，各块可分配到多个进程并行计算。
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from simulate_data import DISTRIBUTIONS
+from stats_assumptions import AssumptionChecker, get_checker
+from stats_batch import TWO_GROUP_METHODS, compare_block, mannwhitney_block
+
+
+# 单块样本矩阵的元素上限（约 32 MB）
+MAX_BLOCK_ELEMENTS = 4_000_000
+
+_METHOD_KEYS = {name: key for key, name in TWO_GROUP_METHODS.items()}
+
+
+def _sample(spec, n, size, rng):
+    """按 (分布名, 参数) 生成形状为 (n, size) 的样本矩阵；带离群点的分布总行数也为 n"""
+    name, params = spec
+    if name not in DISTRIBUTIONS:
+        raise ValueError(f"分布必须为 {', '.join(DISTRIBUTIONS)} 之一")
+    params = dict(params or {})
+    if name == 'gamma_outliers':
+        n_outliers = params.get('n_outliers', 3)
+        if n_outliers >= n:
+            raise ValueError("离群点个数必须小于样本量")
+        return DISTRIBUTIONS[name]((n - n_outliers, size), random_state=rng, **params)
+    return DISTRIBUTIONS[name]((n, size), random_state=rng, **params)
+
+
+def _simulate_block(scenario, seed_seq, size, alpha, checker_options):
+    """
+    一个模拟块：返回各方法被选中次数、拒绝次数，以及固定使用某一方法时的拒绝次数
+
+    checker_options 为检查器的构造参数，工作进程中按同样的检验设置重建检查器。
+    """
+    rng = np.random.default_rng(seed_seq)
+    n1, n2 = scenario['n1'], scenario['n2']
+    a = np.sort(_sample(scenario['group1'], n1, size, rng), axis=0)
+    b = np.sort(_sample(scenario['group2'], n2, size, rng), axis=0)
+
+    block = compare_block(a, b, AssumptionChecker(**checker_options))
+    rejected = block['p_value'] < alpha
+    counts = {'n': size, 'rejected': int(rejected.sum())}
+    for name, key in _METHOD_KEYS.items():
+        chosen = block['method_name'] == name
+        counts[f'chosen_{key}'] = int(chosen.sum())
+        counts[f'rejected_{key}'] = int((rejected & chosen).sum())
+
+    # 不经自动选择、固定使用各方法时的拒绝次数
+    mean1, mean2 = block['group1_mean'], block['group2_mean']
+    std1, std2 = block['group1_std'], block['group2_std']
+    for key, equal_var in (('student', True), ('welch', False)):
+        _, p = stats.ttest_ind_from_stats(mean1, std1, n1, mean2, std2, n2, equal_var=equal_var)
+        counts[f'forced_{key}'] = int((p < alpha).sum())
+    _, p = mannwhitney_block(a, b)
+    counts['forced_mannwhitney'] = int((p < alpha).sum())
+    return counts
+
+
+def simulate_power(scenarios, n_sim=2000, alpha=0.05, seed=0, block_size=500, n_jobs=1):
+    """
+    模拟各情景下 two_group_compare 自动选择流程的功效与方法选择频率
+
+    正态性检验使用 stats_assumptions.get_checker() 的当前设置（并行时工作进程使用同样的设置）。
+
+    参数:
+        scenarios: 情景列表，每个情景为 dict：
+                   name（名称）、n1 / n2（两组样本量）、
+                   group1 / group2（(分布名, 参数 dict)，分布见 simulate_data.DISTRIBUTIONS，
+                   如 ("normal", {"loc": 10, "scale": 2})、("lognormal", {"mean": 2, "sigma": 0.5})、
+                   ("gamma_outliers", {"shape": 2, "scale": 3})；带离群点分布的样本量包含离群点）
+        n_sim: 每个情景的模拟次数
+        alpha: 显著性水平
+        seed: 随机种子；每块使用 SeedSequence.spawn 派生的独立随机流，结果与 n_jobs 无关
+        block_size: 每块同时模拟的数据集个数（一个样本矩阵）
+        n_jobs: 并行进程数（1 为当前进程内计算）
+
+    返回:
+        DataFrame: 每个情景一行：
+                   power（自动选择流程的拒绝率，原假设成立时即第一类错误率）与 power_se（Monte Carlo 标准误）、
+                   share_*（各方法被选中的比例）、power_given_*（选中该方法时的拒绝率）、
+                   power_forced_*（固定使用该方法时的拒绝率）
+    """
+    checker = get_checker()
+    checker_options = dict(large_n_strategy=checker.large_n_strategy, shapiro_max_n=checker.shapiro_max_n,
+                           subsample_size=checker.subsample_size, seed=checker.seed)
+    tasks = []
+    seeds = np.random.SeedSequence(seed).spawn(len(scenarios))
+    for i, scenario in enumerate(scenarios):
+        if scenario['n1'] < 3 or scenario['n2'] < 3:
+            raise ValueError("每组至少需要 3 个观测值")
+        size = max(1, min(block_size, MAX_BLOCK_ELEMENTS // (scenario['n1'] + scenario['n2'])))
+        n_blocks = math.ceil(n_sim / size)
+        sizes = [size] * (n_blocks - 1) + [n_sim - size * (n_blocks - 1)]
+        for seed_seq, block in zip(seeds[i].spawn(n_blocks), sizes):
+            tasks.append((i, scenario, seed_seq, block))
+
+    totals = [{} for _ in scenarios]
+
+    def accumulate(i, counts):
+        for key, value in counts.items():
+            totals[i][key] = totals[i].get(key, 0) + value
+
+    if n_jobs == 1:
+        for i, scenario, seed_seq, block in tasks:
+            accumulate(i, _simulate_block(scenario, seed_seq, block, alpha, checker_options))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {pool.submit(_simulate_block, scenario, seed_seq, block, alpha, checker_options): i
+                       for i, scenario, seed_seq, block in tasks}
+            for future in as_completed(futures):
+                accumulate(futures[future], future.result())
+
+    rows = []
+    for scenario, total in zip(scenarios, totals):
+        n = total['n']
+        p = total['rejected'] / n
+        row = {
+            'scenario': scenario.get('name'),
+            'n1': scenario['n1'],
+            'n2': scenario['n2'],
+            'n_sim': n,
+            'power': p,
+            'power_se': math.sqrt(p * (1 - p) / n),
+        }
+        for key in TWO_GROUP_METHODS:
+            chosen = total[f'chosen_{key}']
+            row[f'share_{key}'] = chosen / n
+            row[f'power_given_{key}'] = total[f'rejected_{key}'] / chosen if chosen else np.nan
+        for key in TWO_GROUP_METHODS:
+            row[f'power_forced_{key}'] = total[f'forced_{key}'] / n
+        rows.append(row)
+    return pd.DataFrame(rows)
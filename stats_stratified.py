@@ -0,0 +1,297 @@
+"""
+分层分析：按分层变量（如中心、性别、批次）在每一层分别执行同一检验，并合并各层的效应量
+
+分层列只因子化一次，各层的行号由分组引擎排成连续片段；各层的检验可分配到线程池或进程池。
+合并估计使用逆方差加权（固定效应，附 Cochran Q 与 I² 异质性），
+两组比较的因变量为 0/1 时另给出 Mantel-Haenszel 合并比值比与 CMH 检验；
+相关性分析各层使用同一种相关系数（自动选择时任一层改用 Spearman 则全部用 Spearman）。
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from stats_core import anova_oneway, correlation, linear_regression_simple, two_group_compare
+from stats_grouping import GroupedData
+from stats_incremental import TASKS
+
+
+_TASK_FUNCTIONS = {
+    'two_group': two_group_compare,
+    'anova': anova_oneway,
+    'correlation': correlation,
+    'regression': linear_regression_simple,
+}
+
+
+def _run_stratum(task, frame, alpha, columns, options):
+    """一层的检验：返回 (结果, 错误信息)"""
+    try:
+        return _TASK_FUNCTIONS[task](frame, alpha=alpha, **columns, **options), None
+    except (ValueError, KeyError, TypeError) as e:
+        return None, str(e)
+
+
+def partition_strata(df, strata_col, sort=True):
+    """
+    按分层变量把行号排成连续片段（分层列只因子化一次，缺失分层值的行不属于任何一层）
+
+    参数:
+        df: DataFrame
+        strata_col: 分层变量列名
+        sort: 是否按层标签排序
+
+    返回:
+        tuple: (层标签数组, 各层行号（位置下标）数组的列表)
+    """
+    rows = GroupedData.from_arrays(np.arange(len(df), dtype=float), df[strata_col], sort=sort)
+    return rows.labels, [segment.astype(np.intp) for segment in rows.segments()]
+
+
+def inverse_variance_pool(estimates, variances, alpha=0.05):
+    """
+    逆方差加权的固定效应合并估计（方差非正或缺失的层被跳过）
+
+    参数:
+        estimates: 各层估计值
+        variances: 各层估计值的方差
+        alpha: 显著性水平（置信区间为 1 - alpha）
+
+    返回:
+        dict: estimate、std_err、ci_lower、ci_upper、z、p_value、
+              q_stat / q_df / q_p（Cochran Q 异质性检验）、i_squared、n_strata
+    """
+    estimates = np.asarray(estimates, dtype=float)
+    variances = np.asarray(variances, dtype=float)
+    valid = np.isfinite(estimates) & np.isfinite(variances) & (variances > 0)
+    estimates, weights = estimates[valid], 1.0 / variances[valid]
+    k = len(estimates)
+    if k == 0:
+        raise ValueError("没有可合并的分层（各层均无法估计效应量）")
+
+    estimate = float(np.sum(weights * estimates) / weights.sum())
+    std_err = float(np.sqrt(1.0 / weights.sum()))
+    z = estimate / std_err
+    margin = stats.norm.isf(alpha / 2) * std_err
+    q_stat = float(np.sum(weights * (estimates - estimate)**2))
+    q_df = k - 1
+    return {
+        'estimate': estimate,
+        'std_err': std_err,
+        'ci_lower': estimate - margin,
+        'ci_upper': estimate + margin,
+        'z': z,
+        'p_value': float(2 * stats.norm.sf(abs(z))),
+        'q_stat': q_stat,
+        'q_df': q_df,
+        'q_p': float(stats.chi2.sf(q_stat, q_df)) if q_df > 0 else np.nan,
+        'i_squared': max(0.0, (q_stat - q_df) / q_stat) if q_stat > 0 else 0.0,
+        'n_strata': k,
+    }
+
+
+def _stratum_group_moments(df, value_col, group_col, strata_codes, n_strata):
+    """各（层, 组）的样本量、均值与方差，组标签在全部数据上统一编码（形状为 (层数, 组数)）"""
+    group_codes, group_labels = pd.factorize(df[group_col], sort=True)
+    k = len(group_labels)
+    codes = np.where((strata_codes >= 0) & (group_codes >= 0), strata_codes * k + group_codes, -1)
+    grouped = GroupedData(df[value_col].to_numpy(dtype=float, na_value=np.nan), codes, np.arange(n_strata * k))
+    shape = (n_strata, k)
+    return group_labels, grouped.n.reshape(shape), grouped.means.reshape(shape), grouped.variances().reshape(shape)
+
+
+def _mantel_haenszel(df, value_col, group_col, strata_codes, n_strata, alpha):
+    """因变量为 0/1 时各层 2×2 表的 Mantel-Haenszel 合并比值比与 CMH 检验（不是 0/1 时返回 None）"""
+    from statsmodels.stats.contingency_tables import StratifiedTable
+
+    values = df[value_col].to_numpy(dtype=float, na_value=np.nan)
+    group_codes, group_labels = pd.factorize(df[group_col], sort=True)
+    valid = (strata_codes >= 0) & (group_codes >= 0) & ~np.isnan(values)
+    if len(group_labels) != 2 or not np.isin(values[valid], (0.0, 1.0)).all():
+        return None
+
+    # 每层一张 2×2 表：行为组，列为结局 1 / 0
+    cells = strata_codes[valid] * 4 + group_codes[valid] * 2 + (1 - values[valid].astype(np.int64))
+    tables = np.bincount(cells, minlength=n_strata * 4).reshape(n_strata, 2, 2).astype(float)
+    informative = (tables.sum(axis=2) > 0).all(axis=1)
+    if informative.sum() == 0:
+        return None
+    table = StratifiedTable(np.moveaxis(tables[informative], 0, -1))
+    ci_lower, ci_upper = table.oddsratio_pooled_confint(alpha=alpha)
+    cmh = table.test_null_odds(correction=False)
+    homogeneity = table.test_equal_odds()
+    return {
+        'odds_ratio': float(table.oddsratio_pooled),
+        'log_odds_se': float(table.logodds_pooled_se),
+        'ci_lower': float(ci_lower),
+        'ci_upper': float(ci_upper),
+        'cmh_stat': float(cmh.statistic),
+        'p_value': float(cmh.pvalue),
+        'breslow_day_stat': float(homogeneity.statistic),
+        'breslow_day_p': float(homogeneity.pvalue),
+        'n_strata': int(informative.sum()),
+        'groups': (group_labels[0], group_labels[1]),
+    }
+
+
+def _pooled_estimates(task, df, columns, strata_codes, labels, results, alpha):
+    """各任务的合并估计"""
+    n_strata = len(labels)
+    pooled = {}
+    if task == 'two_group':
+        group_labels, n, means, variances = _stratum_group_moments(
+            df, columns['value_col'], columns['group_col'], strata_codes, n_strata)
+        if len(group_labels) != 2:
+            raise ValueError(f"分组变量必须恰好有 2 个组，当前有 {len(group_labels)} 个组")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var_diff = variances[:, 0] / n[:, 0] + variances[:, 1] / n[:, 1]
+        pooled = inverse_variance_pool(means[:, 0] - means[:, 1], var_diff, alpha)
+        pooled['estimand'] = f"均值差（{group_labels[0]} − {group_labels[1]}）"
+        mh = _mantel_haenszel(df, columns['value_col'], columns['group_col'], strata_codes, n_strata, alpha)
+        if mh is not None:
+            pooled['mantel_haenszel'] = mh
+    elif task == 'anova':
+        group_labels, n, means, variances = _stratum_group_moments(
+            df, columns['value_col'], columns['group_col'], strata_codes, n_strata)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var_means = variances / n
+        pooled['group_means'] = {label: inverse_variance_pool(means[:, g], var_means[:, g], alpha)['estimate']
+                                 for g, label in enumerate(group_labels)
+                                 if np.any(np.isfinite(var_means[:, g]) & (var_means[:, g] > 0))}
+        # 各层 p 值用 Fisher 法合并
+        p_values = [r['p_value'] for r in results if r is not None and np.isfinite(r['p_value'])]
+        if not p_values:
+            raise ValueError("没有可合并的分层（各层均无法完成检验）")
+        fisher = stats.combine_pvalues(p_values, method='fisher')
+        pooled.update(estimand="各组合并均值（逆方差加权）", method="Fisher 合并 p 值",
+                      stat=float(fisher.statistic), p_value=float(fisher.pvalue), n_strata=len(p_values))
+    elif task == 'correlation':
+        # Fisher z 变换后逆方差合并，再变换回相关系数：
+        # Pearson 的方差为 1 / (n - 3)，Spearman 用 Bonett-Wright 近似 (1 + r² / 2) / (n - 3)
+        coefficient = _correlation_coefficient(results)
+        r = np.array([res['stat'] if res is not None else np.nan for res in results], dtype=float)
+        n = np.array([res['extra_info']['n'] if res is not None else np.nan for res in results], dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variances = (1.0 + r**2 / 2 if coefficient == 'spearman' else 1.0) / (n - 3)
+            pooled = inverse_variance_pool(np.arctanh(np.clip(r, -1 + 1e-12, 1 - 1e-12)), variances, alpha)
+        for key in ('estimate', 'ci_lower', 'ci_upper'):
+            pooled[key] = float(np.tanh(pooled[key]))
+        pooled['std_err_z'] = pooled.pop('std_err')
+        pooled['coefficient'] = coefficient
+        pooled['estimand'] = ("合并 Spearman 相关系数（Fisher z，Bonett-Wright 方差）" if coefficient == 'spearman'
+                              else "合并 Pearson 相关系数（Fisher z）")
+    else:
+        slopes = [res['extra_info']['slope'] if res is not None else np.nan for res in results]
+        ses = np.array([res['extra_info']['slope_se'] if res is not None else np.nan for res in results], dtype=float)
+        pooled = inverse_variance_pool(slopes, ses**2, alpha)
+        pooled['estimand'] = "合并斜率"
+    return pooled
+
+
+def _correlation_coefficient(results):
+    """各层相关性结果使用的相关系数（"pearson" 或 "spearman"），各层不一致时报错"""
+    coefficients = {'spearman' if "Spearman" in res['method_name'] else 'pearson'
+                    for res in results if res is not None}
+    if len(coefficients) > 1:
+        raise ValueError("各层的相关系数不一致，无法合并（请指定 method）")
+    return coefficients.pop() if coefficients else 'pearson'
+
+
+def _pooled_explanation(pooled, alpha):
+    """合并估计的中文解释"""
+    if 'estimate' not in pooled:
+        p_value = pooled['p_value']
+        verdict = "具有" if p_value < alpha else "无"
+        return f"{pooled['n_strata']} 层的 p 值经 Fisher 法合并：p = {p_value:.4f}，各组间差异{verdict}统计学意义（α = {alpha}）。"
+    verdict = "具有" if pooled['p_value'] < alpha else "无"
+    text = (f"{pooled['estimand']} = {pooled['estimate']:.4f}，{1 - alpha:.0%} 置信区间 "
+            f"[{pooled['ci_lower']:.4f}, {pooled['ci_upper']:.4f}]，p = {pooled['p_value']:.4f}，"
+            f"合并效应{verdict}统计学意义（{pooled['n_strata']} 层，逆方差加权）。")
+    if pooled['q_df'] > 0:
+        text += f"异质性：Q = {pooled['q_stat']:.2f}（p = {pooled['q_p']:.4f}），I² = {pooled['i_squared']:.1%}。"
+    mh = pooled.get('mantel_haenszel')
+    if mh is not None:
+        text += (f"Mantel-Haenszel 合并比值比 = {mh['odds_ratio']:.4f}，"
+                 f"{1 - alpha:.0%} 置信区间 [{mh['ci_lower']:.4f}, {mh['ci_upper']:.4f}]，CMH 检验 p = {mh['p_value']:.4f}。")
+    return text
+
+
+def stratified_analysis(df, task, strata_col, alpha=0.05, n_jobs=1, executor="thread", **columns):
+    """
+    分层分析：在分层变量的每一层分别执行 stats_core 的检验，并给出合并估计
+
+    参数:
+        df: DataFrame
+        task: "two_group"、"anova"、"correlation" 或 "regression"
+        strata_col: 分层变量列名
+        alpha: 显著性水平
+        n_jobs: 并行数（1 为当前线程内依次计算）
+        executor: "thread"（线程池）或 "process"（进程池，适合层数多、每层数据量大的情形）
+        **columns: 与 stats_core 对应函数相同的列名参数（见 stats_incremental.TASKS），
+                   以及传给该函数的其他参数（如 method）；相关性分析自动选择方法时，
+                   只要有一层选择 Spearman，其余各层也改用 Spearman 重新计算
+
+    返回:
+        dict: labels（层标签）、results（与 labels 对齐的各层结果，失败的层为 None）、
+              summary（每层一行的汇总表：层、样本量、方法、统计量、p 值、是否显著、错误信息）、
+              pooled（合并估计，见 inverse_variance_pool；两组比较且因变量为 0/1 时含 mantel_haenszel；
+              方差分析为 Fisher 合并 p 值与各组合并均值；相关性分析的 coefficient 为合并的相关系数）、explanation_zh
+    """
+    if task not in TASKS:
+        raise ValueError(f"task 必须为 {', '.join(TASKS)} 之一")
+    if executor not in ("thread", "process"):
+        raise ValueError("executor 必须为 thread 或 process")
+    missing = [name for name in TASKS[task] if name not in columns]
+    if missing:
+        raise ValueError(f"缺少列名参数：{', '.join(missing)}")
+    task_columns = {name: columns.pop(name) for name in TASKS[task]}
+    if strata_col in task_columns.values():
+        raise ValueError("分层变量不能与分析变量相同")
+
+    labels, strata_rows = partition_strata(df, strata_col)
+    if len(labels) == 0:
+        raise ValueError("分层变量没有有效取值")
+    frames = [df.take(rows) for rows in strata_rows]
+
+    def run(indices, options):
+        if n_jobs == 1:
+            return [_run_stratum(task, frames[i], alpha, task_columns, options) for i in indices]
+        pool_class = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        with pool_class(max_workers=n_jobs) as pool:
+            futures = [pool.submit(_run_stratum, task, frames[i], alpha, task_columns, options) for i in indices]
+            return [future.result() for future in futures]
+
+    outcomes = run(range(len(frames)), columns)
+    results = [result for result, _ in outcomes]
+    if task == 'correlation' and columns.get('method', "auto") == "auto":
+        # 各层自动选择的系数不同不能直接合并：任一层选择 Spearman 时，选择 Pearson 的层改用 Spearman
+        if any(r is not None and "Spearman" in r['method_name'] for r in results):
+            redo = [i for i, r in enumerate(results) if r is not None and "Pearson" in r['method_name']]
+            for i, outcome in zip(redo, run(redo, dict(columns, method="spearman"))):
+                outcomes[i] = outcome
+                results[i] = outcome[0]
+
+    summary = pd.DataFrame({
+        'stratum': labels,
+        'n': [len(rows) for rows in strata_rows],
+        'method_name': [r['method_name'] if r is not None else None for r in results],
+        'stat': [r['stat'] if r is not None else np.nan for r in results],
+        'p_value': [r['p_value'] if r is not None else np.nan for r in results],
+        'error': [error for _, error in outcomes],
+    })
+    summary.insert(summary.columns.get_loc('p_value') + 1, 'significant', summary['p_value'] < alpha)
+
+    strata_codes = np.full(len(df), -1, dtype=np.int64)
+    for code, rows in enumerate(strata_rows):
+        strata_codes[rows] = code
+    pooled = _pooled_estimates(task, df, task_columns, strata_codes, labels, results, alpha)
+    return {
+        'task': task,
+        'strata_col': strata_col,
+        'labels': labels,
+        'results': results,
+        'summary': summary,
+        'pooled': pooled,
+        'explanation_zh': _pooled_explanation(pooled, alpha),
+    }